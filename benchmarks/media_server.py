@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# benchmarks/media_server.py
+"""
+Server media giả lập cho benchmark: file HTTP, HLS và DASH sinh sẵn trong bộ nhớ
+
+Đường dẫn (kích thước theo byte, có thể dùng hậu tố K/M/G):
+    /file/<size>/<tên>              file trực tiếp (Range nếu bật)
+    /hls/<n>x<size>/index.m3u8      playlist HLS n segment, mỗi segment <size>
+    /hls/<n>x<size>/seg<i>.ts
+    /dash/<n>x<size>/manifest.mpd   MPD một representation (SegmentList)
+    /dash/<n>x<size>/init.mp4, seg<i>.m4s
+    /stats                          JSON thống kê request media từ lần reset gần nhất
+    /reset                          xóa thống kê
+
+Nội dung là byte giả ngẫu nhiên cố định (cùng đường dẫn luôn cùng nội dung),
+không phải media thật: benchmark đo tốc độ truyền, không đo post-processing.
+
+Mô phỏng mạng (áp dụng cho request media, không cho manifest/stats):
+    --latency-ms    chờ trước khi trả header (thời gian tới byte đầu)
+    --bandwidth     giới hạn byte/giây cho mỗi kết nối (0 = không giới hạn)
+    --error-rate    tỉ lệ request trả 503 hoặc bị cắt giữa chừng
+    --no-ranges     bỏ qua header Range (luôn trả 200 toàn bộ file)
+
+Chạy độc lập: python benchmarks/media_server.py --port 8800 --latency-ms 50
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_BLOCK_SIZE = 1048576
+_SEND_CHUNK = 65536
+_UNITS = {'': 1, 'K': 1024, 'M': 1048576, 'G': 1073741824}
+
+
+def parse_size(text):
+    """'5M' -> 5242880"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([KMG]?)B?', text.strip().upper())
+    if not match:
+        raise ValueError(f'Kích thước không hợp lệ: {text}')
+    return int(float(match.group(1)) * _UNITS[match.group(2)])
+
+
+class MediaServerConfig:
+    """Tham số mô phỏng mạng; đổi được khi server đang chạy"""
+
+    def __init__(self, latency_ms=0.0, bandwidth=0, error_rate=0.0, ranges=True, seed=0):
+        self.latency_ms = latency_ms
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.ranges = ranges
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def should_fail(self):
+        if self.error_rate <= 0:
+            return None
+        with self.lock:
+            if self.random.random() >= self.error_rate:
+                return None
+            return self.random.choice(('503', 'reset'))
+
+
+class RequestStats:
+    """Thời gian (giây) và số byte của từng request media"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = []      # (kind, duration, bytes, status)
+            self.connections = 0
+            self.started = time.monotonic()
+
+    def add(self, kind, duration, nbytes, status):
+        with self._lock:
+            self.requests.append((kind, duration, nbytes, status))
+
+    def connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def snapshot(self):
+        with self._lock:
+            requests = list(self.requests)
+            elapsed = time.monotonic() - self.started
+            connections = self.connections
+        durations = sorted(d for _, d, _, status in requests if status < 400)
+        return {
+            'elapsed': elapsed,
+            'connections': connections,
+            'requests': len(requests),
+            # 503 và kết nối bị cắt (599) do --error-rate; 499 = client tự đóng kết nối
+            'errors': sum(1 for _, _, _, status in requests if status >= 500),
+            'aborted': sum(1 for _, _, _, status in requests if status == 499),
+            'bytes': sum(n for _, _, n, _ in requests),
+            'fragment_latency_p50': percentile(durations, 50),
+            'fragment_latency_p99': percentile(durations, 99),
+        }
+
+
+def percentile(sorted_values, pct):
+    """Percentile theo nearest-rank của danh sách đã sắp xếp (None nếu rỗng)"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _make_block():
+    rng = random.Random(20240601)
+    return bytes(rng.getrandbits(8) for _ in range(_BLOCK_SIZE))
+
+
+_BLOCK = None
+
+
+def content(offset, length, salt=0):
+    """length byte giả ngẫu nhiên bắt đầu tại offset (salt khác nhau cho mỗi file)"""
+    global _BLOCK
+    if _BLOCK is None:
+        _BLOCK = _make_block()
+    start = (offset + salt * 7919) % _BLOCK_SIZE
+    parts = []
+    while length > 0:
+        piece = _BLOCK[start:start + length]
+        parts.append(piece)
+        length -= len(piece)
+        start = 0
+    return b''.join(parts)
+
+
+def hls_playlist(count, segment_duration=4):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{segment_duration}',
+             '#EXT-X-MEDIA-SEQUENCE:0', '#EXT-X-PLAYLIST-TYPE:VOD']
+    for index in range(count):
+        lines += [f'#EXTINF:{segment_duration:.3f},', f'seg{index}.ts']
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+
+def dash_manifest(count, segment_size, segment_duration=4):
+    bandwidth = segment_size * 8 // segment_duration
+    segments = '\n'.join(f'          <SegmentURL media="seg{index}.m4s"/>' for index in range(count))
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" profiles="urn:mpeg:dash:profile:isoff-main:2011"
+     mediaPresentationDuration="PT{count * segment_duration}S" minBufferTime="PT2S">
+  <Period id="0" start="PT0S">
+    <AdaptationSet mimeType="video/mp4" contentType="video" segmentAlignment="true">
+      <Representation id="video" codecs="avc1.64001f" width="1280" height="720" frameRate="25"
+                      bandwidth="{bandwidth}">
+        <SegmentList timescale="1" duration="{segment_duration}">
+          <Initialization sourceURL="init.mp4"/>
+{segments}
+        </SegmentList>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+'''
+
+
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'BenchMediaServer/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.stats.connection()
+
+    def do_HEAD(self):
+        self._handle(head=True)
+
+    def do_GET(self):
+        self._handle(head=False)
+
+    def _handle(self, head):
+        path = self.path.split('?', 1)[0]
+        if path == '/stats':
+            return self._send_text(json.dumps(self.server.stats.snapshot()), 'application/json', head)
+        if path == '/reset':
+            self.server.stats.reset()
+            return self._send_text('ok', 'text/plain', head)
+
+        match = re.fullmatch(r'/file/([\d.]+[KMGkmg]?)/([^/]+)', path)
+        if match:
+            size = parse_size(match.group(1))
+            return self._send_media('file', size, match.group(2), 'video/mp4', head)
+
+        match = re.fullmatch(r'/(hls|dash)/(\d+)x([\d.]+[KMGkmg]?)/([^/]+)', path)
+        if match:
+            kind, count, size, name = match.group(1), int(match.group(2)), parse_size(match.group(3)), match.group(4)
+            if kind == 'hls' and name == 'index.m3u8':
+                return self._send_text(hls_playlist(count), 'application/vnd.apple.mpegurl', head)
+            if kind == 'dash' and name == 'manifest.mpd':
+                return self._send_text(dash_manifest(count, size), 'application/dash+xml', head)
+            if kind == 'dash' and name == 'init.mp4':
+                return self._send_media('init', 1024, path, 'video/mp4', head)
+            segment = re.fullmatch(r'seg(\d+)\.(ts|m4s)', name)
+            if segment and int(segment.group(1)) < count:
+                mime = 'video/mp2t' if segment.group(2) == 'ts' else 'video/iso.segment'
+                return self._send_media('segment', size, path, mime, head)
+
+        self._send_text('not found', 'text/plain', head, status=404)
+
+    def _send_text(self, text, content_type, head, status=200):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _send_media(self, kind, size, name, content_type, head):
+        config = self.server.config
+        started = time.monotonic()
+        if config.latency_ms:
+            time.sleep(config.latency_ms / 1000)
+
+        failure = None if head else config.should_fail()
+        if failure == '503':
+            self.send_response(503)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            self.server.stats.add(kind, time.monotonic() - started, 0, 503)
+            return
+
+        start, end, status = 0, size - 1, 200
+        range_header = self.headers.get('Range')
+        if range_header and config.ranges:
+            match = re.fullmatch(r'bytes=(\d*)-(\d*)', range_header.strip())
+            if match and (match.group(1) or match.group(2)):
+                if match.group(1):
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                else:
+                    start = max(0, size - int(match.group(2)))
+                if start > end or start >= size:
+                    self.send_response(416)
+                    self.send_header('Content-Range', f'bytes */{size}')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    self.server.stats.add(kind, time.monotonic() - started, 0, 416)
+                    return
+                status = 206
+
+        length = end - start + 1
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(length))
+        self.send_header('ETag', f'"{zlib.crc32(f"{name}:{size}".encode("utf-8")):08x}"')
+        if config.ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        if head:
+            return
+
+        salt = sum(name.encode('utf-8'))
+        sent = 0
+        # Cắt kết nối ở khoảng giữa body để mô phỏng mất kết nối
+        cut_at = length // 2 if failure == 'reset' else None
+        try:
+            while sent < length:
+                chunk = min(_SEND_CHUNK, length - sent)
+                if cut_at is not None and sent + chunk > cut_at:
+                    self.wfile.write(content(start + sent, cut_at - sent, salt))
+                    sent = cut_at
+                    self.close_connection = True
+                    self.server.stats.add(kind, time.monotonic() - started, sent, 599)
+                    return
+                self.wfile.write(content(start + sent, chunk, salt))
+                sent += chunk
+                if config.bandwidth:
+                    # Giữ tốc độ trung bình của kết nối không vượt bandwidth
+                    ahead = sent / config.bandwidth - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            self.server.stats.add(kind, time.monotonic() - started, sent, 499)
+            return
+        self.server.stats.add(kind, time.monotonic() - started, sent, status)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        # Client đóng kết nối keep-alive giữa chừng là bình thường khi benchmark
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class MediaServer:
+    """
+    Server chạy trong thread riêng; dùng làm context manager hoặc start()/stop()
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, config=None):
+        self.httpd = _HTTPServer((host, port), MediaRequestHandler)
+        self.httpd.config = config or MediaServerConfig()
+        self.httpd.stats = RequestStats()
+        self._thread = None
+
+    @property
+    def config(self):
+        return self.httpd.config
+
+    @property
+    def stats(self):
+        return self.httpd.stats
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='bench-media-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_network_arguments(parser):
+    """Tham số mô phỏng mạng dùng chung cho server và runner"""
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='Delay before each media response (default: 0)')
+    parser.add_argument('--bandwidth', type=parse_size, default=0,
+                        help='Per-connection bandwidth, e.g. 2M (bytes/s, default: unlimited)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of media requests that fail with 503 or a cut connection')
+    parser.add_argument('--no-ranges', action='store_true', help='Ignore Range requests')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for error injection')
+
+
+def config_from_args(args):
+    return MediaServerConfig(args.latency_ms, args.bandwidth, args.error_rate,
+                             not args.no_ranges, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local media server for download benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800, help='Port (0 = random, default: 8800)')
+    add_network_arguments(parser)
+    args = parser.parse_args()
+
+    server = MediaServer(args.host, args.port, config_from_args(args))
+    print(f'Serving on {server.base_url} (Ctrl+C to stop)', flush=True)
+    print(f'  {server.base_url}/file/50M/video.mp4', flush=True)
+    print(f'  {server.base_url}/hls/100x512K/index.m3u8', flush=True)
+    print(f'  {server.base_url}/dash/100x512K/manifest.mpd', flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# benchmarks/run_downloads.py
+"""
+Benchmark tốc độ tải với server media giả lập (benchmarks/media_server.py)
+
+Chạy download_video ở từng optimize_mode với file HTTP, HLS và DASH, và
+OneDriveController.download_from_url với file HTTP, rồi báo cáo:
+throughput, p50/p99 thời gian mỗi fragment/segment (đo ở server), CPU của
+process tải và RSS cao nhất.
+
+Server chạy trong process riêng để CPU của server không tính vào kết quả.
+Download archive, info cache, job store và thông số học theo host bị tắt để
+mỗi lần chạy đều tải thật với cùng thông số.
+
+    python benchmarks/run_downloads.py
+    python benchmarks/run_downloads.py --scenario hls dash --mode speed --latency-ms 40 --repeat 5
+    python benchmarks/run_downloads.py --bandwidth 4M --error-rate 0.02 --json results.json
+    python benchmarks/run_downloads.py --profile ~/.video_downloader_tool/profile.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCH_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+from media_server import add_network_arguments, parse_size  # noqa: E402
+
+SCENARIOS = ('http', 'hls', 'dash', 'onedrive')
+MODES = ('balanced', 'speed', 'quality')
+
+
+class RssSampler:
+    """RSS cao nhất của process trong lúc chạy (lấy mẫu mỗi interval giây)"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        try:
+            import psutil
+            self._process = psutil.Process()
+        except ImportError:
+            self._process = None
+
+    def _rss(self):
+        if self._process is not None:
+            return self._process.memory_info().rss
+        import resource
+        # ru_maxrss: KB trên Linux, byte trên macOS; là đỉnh của cả process
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == 'darwin' else usage * 1024
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._rss())
+
+    def __enter__(self):
+        self.peak = self._rss()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+class ServerProcess:
+    """benchmarks/media_server.py chạy trong process con"""
+
+    def __init__(self, args):
+        command = [sys.executable, os.path.join(BENCH_DIR, 'media_server.py'), '--port', '0',
+                   '--latency-ms', str(args.latency_ms), '--bandwidth', str(args.bandwidth),
+                   '--error-rate', str(args.error_rate), '--seed', str(args.seed)]
+        if args.no_ranges:
+            command.append('--no-ranges')
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+        line = self.process.stdout.readline()
+        if not line.startswith('Serving on '):
+            self.process.kill()
+            raise RuntimeError(f'Media server không khởi động được: {line!r}')
+        self.base_url = line.split()[2]
+
+    def _get(self, path):
+        with urllib.request.urlopen(self.base_url + path, timeout=10) as response:
+            return response.read()
+
+    def reset(self):
+        self._get('/reset')
+
+    def stats(self):
+        return json.loads(self._get('/stats'))
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def prepare_environment():
+    """Thư mục dữ liệu tạm và tắt các cache làm lần chạy sau không tải lại"""
+    data_dir = tempfile.mkdtemp(prefix='vdt-bench-data-')
+    os.environ['VIDEO_DOWNLOADER_DATA_DIR'] = data_dir
+    from core import config
+    config.ARCHIVE_CONFIG['enabled'] = False
+    config.INFO_CACHE_CONFIG['enabled'] = False
+    config.JOB_STORE_CONFIG['enabled'] = False
+    # Mỗi lần chạy bắt đầu từ cùng thông số: không dùng số liệu học từ lần trước
+    config.HOST_TUNING_CONFIG['enabled'] = False
+    # Nội dung giả không phải media thật: không cho ffmpeg sửa file sau khi tải;
+    # tắt dòng tiến độ của yt-dlp (kết quả in theo bảng)
+    for mode_config in (config.DOWNLOAD_CONFIG, config.SPEED_OPTIMIZED_CONFIG,
+                        config.QUALITY_OPTIMIZED_CONFIG, config.SAFE_FALLBACK_CONFIG):
+        mode_config.update(fixup='never', noprogress=True, no_warnings=True)
+    return data_dir
+
+
+def media_url(server, scenario, args):
+    if scenario in ('http', 'onedrive'):
+        return f'{server.base_url}/file/{args.size}/video.mp4'
+    if scenario == 'hls':
+        return f'{server.base_url}/hls/{args.segments}x{args.segment_size}/index.m3u8'
+    return f'{server.base_url}/dash/{args.segments}x{args.segment_size}/manifest.mpd'
+
+
+def run_once(server, scenario, mode, args):
+    """Một lần tải: dict kết quả"""
+    from core.downloader import download_video
+
+    output_folder = tempfile.mkdtemp(prefix='vdt-bench-out-')
+    url = media_url(server, scenario, args)
+    messages = []
+
+    def status_callback(message, color='blue'):
+        if color == 'red':
+            messages.append(message)
+
+    server.reset()
+    try:
+        with RssSampler() as rss:
+            cpu_start = time.process_time()
+            started = time.perf_counter()
+            if scenario == 'onedrive':
+                from ui.controllers.onedrive_controller import OneDriveController, get_http_session
+                controller = OneDriveController(app=None)
+                ok = controller.download_from_url(url, output_folder, None, get_http_session(url),
+                                                  status_callback)
+            else:
+                ok = download_video(url, output_folder, status_callback=status_callback,
+                                    optimize_mode=mode, max_retries=args.retries)
+            wall = time.perf_counter() - started
+            cpu = time.process_time() - cpu_start
+        stats = server.stats()
+        size = sum(entry.stat().st_size for entry in os.scandir(output_folder)
+                   if entry.is_file() and not entry.name.startswith('.'))
+    finally:
+        shutil.rmtree(output_folder, ignore_errors=True)
+
+    return {
+        'scenario': scenario,
+        'mode': mode,
+        'ok': bool(ok),
+        'bytes': size,
+        'wall': wall,
+        'throughput': size / wall if wall > 0 else 0.0,
+        'cpu': cpu,
+        'peak_rss': rss.peak,
+        'fragment_latency_p50': stats['fragment_latency_p50'],
+        'fragment_latency_p99': stats['fragment_latency_p99'],
+        'requests': stats['requests'],
+        'errors': stats['errors'],
+        'error': messages[-1] if messages and not ok else None,
+    }
+
+
+def summarize(runs):
+    """Median các chỉ số của nhiều lần chạy cùng scenario/mode"""
+    def median(key):
+        values = [run[key] for run in runs if run[key] is not None]
+        return statistics.median(values) if values else None
+
+    summary = {key: median(key) for key in ('bytes', 'wall', 'throughput', 'cpu', 'peak_rss',
+                                             'fragment_latency_p50', 'fragment_latency_p99',
+                                             'requests', 'errors')}
+    summary.update(scenario=runs[0]['scenario'], mode=runs[0]['mode'],
+                   ok=sum(run['ok'] for run in runs), runs=len(runs))
+    return summary
+
+
+def _ms(value):
+    return f'{value * 1000:.0f}' if value is not None else '-'
+
+
+def print_table(summaries):
+    header = (f"{'scenario':<10}{'mode':<10}{'ok':>5}{'MB/s':>9}{'wall s':>9}{'p50 ms':>9}"
+              f"{'p99 ms':>9}{'CPU s':>8}{'RSS MB':>9}{'req':>6}{'err':>5}")
+    print(header)
+    print('-' * len(header))
+    for s in summaries:
+        print(f"{s['scenario']:<10}{s['mode']:<10}{s['ok']:>3}/{s['runs']:<1}"
+              f"{s['throughput'] / 1048576:>9.1f}{s['wall']:>9.2f}"
+              f"{_ms(s['fragment_latency_p50']):>9}{_ms(s['fragment_latency_p99']):>9}"
+              f"{s['cpu']:>8.2f}{s['peak_rss'] / 1048576:>9.0f}{s['requests']:>6.0f}{s['errors']:>5.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Download throughput benchmark against a local media server')
+    parser.add_argument('--scenario', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--mode', nargs='+', choices=MODES, default=list(MODES),
+                        help='optimize_mode for download_video (onedrive ignores it)')
+    parser.add_argument('--size', default='64M', help='Size of the direct file (default: 64M)')
+    parser.add_argument('--segments', type=int, default=64, help='HLS/DASH segment count (default: 64)')
+    parser.add_argument('--segment-size', default='1M', help='HLS/DASH segment size (default: 1M)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario/mode (default: 3)')
+    parser.add_argument('--retries', type=int, default=2, help='max_retries for download_video')
+    parser.add_argument('--json', help='Also write every run and the summary to this file')
+    parser.add_argument('--profile', help='Tuned profile to benchmark (default: no profile, only '
+                                          'config.py + SystemOptimizer settings)')
+    add_network_arguments(parser)
+    args = parser.parse_args()
+    parse_size(args.size)
+    parse_size(args.segment_size)
+
+    data_dir = prepare_environment()
+    if args.profile:
+        from core import profiles
+        profiles.use_profile(profiles.load_profile(args.profile))
+    server = ServerProcess(args)
+    print(f"Media server: {server.base_url} (latency {args.latency_ms:g} ms, "
+          f"bandwidth {args.bandwidth or 'unlimited'}, error rate {args.error_rate:g}, "
+          f"ranges {'off' if args.no_ranges else 'on'})")
+
+    runs = []
+    summaries = []
+    try:
+        for scenario in args.scenario:
+            modes = ['direct'] if scenario == 'onedrive' else args.mode
+            for mode in modes:
+                group = []
+                for index in range(args.repeat):
+                    result = run_once(server, scenario, mode, args)
+                    print(f"  {scenario}/{mode} #{index + 1}: {result['throughput'] / 1048576:.1f} MB/s"
+                          f"{'' if result['ok'] else '  FAILED: ' + (result['error'] or '')}", flush=True)
+                    group.append(result)
+                runs.extend(group)
+                summaries.append(summarize(group))
+    finally:
+        server.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    print()
+    print_table(summaries)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'arguments': vars(args), 'runs': runs, 'summary': summaries}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    return 0 if all(s['ok'] == s['runs'] for s in summaries) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
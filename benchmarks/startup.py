@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# benchmarks/startup.py
+"""
+Đo thời gian khởi động của CLI/GUI và kiểm tra ngân sách import
+
+Mỗi lệnh được chạy trong process mới nhiều lần, lấy median và trừ thời gian
+khởi động của interpreter (python -c pass). Sau khi import, các module nặng
+(yt_dlp, requests, psutil) không được có trong sys.modules: chúng chỉ được
+nạp khi bắt đầu tải file đầu tiên.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 20 --budget-ms 120
+
+Trả về mã lỗi 1 khi vượt ngân sách hoặc module nặng bị import sớm.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Module chỉ được import khi bắt đầu tải
+HEAVY_MODULES = ('yt_dlp', 'requests', 'urllib3', 'psutil')
+
+# (tên, code chạy bằng python -c); code in ra các module nặng đã bị import
+_CHECK = ("import sys; print('heavy:' + ','.join(m for m in {heavy!r} if m in sys.modules))")
+SCENARIOS = (
+    ('cli --version', "import sys; sys.argv = ['main.py', '--version']\n"
+                      "import main\ntry:\n    main.main()\nexcept SystemExit:\n    pass\n"),
+    ('import cli', 'import cli'),
+    ('import ui controllers', 'import ui.controllers.download_controller, ui.controllers.onedrive_controller'),
+    ('import main_window', 'import ui.views.main_window'),
+)
+
+
+def run_once(code):
+    """Chạy code trong process mới: (thời gian ms, danh sách module nặng đã import)"""
+    script = code + '\n' + _CHECK.format(heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', script], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True)
+    elapsed = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f'exit code {result.returncode}')
+    line = result.stdout.strip().splitlines()[-1]
+    return elapsed, [name for name in line[len('heavy:'):].split(',') if name]
+
+
+def measure(code, runs):
+    times = []
+    loaded = []
+    for _ in range(runs):
+        elapsed, loaded = run_once(code)
+        times.append(elapsed)
+    return statistics.median(times), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup time benchmark')
+    parser.add_argument('--runs', type=int, default=10, help='Runs per scenario (default: 10)')
+    parser.add_argument('--budget-ms', type=float, default=150.0,
+                        help='Max median time above bare interpreter startup (default: 150)')
+    args = parser.parse_args()
+
+    baseline, _ = measure('pass', args.runs)
+    print(f"Interpreter startup: {baseline:.0f} ms (median of {args.runs})")
+    print(f"{'scenario':<24}{'median':>10}{'over base':>12}  heavy modules")
+
+    failed = False
+    for name, code in SCENARIOS:
+        try:
+            median, loaded = measure(code, args.runs)
+        except RuntimeError as e:
+            print(f"{name:<24}{'skipped':>10}  {str(e).splitlines()[-1] if str(e) else ''}")
+            continue
+        over = median - baseline
+        status = ''
+        if over > args.budget_ms:
+            status = f'  ❌ over budget ({args.budget_ms:.0f} ms)'
+            failed = True
+        if loaded:
+            status += '  ❌ imported too early'
+            failed = True
+        print(f"{name:<24}{median:>8.0f}ms{over:>10.0f}ms  {','.join(loaded) or '-'}{status}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
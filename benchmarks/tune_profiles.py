@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# benchmarks/tune_profiles.py
+"""
+Tạo profile thông số (core/profiles.py) bằng cách sweep trên server media giả lập
+
+Với mỗi mode, lần lượt sweep từng thông số (các thông số khác giữ giá trị tốt
+nhất đã tìm được): concurrent_fragment_downloads, http_chunk_size, buffersize.
+Với HttpFileDownloader (OneDrive): connections rồi min_segment_size. Giá trị
+được chọn theo throughput (median của --repeat lần); chênh lệch dưới --tolerance
+thì chọn giá trị nhẹ hơn (ít kết nối/bộ nhớ hơn).
+
+Đặt mạng giả lập gần với mạng thật (--latency-ms, --bandwidth, --error-rate)
+để profile có ý nghĩa:
+
+    python benchmarks/tune_profiles.py --latency-ms 40 --bandwidth 8M
+    python benchmarks/tune_profiles.py --mode speed --concurrency 2 4 8 16 --output ./profile.json
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+from media_server import add_network_arguments, parse_size  # noqa: E402
+from run_downloads import MODES, ServerProcess, prepare_environment, run_once  # noqa: E402
+
+
+def sizes(values):
+    return [parse_size(value) for value in values]
+
+
+def measure(server, scenarios, mode, args):
+    """Throughput (byte/giây) tổng hợp của các scenario: tổng byte / tổng thời gian"""
+    total_bytes = total_time = 0.0
+    for scenario in scenarios:
+        walls = []
+        for _ in range(args.repeat):
+            result = run_once(server, scenario, mode, args)
+            if not result['ok']:
+                return 0.0
+            walls.append(result['wall'])
+            total_bytes += result['bytes']
+        total_time += statistics.median(walls) * args.repeat
+    return total_bytes / total_time if total_time else 0.0
+
+
+def sweep(name, candidates, current, evaluate, tolerance):
+    """
+    Thử từng giá trị của một thông số; trả về giá trị tốt nhất và kết quả đo.
+    candidates xếp từ nhẹ tới nặng nên giá trị nhỏ thắng khi chênh lệch < tolerance.
+    """
+    results = []
+    for value in candidates:
+        throughput = evaluate({**current, name: value})
+        results.append((value, throughput))
+        print(f"    {name}={value}: {throughput / 1048576:.1f} MB/s", flush=True)
+    best = max(throughput for _, throughput in results)
+    chosen = next(value for value, throughput in results if throughput >= best * (1 - tolerance))
+    return chosen, [{'value': value, 'throughput': throughput} for value, throughput in results]
+
+
+def main():
+    from core import config, profiles
+
+    parser = argparse.ArgumentParser(description='Generate a tuned profile by sweeping download settings')
+    parser.add_argument('--mode', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--scenario', nargs='+', choices=('http', 'hls', 'dash'), default=['hls', 'dash', 'http'],
+                        help='Workload each yt-dlp setting is scored on (default: hls dash http)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 6, 8, 12, 16])
+    parser.add_argument('--chunk-size', nargs='+', default=['5M', '10M', '20M', '50M'],
+                        help='http_chunk_size candidates')
+    parser.add_argument('--buffersize', nargs='+', default=['1K', '4K', '16K', '64K'])
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='HttpFileDownloader connection candidates')
+    parser.add_argument('--segment-size-min', nargs='+', default=['4M', '8M', '16M'],
+                        help='HttpFileDownloader min_segment_size candidates')
+    parser.add_argument('--no-http', action='store_true', help='Do not tune HttpFileDownloader')
+    parser.add_argument('--size', default='32M', help='Direct file size (default: 32M)')
+    parser.add_argument('--segments', type=int, default=32, help='HLS/DASH segment count (default: 32)')
+    parser.add_argument('--segment-size', default='1M', help='HLS/DASH segment size (default: 1M)')
+    parser.add_argument('--repeat', type=int, default=2, help='Runs per candidate (default: 2)')
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('--tolerance', type=float, default=0.05,
+                        help='Prefer the lighter value within this fraction of the best (default: 0.05)')
+    parser.add_argument('--output', default=config.PROFILE_CONFIG['path'],
+                        help=f"Profile file to write (default: {config.PROFILE_CONFIG['path']})")
+    add_network_arguments(parser)
+    args = parser.parse_args()
+
+    chunk_sizes = sizes(args.chunk_size)
+    buffersizes = sizes(args.buffersize)
+    segment_sizes = sizes(args.segment_size_min)
+    output = os.path.abspath(args.output)
+
+    data_dir = prepare_environment()
+    # Đo đúng giá trị đang thử: không để AIMD thay đổi số fragment trong lúc đo
+    config.ADAPTIVE_CONCURRENCY_CONFIG['enabled'] = False
+    server = ServerProcess(args)
+    print(f"Media server: {server.base_url}; scoring on {', '.join(args.scenario)}")
+
+    tuned = profiles.Profile()
+    report = {'network': {'latency_ms': args.latency_ms, 'bandwidth': args.bandwidth,
+                          'error_rate': args.error_rate, 'ranges': not args.no_ranges},
+              'modes': {}, 'http': {}}
+    try:
+        for mode in args.mode:
+            print(f"\n[{mode}]")
+            base = profiles.mode_config(mode)
+            current = {key: base[key] for key in ('concurrent_fragment_downloads', 'http_chunk_size', 'buffersize')}
+
+            def evaluate(candidate, mode=mode):
+                profiles.use_profile(profiles.Profile(modes={mode: candidate}))
+                return measure(server, args.scenario, mode, args)
+
+            report['modes'][mode] = {}
+            for name, candidates in (('concurrent_fragment_downloads', sorted(args.concurrency)),
+                                     ('http_chunk_size', sorted(chunk_sizes)),
+                                     ('buffersize', sorted(buffersizes))):
+                current[name], results = sweep(name, candidates, current, evaluate, args.tolerance)
+                report['modes'][mode][name] = results
+            tuned.modes[mode] = current
+            print(f"  -> {current}")
+
+        if not args.no_http:
+            print("\n[http downloader]")
+            settings = profiles.http_download_settings()
+            current = {key: settings[key] for key in ('connections', 'min_segment_size')}
+
+            def evaluate_http(candidate):
+                profiles.use_profile(profiles.Profile(http=candidate))
+                return measure(server, ['onedrive'], 'direct', args)
+
+            for name, candidates in (('connections', sorted(args.connections)),
+                                     ('min_segment_size', sorted(segment_sizes))):
+                current[name], results = sweep(name, candidates, current, evaluate_http, args.tolerance)
+                report['http'][name] = results
+            tuned.http = current
+            print(f"  -> {current}")
+    finally:
+        profiles.use_profile(None)
+        server.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    tuned.sweep = report
+    profiles.save_profile(tuned, output)
+    print(f"\nProfile written to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
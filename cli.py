@@ -7,6 +7,7 @@ Command-line interface for Video Downloader Tool
 import argparse
 import sys
 import os
+import threading
 
 # Add the project root to the path for imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -15,7 +16,13 @@ if current_dir not in sys.path:
 
 try:
     from core.downloader import download_video, check_ffmpeg_available
-    from utils.cookies import load_cookies_from_file
+    from core.scheduler import get_scheduler
+    from core.events import get_event_bus, new_job_id, JobEvent, StatusEvent, ProgressEvent
+    from core.progress import format_progress_event
+    from core.job_store import get_job_store, JobStoreRecorder
+    from core.config import JOB_STORE_CONFIG, PROFILE_CONFIG, BANDWIDTH_CONFIG
+    from core.bandwidth import get_bandwidth_limiter, parse_rate, format_rate, BandwidthSchedule, ScheduledRate
+    from utils.cookies import get_cookie_store
 except ImportError as e:
     print(f"Error: Could not import required modules: {e}")
     print("Make sure you're running from the video_downloader_tool directory")
@@ -33,6 +40,11 @@ Examples:
   %(prog)s --url "https://onedrive.live.com/..." --out ./downloads --cookie cookies.txt
   %(prog)s --url "video1.mp4" "video2.mp4" --out ./downloads --mode speed
   %(prog)s --headless --url "https://vimeo.com/..." --out ./downloads --verbose
+  %(prog)s --url "video1.mp4" "video2.mp4" "video3.mp4" --out ./downloads --jobs 3
+  %(prog)s --url "video1.mp4" --out ./downloads --metrics-port 9464
+  %(prog)s --url "video1.mp4" "video2.mp4" --out ./downloads --jobs 2 --limit-rate 2M
+  %(prog)s --headless --url "video1.mp4" "video2.mp4" --out ./downloads --bandwidth-schedule "00:00-07:00=unlimited,*=2M"
+  %(prog)s --resume
         """
     )
     
@@ -80,6 +92,83 @@ Examples:
         help='Maximum number of retry attempts (default: 2)'
     )
     
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        help='Number of URLs to download in parallel (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--per-host',
+        type=int,
+        default=0,
+        help='Maximum parallel downloads per host, 0 = unlimited '
+             '(default: 0, only --jobs applies)'
+    )
+    
+    parser.add_argument(
+        '--limit-rate',
+        metavar='RATE',
+        help='Maximum total download speed shared fairly by all jobs, e.g. 500K or 2M'
+    )
+    
+    parser.add_argument(
+        '--host-limit-rate',
+        metavar='HOST=RATE',
+        action='append',
+        default=[],
+        help='Maximum download speed for a host and its subdomains, e.g. sharepoint.com=1M '
+             '(can be repeated)'
+    )
+    
+    parser.add_argument(
+        '--host-weight',
+        metavar='HOST=WEIGHT',
+        action='append',
+        default=[],
+        help='Share of the limited bandwidth for jobs from a host and its subdomains relative '
+             'to other jobs (default 1), e.g. youtube.com=3 (can be repeated)'
+    )
+    
+    parser.add_argument(
+        '--bandwidth-schedule',
+        metavar='SCHEDULE',
+        help='Total speed limit by local time of day, applied to running downloads, e.g. '
+             '"00:00-07:00=unlimited,*=2M" (outside the listed windows: --limit-rate or "*=RATE", '
+             'not both)'
+    )
+    
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics while downloading'
+    )
+    
+    parser.add_argument(
+        '--metrics-textfile',
+        help='Write Prometheus metrics to this file (node_exporter textfile collector)'
+    )
+    
+    parser.add_argument(
+        '--job-db',
+        default=JOB_STORE_CONFIG['path'],
+        help='SQLite file that records job state for crash recovery '
+             f"(default: {JOB_STORE_CONFIG['path']})"
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Also download unfinished jobs recorded in the job database'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        help='Tuned settings profile from benchmarks/tune_profiles.py '
+             f"(default: {PROFILE_CONFIG['path']} if it exists)"
+    )
+    
     parser.add_argument(
         '--check-ffmpeg',
         action='store_true',
@@ -105,13 +194,50 @@ Examples:
             return 1
     
     # Validate required arguments (except when checking ffmpeg)
-    if not args.url:
+    if not args.url and not args.resume:
         parser.error("--url/-u is required")
-    if not args.out:
+    if args.url and not args.out:
         parser.error("--out/-o is required")
+    if args.jobs < 1:
+        parser.error("--jobs/-j must be at least 1")
+    
+    # Giới hạn băng thông dùng chung cho mọi job (chia đều giữa các job đang tải)
+    try:
+        limit_rate = parse_rate(args.limit_rate) if args.limit_rate else None
+        host_rates = {}
+        for item in args.host_limit_rate:
+            host, sep, rate = item.partition('=')
+            if not sep or not host:
+                raise ValueError(f"expected HOST=RATE, got {item!r}")
+            host_rates[host] = parse_rate(rate)
+    except ValueError as e:
+        parser.error(f"--limit-rate/--host-limit-rate: {e}")
+    host_weights = {}
+    for item in args.host_weight:
+        host, sep, weight = item.partition('=')
+        try:
+            weight = float(weight)
+        except ValueError:
+            weight = 0.0
+        if not sep or not host or not 0 < weight < float('inf'):
+            parser.error(f"--host-weight: expected HOST=WEIGHT with WEIGHT > 0, got {item!r}")
+        host_weights[host] = weight
+    schedule = None
+    schedule_text = args.bandwidth_schedule or BANDWIDTH_CONFIG['schedule']
+    if schedule_text:
+        try:
+            schedule = BandwidthSchedule.parse(schedule_text, default=limit_rate)
+        except ValueError as e:
+            parser.error(f"--bandwidth-schedule: {e}")
+        if limit_rate and schedule.default_given:
+            if args.bandwidth_schedule:
+                parser.error("--limit-rate and \"*=RATE\" in --bandwidth-schedule both set the limit "
+                             "outside the schedule windows; use only one of them")
+            # Lịch lấy từ BANDWIDTH_CONFIG: --limit-rate của lần chạy này thắng '*=RATE'
+            schedule.default = limit_rate
     
     # Validate output directory
-    if not os.path.isdir(args.out):
+    if args.out and not os.path.isdir(args.out):
         try:
             os.makedirs(args.out, exist_ok=True)
             if args.verbose:
@@ -120,20 +246,39 @@ Examples:
             print(f"❌ Error creating output directory: {e}")
             return 1
     
+    if args.profile:
+        if not os.path.isfile(args.profile):
+            print(f"❌ Profile not found: {args.profile}")
+            return 1
+        PROFILE_CONFIG['path'] = os.path.abspath(args.profile)
+    
+    limiter = get_bandwidth_limiter()
+    if limit_rate and not schedule:
+        limiter.set_rate(limit_rate)
+    for host, rate in host_rates.items():
+        limiter.set_host_rate(host, rate)
+    for host, weight in host_weights.items():
+        limiter.set_host_weight(host, weight)
+    if args.verbose:
+        # Giới hạn tổng theo lịch được in riêng khi lịch bắt đầu
+        limits = [f"total {format_rate(limit_rate)}"] if limit_rate and not schedule else []
+        limits += [f"{host} {format_rate(rate)}" for host, rate in host_rates.items()]
+        limits += [f"{host} weight {weight:g}" for host, weight in host_weights.items()]
+        if limits:
+            print(f"🚦 Bandwidth limit: {', '.join(limits)}")
+    
     # Validate cookie file if provided
     if args.cookie and not os.path.exists(args.cookie):
         print(f"❌ Cookie file not found: {args.cookie}")
         return 1
     
-    # Load cookies if provided
-    cookies = {}
+    # Parse cookie file một lần; các job dùng lại bản đã cache
     if args.cookie:
-        try:
-            cookies = load_cookies_from_file(args.cookie)
-            if args.verbose:
-                print(f"🍪 Loaded {len(cookies)} cookies from {args.cookie}")
-        except Exception as e:
-            print(f"⚠️ Warning: Could not load cookies: {e}")
+        store = get_cookie_store(args.cookie)
+        if store is None or not store.valid:
+            print(f"⚠️ Warning: Could not load cookies from {args.cookie}")
+        elif args.verbose:
+            print(f"🍪 Loaded {len(store.cookies)} cookies from {args.cookie}")
     
     # Check ffmpeg availability for quality modes
     if args.mode in ['quality']:
@@ -142,45 +287,160 @@ Examples:
             print("⚠️ Warning: ffmpeg not available, falling back to balanced mode")
             args.mode = 'balanced'
     
-    # Status callback for CLI
-    def status_callback(status_text, color="blue"):
-        if args.verbose:
-            print(f"[{color.upper()}] {status_text}")
-        else:
-            # Only show important messages in non-verbose mode
-            if any(keyword in status_text.lower() for keyword in ['error', 'success', 'complete', 'failed']):
-                print(status_text)
+    # Mỗi dòng output được in nguyên vẹn, kể cả khi nhiều job chạy song song
+    # (emit được gọi từ event bus, thread lịch băng thông và thread chính)
+    print_lock = threading.Lock()
+    
+    def emit(text):
+        with print_lock:
+            print(text, flush=True)
+    
+    # Job store: ghi trạng thái từng URL để chạy lại có thể tiếp tục
+    store = None
+    if JOB_STORE_CONFIG['enabled'] and args.job_db:
+        try:
+            store = get_job_store(args.job_db)
+        except Exception as e:
+            print(f"⚠️ Warning: Job database unavailable, progress will not be saved: {e}")
+    
+    # Danh sách job: (url, thư mục lưu, tùy chọn, bản ghi trong job store)
+    entries = []
+    for url in args.url or []:
+        options = {'mode': args.mode, 'cookie': args.cookie, 'retries': args.retries}
+        record = store.add(url, args.out, kind='video', options=options) if store else None
+        entries.append((url, args.out, options, record))
+    if args.resume:
+        if store is None:
+            print("❌ --resume needs the job database")
+            return 1
+        queued = {record.id for _, _, _, record in entries if record}
+        for record in store.unfinished('video'):
+            if record.id not in queued:
+                entries.append((record.url, record.output_folder, record.options, record))
+        if not entries:
+            print("✅ No unfinished jobs to resume")
+            return 0
     
     # Download each URL
     success_count = 0
-    total_count = len(args.url)
+    total_count = len(entries)
+    parallel = args.jobs > 1 and total_count > 1
+    job_numbers = {}  # job_id -> số thứ tự URL
     
-    print(f"🚀 Starting download of {total_count} URL(s) to {args.out}")
+    # CLI nhận trạng thái qua event bus thay vì phân tích chuỗi status
+    def on_event(event):
+        number = job_numbers.get(event.job_id)
+        if number is None:
+            return
+        prefix = f"[{number}/{total_count}] " if parallel else ""
+        if isinstance(event, JobEvent):
+            if event.phase == 'started':
+                if parallel:
+                    emit(f"{prefix}📥 Downloading: {event.url}")
+                else:
+                    emit(f"\n📥 Downloading {number}/{total_count}: {event.url}")
+            elif event.phase == 'finished':
+                emit(f"{prefix}✅ Successfully downloaded: {event.url}")
+            elif event.phase == 'failed':
+                emit(f"{prefix}❌ Failed to download: {event.url}")
+        elif isinstance(event, StatusEvent):
+            if args.verbose:
+                emit(f"{prefix}[{event.color.upper()}] {event.message}")
+            elif event.color == 'red':
+                # Only show errors in non-verbose mode
+                emit(f"{prefix}{event.message}")
+        elif isinstance(event, ProgressEvent) and args.verbose and event.phase == 'downloading':
+            emit(f"{prefix}[BLUE] {format_progress_event(event)}")
+    
+    bus = get_event_bus()
+    bus.subscribe(on_event, (JobEvent, StatusEvent, ProgressEvent))
+    
+    if args.out:
+        print(f"🚀 Starting download of {total_count} URL(s) to {args.out}")
+    else:
+        print(f"🚀 Resuming {total_count} unfinished job(s)")
     print(f"⚙️  Mode: {args.mode}")
+    if parallel:
+        if 0 < args.per_host < args.jobs:
+            print(f"🧵 Parallel jobs: {args.jobs} (at most {args.per_host} per host)")
+        else:
+            print(f"🧵 Parallel jobs: {args.jobs}")
     if args.cookie:
         print(f"🍪 Using cookies from: {args.cookie}")
     
-    for i, url in enumerate(args.url, 1):
-        print(f"\n📥 Downloading {i}/{total_count}: {url}")
-        
+    # Metrics cho chế độ headless (tùy chọn)
+    metrics_server = None
+    metrics_exporter = None
+    if args.metrics_port is not None or args.metrics_textfile:
+        from core.metrics import get_metrics_registry, MetricsServer, TextfileExporter
+        registry = get_metrics_registry()
+        try:
+            if args.metrics_port is not None:
+                metrics_server = MetricsServer(registry, args.metrics_port).start()
+                host, port = metrics_server.address[:2]
+                print(f"📈 Metrics: http://{host}:{port}/metrics")
+            if args.metrics_textfile:
+                metrics_exporter = TextfileExporter(registry, args.metrics_textfile).start()
+                print(f"📈 Metrics file: {args.metrics_textfile}")
+        except OSError as e:
+            print(f"❌ Cannot start metrics exporter: {e}")
+            return 1
+    
+    # Giới hạn băng thông theo giờ: đổi ngay cho các job đang tải, không chạy lại job
+    scheduled_rate = None
+    if schedule:
+        print(f"🚦 Bandwidth schedule: {schedule.describe()}")
+        scheduled_rate = ScheduledRate(
+            schedule, limiter,
+            on_change=lambda rate: emit(f"🚦 Bandwidth limit now {format_rate(rate)}")).start()
+    
+    # Các URL được đưa vào scheduler dùng chung
+    scheduler = get_scheduler()
+    scheduler.set_max_workers(args.jobs)
+    scheduler.set_per_host_limit(args.per_host)
+    
+    recorder = JobStoreRecorder(store, bus).start() if store else None
+    
+    def download_one(job_id, url, output_folder, options):
         try:
-            success = download_video(
+            os.makedirs(output_folder, exist_ok=True)
+            return download_video(
                 url=url,
-                output_folder=args.out,
-                cookie_file=args.cookie,
-                status_callback=status_callback,
-                optimize_mode=args.mode,
-                max_retries=args.retries
+                output_folder=output_folder,
+                cookie_file=options.get('cookie'),
+                optimize_mode=options.get('mode', args.mode),
+                max_retries=options.get('retries', args.retries),
+                job_id=job_id
             )
-            
-            if success:
-                success_count += 1
-                print(f"✅ Successfully downloaded: {url}")
-            else:
-                print(f"❌ Failed to download: {url}")
-                
         except Exception as e:
-            print(f"❌ Error downloading {url}: {e}")
+            bus.publish(StatusEvent(message=f"❌ Error downloading {url}: {e}", color='red', job_id=job_id))
+            return False
+    
+    futures = []
+    for i, (url, output_folder, options, record) in enumerate(entries, 1):
+        if record is not None and record.completed:
+            # Đã tải xong ở lần chạy trước: không extract lại
+            prefix = f"[{i}/{total_count}] " if parallel else ""
+            emit(f"{prefix}⏭️ Already downloaded: {url}" + (f" ({record.output_path})" if record.output_path else ""))
+            success_count += 1
+            continue
+        job_id = new_job_id('cli')
+        job_numbers[job_id] = i
+        if recorder:
+            recorder.track(job_id, record.id)
+        futures.append(scheduler.submit(download_one, job_id, url, output_folder, options, url=url))
+    for future in futures:
+        if future.result():
+            success_count += 1
+    bus.flush()
+    if scheduled_rate:
+        scheduled_rate.stop()
+    if recorder:
+        recorder.stop()
+    if metrics_exporter:
+        metrics_exporter.stop()
+    if metrics_server:
+        metrics_server.stop()
     
     # Summary
     print(f"\n📊 Download Summary:")
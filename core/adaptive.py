@@ -0,0 +1,215 @@
+# core/adaptive.py
+"""
+Điều chỉnh số fragment tải đồng thời theo từng host (AIMD)
+
+Mỗi host có một FragmentConcurrencyController dùng chung trong process.
+FragmentObserver đọc progress hook của yt-dlp, cứ mỗi `window` fragment
+hoàn tất thì báo throughput, latency trung bình mỗi fragment và số lần retry
+fragment cho controller:
+- lỗi/retry nhiều hoặc latency tăng vọt so với mức nền: giảm theo cấp số nhân
+- throughput còn tăng khi thêm kết nối: tăng thêm increase_step
+- throughput không tăng nữa: giữ nguyên
+
+yt-dlp đọc `concurrent_fragment_downloads` khi bắt đầu tải mỗi stream
+fragment (FragmentFD), nên giá trị mới áp dụng cho stream kế tiếp (vd. audio
+sau video), lần retry và các job sau trên cùng host.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from .config import ADAPTIVE_CONCURRENCY_CONFIG
+
+
+class FragmentConcurrencyController:
+    """
+    Giới hạn fragment đồng thời của một host
+    """
+
+    def __init__(self, host, initial=None, minimum=None, maximum=None):
+        config = ADAPTIVE_CONCURRENCY_CONFIG
+        self.host = host
+        self.minimum = max(1, minimum or config['min'])
+        self.maximum = max(self.minimum, maximum or config['max'])
+        self.window = config['window']
+        self.increase_step = config['increase_step']
+        self.decrease_factor = config['decrease_factor']
+        self.max_error_rate = config['max_error_rate']
+        self.latency_factor = config['latency_factor']
+        self.min_gain = config['min_gain']
+
+        self._lock = threading.Lock()
+        self._limit = self._clamp(initial or config['initial'])
+        self._throughput = {}        # limit -> throughput (bytes/giây) đo được
+        self._base_latency = None    # latency mỗi fragment khi host "khỏe"
+        self._errors = 0             # retry fragment từ lần đánh giá trước
+        self._fragments_since_decrease = self.window
+        self._targets = []           # params của các YoutubeDL đang tải từ host
+
+    @property
+    def limit(self):
+        return self._limit
+
+    def _clamp(self, value):
+        return max(self.minimum, min(self.maximum, int(value)))
+
+    def record(self, fragments, nbytes, seconds, concurrency):
+        """
+        Kết quả một cửa sổ đo: số fragment hoàn tất, số byte, thời gian và
+        số fragment đồng thời đang dùng khi đo
+        """
+        if fragments <= 0 or seconds <= 0:
+            return
+        throughput = nbytes / seconds
+        # Little's law: latency trung bình = số request đang chạy / tốc độ hoàn tất
+        latency = concurrency * seconds / fragments
+        with self._lock:
+            self._fragments_since_decrease += fragments
+            errors, self._errors = self._errors, 0
+            previous = self._throughput.get(concurrency)
+            self._throughput[concurrency] = throughput if previous is None else 0.5 * (previous + throughput)
+
+            if errors / (fragments + errors) > self.max_error_rate:
+                self._decrease_locked()
+                return
+            if self._base_latency is None or latency < self._base_latency:
+                self._base_latency = latency
+            else:
+                # Mức nền trôi chậm lên để không bám mãi vào một lần đo may mắn
+                self._base_latency *= 1.02
+            if latency > self._base_latency * self.latency_factor:
+                self._decrease_locked()
+                return
+            if concurrency != self._limit:
+                return  # Số liệu của giới hạn cũ, chờ đo với giới hạn hiện tại
+
+            lower = self._throughput.get(concurrency - self.increase_step)
+            if lower is None or self._throughput[concurrency] >= lower * (1 + self.min_gain):
+                self._set_limit_locked(self._limit + self.increase_step)
+            elif self._throughput[concurrency] < lower * (1 - self.min_gain):
+                # Thêm kết nối làm chậm đi: quay lại mức trước
+                self._set_limit_locked(self._limit - self.increase_step)
+
+    def record_error(self):
+        """Một fragment phải retry; giảm ngay nếu đủ lâu từ lần giảm trước"""
+        with self._lock:
+            self._errors += 1
+            if self._fragments_since_decrease >= self.window and self._errors >= 2:
+                self._errors = 0
+                self._decrease_locked()
+
+    def back_off(self):
+        """Giảm giới hạn sau khi cả stream tải thất bại"""
+        with self._lock:
+            self._decrease_locked()
+        return self._limit
+
+    def _decrease_locked(self):
+        self._fragments_since_decrease = 0
+        self._set_limit_locked(self._limit * self.decrease_factor)
+
+    def _set_limit_locked(self, value):
+        value = self._clamp(value)
+        if value == self._limit:
+            return
+        self._limit = value
+        for params in self._targets:
+            params['concurrent_fragment_downloads'] = value
+
+    @contextmanager
+    def applied_to(self, params):
+        """
+        Giữ params['concurrent_fragment_downloads'] theo giới hạn hiện tại
+        trong khi YoutubeDL đang tải
+        """
+        with self._lock:
+            params['concurrent_fragment_downloads'] = self._limit
+            self._targets.append(params)
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._targets = [item for item in self._targets if item is not params]
+
+
+@contextmanager
+def controlled_concurrency(params, controller):
+    """applied_to() của controller, hoặc không làm gì nếu controller là None"""
+    if controller is None:
+        yield None
+        return
+    with controller.applied_to(params):
+        yield controller
+
+
+class FragmentObserver:
+    """
+    Chuyển progress hook của yt-dlp thành số liệu cho controller
+
+    paused(): tổng số giây job bị giới hạn băng thông chặn (JobThrottle.waited);
+    cửa sổ đo có lúc bị chặn được bỏ qua vì throughput/latency khi đó là của
+    giới hạn chứ không phải của host.
+    """
+
+    def __init__(self, controller, paused=None):
+        self.controller = controller
+        self._paused = paused
+        self._start_paused = 0.0
+        self._stream = None
+        self._concurrency = controller.limit
+        self._start_time = 0.0
+        self._start_index = 0
+        self._start_bytes = 0
+
+    def hook(self, d):
+        if d.get('status') != 'downloading' or d.get('fragment_index') is None:
+            return
+        now = time.monotonic()
+        index = d['fragment_index']
+        downloaded = d.get('downloaded_bytes') or 0
+        stream = d.get('tmpfilename') or d.get('filename')
+        if stream != self._stream or index < self._start_index:
+            # Stream fragment mới: yt-dlp vừa đọc giới hạn hiện tại
+            self._stream = stream
+            self._concurrency = self.controller.limit
+            self._reset(now, index, downloaded)
+            return
+        if index - self._start_index < self.controller.window:
+            return
+        if not self._paused or self._paused() <= self._start_paused:
+            self.controller.record(index - self._start_index, max(0, downloaded - self._start_bytes),
+                                   now - self._start_time, self._concurrency)
+        self._reset(now, index, downloaded)
+
+    def on_retry(self, kind):
+        if kind == 'fragment':
+            self.controller.record_error()
+
+    def _reset(self, now, index, downloaded):
+        self._start_time = now
+        self._start_index = index
+        self._start_bytes = downloaded
+        self._start_paused = self._paused() if self._paused else 0.0
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_concurrency_controller(host, initial=None):
+    """
+    Trả về controller của host (tạo mới với giá trị khởi đầu initial)
+    """
+    with _controllers_lock:
+        controller = _controllers.get(host)
+        if controller is None:
+            controller = FragmentConcurrencyController(host, initial=initial)
+            _controllers[host] = controller
+        return controller
+
+
+def concurrency_limits():
+    """Giới hạn hiện tại của các host đã gặp: {host: limit}"""
+    with _controllers_lock:
+        return {host: controller.limit for host, controller in _controllers.items()}
@@ -0,0 +1,207 @@
+# core/archive.py
+"""
+Download archive: index các video đã tải theo extractor + video id
+
+Giống --download-archive của yt-dlp nhưng lưu trong SQLite (tra cứu theo
+primary key, vẫn nhanh với hàng trăm nghìn entry) và ghi kèm file đã lưu,
+kích thước và (tùy chọn) SHA-256 của nội dung. Entry chỉ được tính khi file
+còn trên đĩa với đúng kích thước, nên xóa file là tải lại được.
+
+Tra cứu trước khi tải:
+- theo id tạm của extractor (ie.get_temp_id, không cần request nào) hoặc URL
+- theo id thật sau extract_info, trước khi tải media (URL khác cùng video)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from .config import ARCHIVE_CONFIG
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive (
+    extractor TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    output_folder TEXT NOT NULL,
+    url TEXT,
+    filepath TEXT,
+    size INTEGER,
+    sha256 TEXT,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (extractor, video_id, output_folder)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS archive_url ON archive (url, output_folder);
+"""
+
+
+@dataclass
+class ArchiveEntry:
+    """Một video đã tải"""
+    extractor: str
+    video_id: str
+    output_folder: str
+    url: Optional[str] = None
+    filepath: Optional[str] = None
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+    added_at: float = 0.0
+
+    @property
+    def archive_id(self):
+        """Id theo định dạng archive của yt-dlp: '<extractor> <id>'"""
+        return f'{self.extractor} {self.video_id}'
+
+    def exists(self):
+        """File đã lưu còn trên đĩa và đúng kích thước"""
+        if not self.filepath:
+            return True
+        try:
+            size = os.path.getsize(self.filepath)
+        except OSError:
+            return False
+        return self.size is None or size == self.size
+
+
+def hash_file(path, chunk_size=1048576):
+    """SHA-256 của file (đọc từng 1MB)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def temp_archive_key(url):
+    """
+    (extractor, id) của URL mà không cần request nào (ie.get_temp_id),
+    hoặc None nếu extractor không suy ra được id từ URL
+    """
+    from yt_dlp.extractor import gen_extractor_classes
+
+    for ie in gen_extractor_classes():
+        if ie.suitable(url):
+            temp_id = ie.get_temp_id(url)
+            return (ie.ie_key().lower(), str(temp_id)) if temp_id else None
+    return None
+
+
+class DownloadArchive:
+    """
+    Archive SQLite dùng chung giữa các thread (một connection, có lock)
+    """
+
+    def __init__(self, path=None, hash_files=None):
+        self.path = path or ARCHIVE_CONFIG['path']
+        self.hash_files = ARCHIVE_CONFIG['hash'] if hash_files is None else hash_files
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def _first(self, sql, params):
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+        if row is None:
+            return None
+        entry = ArchiveEntry(**dict(row))
+        return entry if entry.exists() else None
+
+    def lookup(self, extractor, video_id, output_folder):
+        """Entry của video trong thư mục lưu (file còn trên đĩa), hoặc None"""
+        if not extractor or video_id is None:
+            return None
+        return self._first(
+            'SELECT * FROM archive WHERE extractor = ? AND video_id = ? AND output_folder = ?',
+            (extractor.lower(), str(video_id), os.path.abspath(output_folder)))
+
+    def lookup_url(self, url, output_folder):
+        """
+        Tra cứu trước khi có request nào: theo id tạm của extractor, rồi theo URL
+        """
+        key = temp_archive_key(url)
+        if key:
+            entry = self.lookup(key[0], key[1], output_folder)
+            if entry:
+                return entry
+        return self._first(
+            'SELECT * FROM archive WHERE url = ? AND output_folder = ? ORDER BY added_at DESC LIMIT 1',
+            (url, os.path.abspath(output_folder)))
+
+    def lookup_info(self, info, output_folder):
+        """Tra cứu theo info dict của yt-dlp (extractor_key + id)"""
+        extractor = info.get('extractor_key') or info.get('ie_key') or info.get('extractor')
+        return self.lookup(extractor, info.get('id'), output_folder)
+
+    def record(self, extractor, video_id, output_folder, url=None, filepath=None):
+        """Ghi nhận video đã tải xong (ghi đè entry cũ cùng key)"""
+        size = sha256 = None
+        if filepath:
+            filepath = os.path.abspath(filepath)
+            try:
+                size = os.path.getsize(filepath)
+                if self.hash_files:
+                    sha256 = hash_file(filepath)
+            except OSError:
+                filepath = None
+        entry = ArchiveEntry(extractor.lower(), str(video_id), os.path.abspath(output_folder),
+                             url, filepath, size, sha256, time.time())
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO archive (extractor, video_id, output_folder, url, filepath, '
+                'size, sha256, added_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (entry.extractor, entry.video_id, entry.output_folder, entry.url, entry.filepath,
+                 entry.size, entry.sha256, entry.added_at))
+            self._conn.commit()
+        return entry
+
+    def record_info(self, info, output_folder, url=None):
+        """
+        Ghi nhận từ kết quả process_ie_result (file cuối cùng lấy từ requested_downloads)
+        """
+        extractor = info.get('extractor_key') or info.get('extractor')
+        if not extractor or info.get('id') is None:
+            return None
+        filepath = info.get('filepath')
+        for download in info.get('requested_downloads') or []:
+            filepath = download.get('filepath') or filepath
+        return self.record(extractor, info['id'], output_folder, url, filepath)
+
+    def count(self):
+        """Số video trong archive"""
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM archive').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_download_archive():
+    """
+    Trả về archive dùng chung, hoặc None nếu bị tắt / không mở được database
+    """
+    global _archive
+    if not ARCHIVE_CONFIG.get('enabled', True):
+        return None
+    with _archive_lock:
+        if _archive is None:
+            try:
+                _archive = DownloadArchive()
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ Không mở được download archive: {e}")
+                ARCHIVE_CONFIG['enabled'] = False
+                return None
+        return _archive
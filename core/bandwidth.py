@@ -0,0 +1,484 @@
+# core/bandwidth.py
+"""
+Giới hạn băng thông dùng chung cho mọi job trong process
+
+Mỗi job (download_video, HttpFileDownloader) đăng ký một JobThrottle với host
+và trọng số. Các thread tải của job (fragment, segment) gọi consume(n) sau
+mỗi chunk và bị chặn khi vượt phần băng thông của job (token bucket).
+
+Phần của mỗi job được chia theo trọng số (weighted max-min, water-filling):
+- tổng mọi job không vượt quá rate; các job cùng host có giới hạn riêng
+  (host_rates) không vượt quá giới hạn của host
+- job tải chậm hơn phần được chia (server chậm) chỉ giữ phần đủ dùng, phần
+  còn lại chia cho các job khác; job không tải byte nào trong idle_timeout
+  (đang extract, chờ retry) không được chia
+
+Trọng số của job lấy từ host_weights (theo host hoặc domain cha, mặc định
+1.0) nếu nơi gọi không truyền weight.
+
+rate/host_rates đổi được trong lúc tải (set_rate, set_host_rate): job đang
+chờ được đánh thức và áp dụng giới hạn mới ngay. BandwidthSchedule +
+ScheduledRate đổi rate theo giờ trong ngày cho các batch chạy qua đêm.
+
+Với yt-dlp, consume được gọi từ progress hook (JobThrottle.hook): hook chạy
+trong thread đang tải fragment nên chặn hook là chặn đúng kết nối đó. Không
+dùng params['ratelimit'] vì mỗi fragment tự giới hạn riêng theo bản copy
+params lúc bắt đầu stream (N fragment đồng thời = N lần giới hạn).
+"""
+
+import datetime
+import math
+import re
+import threading
+import time
+
+from .config import BANDWIDTH_CONFIG
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+_MIN_BURST = 65536          # Đủ cho một chunk/block thông thường
+_MIN_DEMAND = 16384         # Job chậm vẫn được giữ ít nhất 16KB/s để tăng lại
+
+
+def parse_rate(text):
+    """
+    '2M', '500K', '1.5MB', '2MiB/s', '1048576' -> byte/giây; '0', 'none',
+    'unlimited' -> None (không giới hạn). ValueError nếu không hợp lệ.
+    """
+    value = str(text).strip()
+    if value.lower() in ('', '0', 'none', 'unlimited', 'inf'):
+        return None
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([kKmMgG]?)(?:i?[bB])?(?:/s)?', value)
+    if not match:
+        raise ValueError(f"Tốc độ không hợp lệ: {text!r} (vd. 500K, 2M)")
+    rate = int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+    return rate or None
+
+
+def format_rate(rate):
+    if rate is None or rate == math.inf:
+        return 'unlimited'
+    for unit in ('G', 'M', 'K'):
+        if rate >= _UNITS[unit]:
+            return f'{rate / _UNITS[unit]:.3g}{unit}B/s'
+    return f'{rate:.0f}B/s'
+
+
+def fair_share(total, demands):
+    """
+    Chia total (math.inf = không giới hạn) theo trọng số:
+    demands {key: (weight, cap hoặc None)} -> {key: rate}. Key có cap nhỏ hơn
+    phần của nó nhận đúng cap, phần dư chia lại cho các key còn lại.
+    """
+    shares = {}
+    pending = dict(demands)
+    while pending:
+        weight_sum = sum(weight for weight, _ in pending.values())
+        if weight_sum <= 0:
+            break
+        unit = total / weight_sum
+        capped = {key: cap for key, (weight, cap) in pending.items()
+                  if cap is not None and cap < weight * unit}
+        if not capped:
+            shares.update((key, weight * unit) for key, (weight, _) in pending.items())
+            break
+        for key, cap in capped.items():
+            shares[key] = cap
+            total -= cap
+            del pending[key]
+    for key in pending:
+        shares.setdefault(key, 0.0)
+    return shares
+
+
+class JobThrottle:
+    """
+    Phần băng thông của một job (dùng chung cho mọi thread tải của job)
+    """
+
+    def __init__(self, limiter, host, weight, group, cancelled=None):
+        self.limiter = limiter
+        self.host = host
+        self.weight = max(0.01, float(weight))
+        self.group = group          # Key giới hạn của host (host_rates) hoặc None
+        self.rate = math.inf        # Phần được chia hiện tại (byte/giây)
+        self.tokens = 0.0
+        self.closed = False
+        self.cancelled = cancelled  # threading.Event của job: đã set thì consume không chặn nữa
+        self.waited = 0.0           # Tổng thời gian các thread của job bị chặn (giây)
+        self._refilled_at = time.monotonic()
+        self._last_active = None    # Lần cuối tải được byte (None = chưa tải)
+        self._period_bytes = 0      # Byte đã tải từ lần chia lại trước
+        self._waited = False        # Đã phải chờ từ lần chia lại trước
+        self._demand = None         # Tốc độ job thực sự dùng (khi chậm hơn phần được chia)
+        self._seen = {}             # stream -> downloaded_bytes (progress hook của yt-dlp)
+        self._seen_lock = threading.Lock()
+
+    @property
+    def burst(self):
+        return max(_MIN_BURST, self.rate * self.limiter.burst_seconds)
+
+    def _refill(self, now):
+        if self.rate == math.inf:
+            self.tokens = 0.0
+        else:
+            self.tokens = min(self.burst, self.tokens + self.rate * (now - self._refilled_at))
+        self._refilled_at = now
+
+    @property
+    def limited(self):
+        """Job đã phải chờ vì giới hạn: tốc độ đo được là của giới hạn, không phải của host"""
+        return self.waited > 0
+
+    def consume(self, nbytes):
+        """
+        Ghi nhận nbytes vừa tải; chặn tới khi job còn trong phần băng thông của
+        nó (hoặc tới khi job bị hủy)
+        """
+        if nbytes > 0 and not self.closed:
+            self.limiter._consume(self, nbytes)
+
+    def hook(self, d):
+        """progress hook của yt-dlp: tính số byte mới của mỗi stream rồi consume"""
+        if d.get('status') != 'downloading':
+            return
+        stream = d.get('tmpfilename') or d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        with self._seen_lock:
+            last = self._seen.get(stream)
+            if last is not None and downloaded <= last:
+                return
+            self._seen[stream] = downloaded
+        # Lần đầu thấy stream: downloaded_bytes có thể gồm phần đã tải trước (resume)
+        if last is not None:
+            self.consume(downloaded - last)
+
+    def close(self):
+        self.limiter._unregister(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BandwidthLimiter:
+    """
+    Token bucket cho từng job, phần của mỗi job do limiter chia lại định kỳ
+    """
+
+    def __init__(self, rate=None, host_rates=None, burst_seconds=None,
+                 rebalance_interval=None, idle_timeout=None, host_weights=None):
+        config = BANDWIDTH_CONFIG
+        self.burst_seconds = config['burst_seconds'] if burst_seconds is None else burst_seconds
+        self.rebalance_interval = rebalance_interval or config['rebalance_interval']
+        self.idle_timeout = idle_timeout or config['idle_timeout']
+        self._cond = threading.Condition()
+        self._rate = rate
+        self._host_rates = {}
+        self._jobs = []
+        self._rebalanced_at = 0.0
+        for host, host_rate in (host_rates or {}).items():
+            self._host_rates[host.lower().lstrip('.')] = host_rate
+        self._host_weights = {host.lower().lstrip('.'): weight
+                              for host, weight in (host_weights or {}).items()}
+        self._update_unlimited()
+
+    def _update_unlimited(self):
+        # Không có giới hạn nào: consume trả về ngay, không cần lock
+        self._unlimited = self._rate is None and not any(self._host_rates.values())
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @property
+    def host_rates(self):
+        return dict(self._host_rates)
+
+    def set_rate(self, rate):
+        """Đổi giới hạn tổng (None = không giới hạn), áp dụng ngay cho job đang tải"""
+        with self._cond:
+            self._rate = rate
+            self._update_unlimited()
+            self._rebalance_locked(time.monotonic())
+
+    def set_host_rate(self, host, rate):
+        """Đổi giới hạn của host và subdomain (None = bỏ giới hạn), áp dụng ngay cho job đang tải"""
+        host = host.lower().lstrip('.')
+        with self._cond:
+            if rate is None:
+                self._host_rates.pop(host, None)
+            else:
+                self._host_rates[host] = rate
+            for job in self._jobs:
+                job.group = self._group_for(job.host)
+            self._update_unlimited()
+            self._rebalance_locked(time.monotonic())
+
+    def set_host_weight(self, host, weight):
+        """Trọng số của job đăng ký sau này từ host và subdomain (None = mặc định 1.0)"""
+        host = host.lower().lstrip('.')
+        with self._cond:
+            if weight is None:
+                self._host_weights.pop(host, None)
+            else:
+                self._host_weights[host] = weight
+
+    @staticmethod
+    def _match(host, table):
+        """Key trong table khớp host (chính host đó hoặc domain cha)"""
+        host = (host or '').lower()
+        while host:
+            if host in table:
+                return host
+            _, _, host = host.partition('.')
+        return None
+
+    def _group_for(self, host):
+        """Key trong host_rates khớp host"""
+        return self._match(host, self._host_rates)
+
+    def _weight_for(self, host):
+        key = self._match(host, self._host_weights)
+        return 1.0 if key is None else self._host_weights[key]
+
+    def register(self, host, weight=None, cancelled=None):
+        """
+        JobThrottle mới cho một job tải từ host (dùng với with hoặc gọi close()).
+        weight: trọng số của job (None = theo host_weights).
+        cancelled: threading.Event hủy job; thread đang chờ thoát trong tối đa
+        rebalance_interval sau khi event được set
+        """
+        with self._cond:
+            if weight is None:
+                weight = self._weight_for(host)
+            job = JobThrottle(self, host, weight, self._group_for(host), cancelled)
+            self._jobs.append(job)
+            return job
+
+    def _unregister(self, job):
+        with self._cond:
+            job.closed = True
+            self._jobs = [item for item in self._jobs if item is not job]
+            self._rebalance_locked(time.monotonic())
+
+    def _consume(self, job, nbytes):
+        if self._unlimited:
+            return
+        with self._cond:
+            now = time.monotonic()
+            job._refill(now)
+            job.tokens -= nbytes
+            job._period_bytes += nbytes
+            idle = job._last_active is None or now - job._last_active > self.idle_timeout
+            job._last_active = now
+            if idle or now - self._rebalanced_at >= self.rebalance_interval:
+                self._rebalance_locked(now)
+            started = now
+            while job.tokens < 0 and job.rate != math.inf and not job.closed and not self._unlimited:
+                if job.cancelled is not None and job.cancelled.is_set():
+                    break
+                job._waited = True
+                wait = -job.tokens / job.rate if job.rate > 0 else self.rebalance_interval
+                self._cond.wait(min(wait, self.rebalance_interval))
+                now = time.monotonic()
+                job._refill(now)
+                job._last_active = now
+                if now - self._rebalanced_at >= self.rebalance_interval:
+                    self._rebalance_locked(now)
+            job.waited += now - started
+
+    def _rebalance_locked(self, now):
+        """Chia lại băng thông cho các job đang tải (giữ lock)"""
+        elapsed = now - self._rebalanced_at
+        self._rebalanced_at = now
+        active = [job for job in self._jobs
+                  if job._last_active is not None and now - job._last_active <= self.idle_timeout]
+
+        for job in active:
+            # Job không phải chờ mà vẫn dùng dưới 80% phần của nó: chỉ cần tốc độ đang dùng
+            if elapsed > 0 and job.rate != math.inf and job._period_bytes:
+                used = job._period_bytes / elapsed
+                if not job._waited and used < 0.8 * job.rate:
+                    job._demand = max(_MIN_DEMAND, 1.5 * used)
+                elif job._waited:
+                    job._demand = None
+            job._period_bytes = 0
+            job._waited = False
+
+        # Mức 1: theo nhóm host có giới hạn (job của host không giới hạn là một nhóm riêng)
+        groups = {}
+        for job in active:
+            key = job.group if job.group is not None else id(job)
+            groups.setdefault(key, []).append(job)
+        demands = {}
+        for key, jobs in groups.items():
+            caps = [job._demand for job in jobs]
+            cap = None if None in caps else sum(caps)
+            host_rate = self._host_rates.get(key) if isinstance(key, str) else None
+            if host_rate is not None:
+                cap = host_rate if cap is None else min(cap, host_rate)
+            demands[key] = (sum(job.weight for job in jobs), cap)
+        total = math.inf if self._rate is None else self._rate
+        group_shares = fair_share(total, demands)
+
+        # Mức 2: trong nhóm, chia theo trọng số của từng job
+        for key, jobs in groups.items():
+            shares = fair_share(group_shares[key], {id(job): (job.weight, job._demand) for job in jobs})
+            for job in jobs:
+                job._refill(now)
+                job.rate = shares[id(job)]
+                job.tokens = min(job.tokens, job.burst)
+        # Job chưa tải/đang nghỉ: không giới hạn tới lần consume kế tiếp (sẽ chia lại ngay)
+        for job in self._jobs:
+            if job not in active:
+                job.rate = math.inf
+                job._demand = None
+        self._cond.notify_all()
+
+    def snapshot(self):
+        """Phần băng thông hiện tại của các job: [(host, weight, rate)]"""
+        with self._cond:
+            return [(job.host, job.weight, None if job.rate == math.inf else job.rate)
+                    for job in self._jobs]
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_bandwidth_limiter():
+    """Limiter dùng chung của process (tạo từ BANDWIDTH_CONFIG lần đầu gọi)"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = BandwidthLimiter(BANDWIDTH_CONFIG['rate'], BANDWIDTH_CONFIG['host_rates'],
+                                        host_weights=BANDWIDTH_CONFIG['host_weights'])
+        return _limiter
+
+
+def _parse_clock(text):
+    """'07:30' -> số phút từ 00:00 ('24:00' = 1440)"""
+    match = re.fullmatch(r'(\d{1,2}):(\d{2})', text.strip())
+    if not match:
+        raise ValueError(f"Giờ không hợp lệ: {text!r} (cần HH:MM)")
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    if minutes > 59 or hours > 24 or (hours == 24 and minutes):
+        raise ValueError(f"Giờ không hợp lệ: {text!r}")
+    return hours * 60 + minutes
+
+
+class BandwidthSchedule:
+    """
+    Giới hạn tổng theo giờ trong ngày (giờ máy)
+
+    Cú pháp: các mục 'HH:MM-HH:MM=RATE' cách nhau bởi dấu phẩy, '*=RATE' là
+    giới hạn ngoài mọi khung giờ (mặc định: default). Khung giờ qua nửa đêm
+    (22:00-06:00) được hỗ trợ; các khung trùng nhau thì khung viết trước thắng.
+
+        00:00-07:00=unlimited,*=2M
+        09:00-12:00=1M,13:00-18:00=1M,*=unlimited
+    """
+
+    def __init__(self, windows, default=None, default_given=False):
+        self.windows = list(windows)    # [(phút bắt đầu, phút kết thúc, rate)]
+        self.default = default
+        self.default_given = default_given  # Lịch có mục '*=RATE'
+
+    @classmethod
+    def parse(cls, text, default=None):
+        windows = []
+        default_given = False
+        for item in filter(None, (part.strip() for part in str(text).split(','))):
+            span, sep, rate = item.partition('=')
+            if not sep:
+                raise ValueError(f"Mục lịch không hợp lệ: {item!r} (cần HH:MM-HH:MM=RATE)")
+            if span.strip() == '*':
+                default = parse_rate(rate)
+                default_given = True
+                continue
+            start, sep, end = span.partition('-')
+            if not sep:
+                raise ValueError(f"Khung giờ không hợp lệ: {span!r} (cần HH:MM-HH:MM)")
+            start, end = _parse_clock(start), _parse_clock(end)
+            if start == end:
+                raise ValueError(f"Khung giờ rỗng: {span!r}")
+            windows.append((start, end, parse_rate(rate)))
+        if not windows:
+            raise ValueError("Lịch băng thông không có khung giờ nào")
+        return cls(windows, default, default_given)
+
+    @staticmethod
+    def _contains(window, minute):
+        start, end, _ = window
+        if start < end:
+            return start <= minute < end
+        return minute >= start or minute < end     # Qua nửa đêm
+
+    def rate_at(self, when=None):
+        """Giới hạn (byte/giây, None = không giới hạn) tại thời điểm when (mặc định: bây giờ)"""
+        when = when or datetime.datetime.now()
+        minute = when.hour * 60 + when.minute
+        for window in self.windows:
+            if self._contains(window, minute):
+                return window[2]
+        return self.default
+
+    def next_change(self, when=None):
+        """Thời điểm ranh giới khung giờ kế tiếp sau when"""
+        when = when or datetime.datetime.now()
+        minute = when.hour * 60 + when.minute
+        midnight = when.replace(hour=0, minute=0, second=0, microsecond=0)
+        boundaries = sorted({edge % 1440 for start, end, _ in self.windows for edge in (start, end)})
+        upcoming = [edge for edge in boundaries if edge > minute] or [boundaries[0] + 1440]
+        return midnight + datetime.timedelta(minutes=upcoming[0])
+
+    def describe(self):
+        parts = [f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d} {format_rate(rate)}"
+                 for start, end, rate in self.windows]
+        return ', '.join(parts + [f"otherwise {format_rate(self.default)}"])
+
+
+class ScheduledRate:
+    """
+    Thread nền đặt rate của limiter theo BandwidthSchedule; job đang tải nhận
+    giới hạn mới ngay ở ranh giới khung giờ, không phải chạy lại
+    """
+
+    def __init__(self, schedule, limiter=None, on_change=None, check_interval=None):
+        self.schedule = schedule
+        self.limiter = limiter or get_bandwidth_limiter()
+        self.on_change = on_change      # on_change(rate) khi giới hạn đổi
+        self.check_interval = check_interval or BANDWIDTH_CONFIG['schedule_check_interval']
+        self._stop = threading.Event()
+        self._thread = None
+        self._applied = ()              # Chưa áp dụng lần nào
+
+    def apply(self, when=None):
+        rate = self.schedule.rate_at(when)
+        if rate != self._applied:
+            self._applied = rate
+            self.limiter.set_rate(rate)
+            if self.on_change:
+                self.on_change(rate)
+        return rate
+
+    def _run(self):
+        while True:
+            wait = (self.schedule.next_change() - datetime.datetime.now()).total_seconds()
+            # Thức dậy định kỳ để không lỡ ranh giới khi giờ hệ thống bị chỉnh
+            if self._stop.wait(min(max(wait, 0.0) + 0.5, self.check_interval)):
+                return
+            self.apply()
+
+    def start(self):
+        self.apply()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="bandwidth-schedule")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
@@ -3,6 +3,14 @@
 Cấu hình cho video downloader
 """
 
+import os
+
+# Thư mục lưu dữ liệu của tool (cache, index...)
+APP_DATA_DIR = os.environ.get(
+    'VIDEO_DOWNLOADER_DATA_DIR',
+    os.path.join(os.path.expanduser('~'), '.video_downloader_tool'),
+)
+
 # Cấu hình tối ưu hóa tốc độ tải
 DOWNLOAD_CONFIG = {
     # Cấu hình format video - fallback nếu không có ffmpeg
@@ -40,45 +48,41 @@ SPEED_OPTIMIZED_CONFIG = {
     'http_chunk_size': 20971520,  # Tăng chunk size lên 20MB
 }
 
-def auto_adjust_config_for_stability(config, url=None):
+def auto_adjust_config_for_stability(config, url=None, learned=None):
     """
     Automatically adjust configuration settings for better stability
+    :param learned: HostTuning của host (core/host_tuning.py); khi đã có số liệu
+        của host thì dùng tỉ lệ lỗi fragment đo được thay cho danh sách nguồn
     """
     adjusted_config = config.copy()
     
-    # If URL contains known problematic sources, make settings more conservative
-    if url:
+    if learned is not None:
+        conservative = learned.unstable
+    elif url:
+        # Host chưa có số liệu: đoán theo danh sách nguồn hay lỗi
         url_lower = url.lower()
         problematic_sources = [
             'youtube.com', 'youtu.be', 'vimeo.com', 'dailymotion.com',
             'twitch.tv', 'facebook.com', 'instagram.com', 'tiktok.com'
         ]
-        
-        if any(source in url_lower for source in problematic_sources):
-            # Make settings more conservative for problematic sources
-            adjusted_config['concurrent_fragment_downloads'] = min(
-                adjusted_config.get('concurrent_fragment_downloads', 4), 2
-            )
-            adjusted_config['fragment_retries'] = max(
-                adjusted_config.get('fragment_retries', 5), 10
-            )
-            adjusted_config['retry_sleep'] = max(
-                adjusted_config.get('retry_sleep', 2), 3
-            )
-            adjusted_config['socket_timeout'] = max(
-                adjusted_config.get('socket_timeout', 30), 45
-            )
+        conservative = any(source in url_lower for source in problematic_sources)
+    else:
+        conservative = False
     
-    # General stability improvements
-    if adjusted_config.get('concurrent_fragment_downloads', 1) > 4:
-        adjusted_config['concurrent_fragment_downloads'] = 4
+    if conservative:
+        # Make settings more conservative for problematic sources
+        # (số fragment đồng thời do core/adaptive.py điều chỉnh theo host)
+        adjusted_config['fragment_retries'] = max(
+            adjusted_config.get('fragment_retries', 5), 10
+        )
+        adjusted_config['socket_timeout'] = max(
+            adjusted_config.get('socket_timeout', 30), 45
+        )
     
+    # General stability improvements
     if adjusted_config.get('fragment_retries', 1) < 5:
         adjusted_config['fragment_retries'] = 5
     
-    if adjusted_config.get('retry_sleep', 0) < 2:
-        adjusted_config['retry_sleep'] = 2
-    
     return adjusted_config
 
 
@@ -106,14 +110,10 @@ SAFE_FALLBACK_CONFIG = {
     
     # Không có concurrent downloads
     'max_downloads': 1,
-    'max_sleep_interval': 3,
-    'sleep_interval': 2,
-    'max_sleep_interval_requests': 3,
     
     # Fragment handling an toàn
     'hls_prefer_native': True,
     'external_downloader': None,
-    'retry_sleep': 5,
     'file_access_retries': 3,
 }
 
@@ -134,3 +134,139 @@ FFMPEG_CONFIG = {
         'preferedformat': 'mp4',
     }]
 }
+
+# Cấu hình hàng đợi tải (dùng chung cho GUI và CLI)
+SCHEDULER_CONFIG = {
+    'max_concurrent_downloads': 3,  # Số job tải cùng lúc tối đa
+    'per_host_limit': 2,            # Số job cùng lúc tối đa cho mỗi host
+}
+
+# Cấu hình pool YoutubeDL (dùng lại instance giữa các URL trong batch)
+YDL_POOL_CONFIG = {
+    'max_idle_per_key': 2,  # Số instance rảnh tối đa cho mỗi bộ option
+    'max_keys': 8,          # Số bộ option khác nhau được giữ lại
+}
+
+# Cache kết quả extract_info theo URL (tránh extract lại trang khi retry/fallback)
+INFO_CACHE_CONFIG = {
+    'enabled': True,
+    'directory': os.path.join(APP_DATA_DIR, 'info_cache'),
+    'ttl': 1800,                 # Thời gian sống tối đa (giây)
+    'expiry_margin': 120,        # Hết hạn sớm hơn URL có chữ ký (expire=...) bao nhiêu giây
+    'max_memory_entries': 256,   # Số entry giữ trong RAM
+}
+
+# Cấu hình tải file trực tiếp qua HTTP (OneDrive/SharePoint)
+HTTP_DOWNLOAD_CONFIG = {
+    'connections': 4,               # Số kết nối song song (Range request)
+    'min_segment_size': 8388608,    # Mỗi segment tối thiểu 8MB
+    'chunk_size': 262144,           # Đọc 256KB mỗi lần
+    'manifest_interval': 1.0,       # Ghi manifest resume tối đa mỗi giây
+    'timeout': 30,                  # Timeout kết nối/đọc (giây)
+    'retries': 5,                   # Số lần retry lỗi tạm thời cho mỗi segment
+}
+
+# Cấu hình báo tiến độ (gộp sự kiện để không cập nhật UI sau mỗi chunk)
+PROGRESS_CONFIG = {
+    'min_interval': 0.1,    # Tối đa 10 lần/giây
+    'min_bytes': 262144,    # Và chỉ khi đã tải thêm ít nhất 256KB
+}
+
+# Điều chỉnh số fragment đồng thời theo từng host (AIMD, xem core/adaptive.py)
+ADAPTIVE_CONCURRENCY_CONFIG = {
+    'enabled': True,
+    'initial': 4,               # Giá trị khởi đầu nếu mode không chỉ định
+    'min': 1,
+    'max': 16,
+    'window': 8,                # Đánh giá lại sau mỗi 8 fragment hoàn tất
+    'increase_step': 1,         # Tăng cộng khi throughput còn tăng
+    'decrease_factor': 0.5,     # Giảm nhân khi lỗi/latency tăng
+    'max_error_rate': 0.1,      # Tỉ lệ retry fragment tối đa trước khi giảm
+    'latency_factor': 2.5,      # Latency mỗi fragment gấp bao nhiêu lần mức nền thì giảm
+    'min_gain': 0.05,           # Throughput phải tăng ít nhất 5% mới tăng tiếp
+}
+
+# Thời gian chờ giữa các lần retry (core/retry.py), dùng chung cho yt-dlp và OneDrive
+RETRY_CONFIG = {
+    'base_delay': 1.0,          # Backoff: ngẫu nhiên trong [0, base * multiplier^n]
+    'multiplier': 2.0,
+    'max_delay': 30.0,          # Trần của backoff (giây)
+    'max_retry_after': 120.0,   # Chờ theo Retry-After của server tối đa bao lâu
+    'host_retry_rate': 2.0,     # Số lần retry/giây cho mỗi host (tổng mọi job)
+    'host_retry_burst': 5,      # Số lần retry liên tiếp được phép trước khi phải chờ
+}
+
+# Cấu hình metrics (Prometheus text format) cho chế độ chạy headless
+METRICS_CONFIG = {
+    'host': '127.0.0.1',        # Endpoint /metrics chỉ nghe trên máy local
+    'textfile_interval': 15,    # Ghi file .prom mỗi 15 giây
+}
+
+# Lưu trạng thái job vào SQLite để tiếp tục sau khi process bị dừng (core/job_store.py)
+JOB_STORE_CONFIG = {
+    'enabled': True,
+    'path': os.path.join(APP_DATA_DIR, 'jobs.db'),
+    'progress_interval': 2.0,   # Ghi tiến độ (bytes đã tải) tối đa mỗi 2 giây cho mỗi job
+}
+
+# Download archive: bỏ qua video đã tải vào cùng thư mục (core/archive.py)
+ARCHIVE_CONFIG = {
+    'enabled': True,
+    'path': os.path.join(APP_DATA_DIR, 'archive.db'),
+    'hash': False,              # Tính SHA-256 của file đã tải (tốn thêm một lần đọc file)
+}
+
+# Lưu file tải trực tiếp (OneDrive/SharePoint) theo nội dung, tên file là hardlink (core/content_store.py)
+CONTENT_STORE_CONFIG = {
+    'enabled': False,
+    'directory': None,          # None = <thư mục lưu>/.objects (cùng ổ đĩa để hardlink được)
+    'link': 'auto',             # 'hardlink', 'reflink', 'copy' hoặc 'auto' (thử lần lượt)
+}
+
+# Pool requests.Session dùng chung cho tải trực tiếp (core/http_session.py)
+HTTP_SESSION_CONFIG = {
+    'pool_connections': 8,      # Số host (kể cả host redirect tới) mỗi Session giữ pool kết nối
+    'pool_maxsize': 16,         # Số kết nối keep-alive mỗi host (>= per_host_limit * connections)
+    'max_retries': 0,           # Retry do RetryPolicy (core/retry.py) đảm nhận
+    'headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Accept-Encoding': 'gzip, deflate',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+    },
+}
+
+# Profile thông số theo mode: giá trị tĩnh ở trên + thông số của máy + số đo (core/profiles.py)
+PROFILE_CONFIG = {
+    'enabled': True,
+    'path': os.path.join(APP_DATA_DIR, 'profile.json'),  # Tạo bằng benchmarks/tune_profiles.py
+    'use_system_settings': True,  # Ghép SystemOptimizer.get_optimal_settings (CPU, RAM, hệ điều hành)
+}
+
+# Thông số đã học theo từng host: throughput, tỉ lệ lỗi fragment và số fragment/chunk
+# size cho kết quả tốt nhất; job sau bắt đầu từ đó thay vì học lại (core/host_tuning.py)
+HOST_TUNING_CONFIG = {
+    'enabled': True,
+    'path': os.path.join(APP_DATA_DIR, 'hosts.db'),
+    'smoothing': 0.3,           # Trọng số của job mới trong trung bình trượt (EWMA)
+    'max_age_days': 30,         # Bỏ số liệu cũ hơn (mạng/CDN đã có thể thay đổi)
+    'unstable_error_rate': 0.05,  # Tỉ lệ retry fragment trên mức này: dùng cài đặt thận trọng
+    'min_samples': 3,           # Số job tối thiểu của một cặp thông số trước khi được chọn
+    'settings_window_days': 7,  # Cặp thông số không được dùng trong N ngày trước job gần nhất của host thì bỏ qua
+}
+
+# Giới hạn băng thông dùng chung cho mọi job trong process (core/bandwidth.py)
+BANDWIDTH_CONFIG = {
+    'rate': None,               # Tổng byte/giây của mọi job, None = không giới hạn (--limit-rate)
+    'host_rates': {},           # {host: byte/giây}, áp dụng cho cả subdomain (--host-limit-rate)
+    'host_weights': {},         # {host: trọng số} của job tải từ host/subdomain, mặc định 1.0 (--host-weight)
+    'burst_seconds': 0.5,       # Mỗi job được tải dồn tối đa 0.5 giây băng thông của nó
+    'rebalance_interval': 0.5,  # Chia lại băng thông giữa các job tối đa mỗi 0.5 giây
+    'idle_timeout': 2.0,        # Job không tải byte nào trong 2 giây không được chia băng thông
+    # Giới hạn theo giờ trong ngày (giờ máy), vd. '00:00-07:00=unlimited,*=2M' (--bandwidth-schedule)
+    'schedule': None,
+    'schedule_check_interval': 60,  # Kiểm tra lại giờ ít nhất mỗi 60 giây (đổi giờ hệ thống, DST)
+}
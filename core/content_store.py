@@ -0,0 +1,145 @@
+# core/content_store.py
+"""
+Lưu file theo nội dung (content-addressed) cho các file tải trực tiếp (OneDrive/SharePoint)
+
+Mỗi nội dung chỉ lưu một lần tại <thư mục lưu>/.objects/<2 ký tự đầu>/<sha256>;
+tên file người dùng thấy là hardlink (hoặc reflink/bản copy nếu file system
+không hỗ trợ) tới blob đó. Cùng một file được chia sẻ qua nhiều link khác nhau
+chỉ chiếm dung lượng một lần.
+
+Blob được đặt read-only để sửa một tên file không làm đổi nội dung của các
+tên khác cùng trỏ tới blob (với hardlink).
+"""
+
+import errno
+import os
+import shutil
+import stat
+import threading
+
+from .config import CONTENT_STORE_CONFIG
+
+# ioctl FICLONE của Linux (btrfs, XFS, ...): tạo reflink copy-on-write
+_FICLONE = 0x40049409
+
+
+def reflink(src, dst):
+    """Tạo dst là reflink của src; raise OSError nếu file system không hỗ trợ"""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.EOPNOTSUPP, "reflink không được hỗ trợ")
+    with open(src, 'rb') as source, open(dst, 'xb') as target:
+        try:
+            fcntl.ioctl(target.fileno(), _FICLONE, source.fileno())
+        except OSError:
+            target.close()
+            os.remove(dst)
+            raise
+
+
+def link_file(src, dst, mode='auto'):
+    """
+    Tạo dst trỏ tới nội dung của src, không ghi đè file có sẵn (FileExistsError)
+    mode: 'hardlink', 'reflink', 'copy' hoặc 'auto' (thử lần lượt)
+    Trả về cách đã dùng.
+    """
+    methods = ('hardlink', 'reflink', 'copy') if mode == 'auto' else (mode,)
+    for method in methods:
+        try:
+            if method == 'hardlink':
+                os.link(src, dst)
+            elif method == 'reflink':
+                reflink(src, dst)
+            else:
+                with open(src, 'rb') as source, open(dst, 'xb') as target:
+                    shutil.copyfileobj(source, target, 1048576)
+                os.chmod(dst, stat.S_IMODE(os.stat(src).st_mode) | stat.S_IWUSR)
+            return method
+        except FileExistsError:
+            raise
+        except OSError:
+            if method == methods[-1]:
+                raise
+    return None
+
+
+def unique_path(path):
+    """path, hoặc 'name (1).ext', 'name (2).ext'... nếu đã có file"""
+    if not os.path.lexists(path):
+        return path
+    root, ext = os.path.splitext(path)
+    index = 1
+    while os.path.lexists(f'{root} ({index}){ext}'):
+        index += 1
+    return f'{root} ({index}){ext}'
+
+
+class ContentStore:
+    """
+    Kho blob theo SHA-256 nằm trong thư mục lưu (cùng file system để hardlink được)
+    """
+
+    def __init__(self, root, link_mode=None):
+        self.root = root
+        self.link_mode = link_mode or CONTENT_STORE_CONFIG['link']
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def commit(self, part_path, digest, dest):
+        """
+        Đưa file đã tải (part_path) vào kho và tạo tên file dest trỏ tới blob.
+        Nội dung đã có trong kho thì bỏ part_path (không lưu lần hai).
+        dest đã tồn tại với nội dung khác thì dùng tên mới, không ghi đè.
+        Trả về đường dẫn file người dùng thấy.
+        """
+        blob = self.blob_path(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        with self._lock:
+            if os.path.exists(blob) and os.path.getsize(blob) == os.path.getsize(part_path):
+                os.remove(part_path)
+            else:
+                os.replace(part_path, blob)
+                os.chmod(blob, stat.S_IMODE(os.stat(blob).st_mode) & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+        return self.place(blob, dest)
+
+    def place(self, blob, dest):
+        """Tạo tên file dest (hoặc tên chưa dùng) trỏ tới blob"""
+        while True:
+            if os.path.exists(dest) and self._same_content(dest, blob):
+                return dest
+            dest = unique_path(dest)
+            try:
+                link_file(blob, dest, self.link_mode)
+                return dest
+            except FileExistsError:
+                continue  # Thread khác vừa tạo cùng tên: thử tên tiếp theo
+
+    @staticmethod
+    def _same_content(path, blob):
+        try:
+            return os.path.samefile(path, blob)
+        except OSError:
+            return False
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_content_store(output_folder):
+    """
+    Kho của thư mục lưu, hoặc None nếu CONTENT_STORE_CONFIG['enabled'] tắt
+    """
+    if not CONTENT_STORE_CONFIG.get('enabled'):
+        return None
+    root = CONTENT_STORE_CONFIG.get('directory') or os.path.join(output_folder, '.objects')
+    root = os.path.abspath(root)
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = ContentStore(root)
+            _stores[root] = store
+        return store
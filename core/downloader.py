@@ -1,10 +1,23 @@
 # core/downloader.py
+# yt_dlp chỉ được import khi bắt đầu tải (xem ydl_pool) để CLI/GUI khởi động nhanh
 import os
-import subprocess
+import sqlite3
 import sys
-from yt_dlp import YoutubeDL
-from yt_dlp.utils import DownloadError
-from .config import DOWNLOAD_CONFIG, POST_PROCESSORS, SPEED_OPTIMIZED_CONFIG, QUALITY_OPTIMIZED_CONFIG, FFMPEG_CONFIG, SAFE_FALLBACK_CONFIG, auto_adjust_config_for_stability
+from contextlib import nullcontext
+from .config import POST_PROCESSORS, FFMPEG_CONFIG, SAFE_FALLBACK_CONFIG, INFO_CACHE_CONFIG, ADAPTIVE_CONCURRENCY_CONFIG, auto_adjust_config_for_stability
+from .ydl_pool import ydl_session
+from .info_cache import cache_context, get_info_cache
+from .temp_files import cleanup_temp_files as _cleanup_temp_files, get_manifest
+from .events import JobReporter
+from .progress import ProgressThrottle
+from .adaptive import get_concurrency_controller, controlled_concurrency, FragmentObserver
+from .scheduler import get_host
+from .errors import classify_error
+from .retry import get_retry_policy
+from .archive import get_download_archive
+from .profiles import mode_config
+from .host_tuning import get_host_tuning_store, JobSample
+from .bandwidth import get_bandwidth_limiter
 
 # Add the project root to the path for absolute imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -25,56 +38,89 @@ except ImportError:
         """Fallback: return basic cookie format"""
         return {'cookiefile': cookie_path} if cookie_path else {}
 
+# Kiểm tra ffmpeg dùng kết quả cache chung của utils.ffmpeg_checker
+try:
+    from utils.ffmpeg_checker import is_ffmpeg_available
+except ImportError:
+    def is_ffmpeg_available():
+        """Fallback: chạy ffmpeg -version trực tiếp"""
+        import subprocess
+        try:
+            subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
+            return True
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            return False
+
 
 def check_ffmpeg_available():
     """
-    Kiểm tra xem ffmpeg có sẵn không
+    Kiểm tra xem ffmpeg có sẵn không (kết quả được cache trong process)
     """
-    try:
-        subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
+    return is_ffmpeg_available()
 
 
 def cleanup_temp_files(output_folder):
     """
     Clean up temporary fragment files that might cause download issues
+    Chỉ đụng tới file tạm của yt-dlp (.part, .part-FragN, .ytdl); thư mục chỉ
+    được quét một lần mỗi process, các lần sau dùng manifest file tạm.
     """
     try:
-        import glob
-        # Look for common temporary file patterns
-        temp_patterns = [
-            '*.part*',
-            '*.fragment*',
-            '*.tmp',
-            '*.temp',
-            '*~',
-            '*.part-Frag*',
-            '*.ytdl',
-            '*.ytdlp',
-            '*.f*',  # Fragment files
-            '*.m4s',  # Audio/video segments
-            '*.ts',   # Transport stream segments
-        ]
-        
-        for pattern in temp_patterns:
-            temp_files = glob.glob(os.path.join(output_folder, pattern))
-            for temp_file in temp_files:
-                try:
-                    if os.path.isfile(temp_file):
-                        # Check if file is old (more than 1 hour) to avoid deleting active downloads
-                        import time
-                        file_age = time.time() - os.path.getmtime(temp_file)
-                        if file_age > 3600:  # 1 hour
-                            os.remove(temp_file)
-                except Exception:
-                    pass  # Ignore errors when cleaning up
-                    
+        _cleanup_temp_files(output_folder)
     except Exception:
         pass  # Ignore cleanup errors
 
 
+def download_with_cached_info(ydl, url):
+    """
+    Tải URL bằng ydl, dùng lại kết quả extract_info đã cache nếu có.
+    Retry/fallback chỉ chọn lại format từ info đã cache, không extract lại trang.
+    Video đã có trong download archive (cùng thư mục lưu) được bỏ qua trước khi tải media.
+    """
+    from yt_dlp.utils import DownloadError
+
+    cache = get_info_cache() if INFO_CACHE_CONFIG.get('enabled', True) else None
+    archive = get_download_archive()
+    output_folder = (ydl.params.get('paths') or {}).get('home') or os.getcwd()
+
+    # Info lấy bằng cookie/tài khoản khác không được dùng lại
+    context = cache_context(ydl.params) if cache else ''
+    info = cache.get(url, context) if cache else None
+    from_cache = info is not None
+    if info is None:
+        info = ydl.extract_info(url, download=False, process=False)
+        if info is None:
+            raise DownloadError(f"Không lấy được thông tin video: {url}")
+        if (info.get('_type') or 'video') != 'video':
+            # Playlist/URL chuyển hướng: để yt-dlp xử lý trọn vẹn, không cache
+            ydl.process_ie_result(info, download=True)
+            return
+        if cache:
+            info = ydl.sanitize_info(info, ydl.params.get('clean_infojson', True))
+            cache.put(url, info, context)
+
+    # URL khác nhưng cùng video (cùng extractor + id) đã tải vào thư mục này
+    entry = archive.lookup_info(info, output_folder) if archive else None
+    if entry:
+        ydl.to_screen(f"[download] {entry.archive_id} has already been recorded in the archive")
+        return
+
+    try:
+        result = ydl.process_ie_result(info, download=True)
+    except DownloadError as e:
+        # URL có chữ ký hết hạn (403/410): bỏ cache và extract lại ngay một lần
+        if from_cache and classify_error(e).refresh_info:
+            cache.invalidate(url, context)
+            download_with_cached_info(ydl, url)
+            return
+        raise
+    # ignoreerrors=True: yt-dlp chỉ ghi nhận lỗi, không raise
+    if getattr(ydl, '_download_retcode', 0):
+        raise DownloadError(f"yt-dlp báo lỗi khi tải: {url}")
+    if archive and result and not ydl.params.get('simulate'):
+        archive.record_info(result, output_folder, url)
+
+
 def preprocess_url(url):
     """
     Preprocess URL to handle common issues
@@ -145,17 +191,78 @@ def validate_download_config(url, config, status_callback=None):
         return False
 
 
-def download_video(url, output_folder, cookie_file=None, status_callback=None, optimize_mode='balanced', max_retries=2):
+def job_stage(status_callback, name):
+    """
+    Đo thời gian giai đoạn tải nếu status_callback là JobReporter (metrics)
+    """
+    stage = getattr(status_callback, 'stage', None)
+    return stage(name) if stage else nullcontext()
+
+
+def output_hooks(status_callback):
+    """
+    post_hooks cho yt-dlp: ghi nhận đường dẫn file cuối cùng (sau merge/postprocess)
+    vào JobReporter để báo kèm sự kiện kết thúc job
+    """
+    saved = getattr(status_callback, 'saved', None)
+    return [saved] if saved else []
+
+
+def retry_sleep_functions(status_callback, host, on_retry=None):
+    """
+    retry_sleep_functions cho yt-dlp: thời gian chờ theo RetryPolicy dùng chung
+    (backoff + jitter, giới hạn số lần retry theo host) và ghi nhận số lần retry
+    lên event bus (và on_retry(kind) nếu có)
+    """
+    policy = get_retry_policy()
+    report = getattr(status_callback, 'retry', None)
+
+    def observer(kind):
+        def on_attempt(n):
+            if report:
+                report(kind, n + 1)
+            if on_retry:
+                on_retry(kind)
+        return on_attempt
+
+    functions = {kind: policy.sleep_function(host, observer(kind)) for kind in ('http', 'fragment', 'extractor')}
+    # Lỗi truy cập file là lỗi cục bộ, không tính vào lượt retry của host
+    functions['file_access'] = policy.sleep_function(None, observer('file_access'))
+    return functions
+
+
+def download_video(url, output_folder, cookie_file=None, status_callback=None, optimize_mode='balanced', max_retries=2, job_id=None,
+                   bandwidth_weight=None):
     """
     Tải video từ URL, sử dụng yt-dlp
     :param url: Đường dẫn video
     :param output_folder: Thư mục lưu video
     :param cookie_file: File cookies.txt hoặc .json nếu cần
-    :param status_callback: Hàm callback để cập nhật trạng thái cho UI
+    :param status_callback: Hàm callback để cập nhật trạng thái cho UI (tùy chọn,
+        trạng thái/tiến độ luôn được phát lên event bus)
     :param optimize_mode: Chế độ tối ưu hóa ('balanced', 'speed', 'quality')
     :param max_retries: Số lần thử lại tối đa khi gặp lỗi file
+    :param job_id: Id của job trên event bus (tự tạo nếu không truyền)
+    :param bandwidth_weight: Trọng số của job khi chia băng thông giới hạn (core/bandwidth.py),
+        None = theo BANDWIDTH_CONFIG['host_weights'] (--host-weight)
+    """
+    reporter = JobReporter(job_id, url, callback=status_callback)
+    reporter.started()
+    success = False
+    try:
+        with get_bandwidth_limiter().register(get_host(url), bandwidth_weight) as throttle:
+            success = bool(_download_video(url, output_folder, cookie_file, reporter, optimize_mode,
+                                           max_retries, throttle))
+        return success
+    finally:
+        reporter.finished(success)
+
+
+def _download_video(url, output_folder, cookie_file, status_callback, optimize_mode, max_retries, throttle):
+    """
+    Phần thân của download_video; status_callback là JobReporter của job,
+    throttle là JobThrottle giới hạn băng thông của job
     """
-    
     # Preprocess URL to handle common issues
     original_url = url
     url = preprocess_url(url)
@@ -163,23 +270,51 @@ def download_video(url, output_folder, cookie_file=None, status_callback=None, o
     if status_callback and url != original_url:
         status_callback(f"🔧 URL đã được xử lý: {url[:50]}...", "blue")
     
+    # Đã tải vào thư mục này (theo id tạm của extractor hoặc URL): không cần request nào
+    archive = get_download_archive()
+    entry = archive.lookup_url(url, output_folder) if archive else None
+    if entry:
+        if status_callback:
+            status_callback(f"⏭️ Đã tải trước đó ({entry.archive_id}): {entry.filepath or url}", "green")
+            saved = getattr(status_callback, 'saved', None)
+            if saved and entry.filepath:
+                saved(entry.filepath)
+        return True
+    
     # Kiểm tra ffmpeg
     ffmpeg_available = check_ffmpeg_available()
     
-    # Chọn cấu hình dựa trên mode và ffmpeg availability
-    if optimize_mode == 'speed':
-        config = SPEED_OPTIMIZED_CONFIG.copy()
-    elif optimize_mode == 'quality':
-        config = QUALITY_OPTIMIZED_CONFIG.copy()
-
-    else:
-        config = DOWNLOAD_CONFIG.copy()
+    # Chọn cấu hình theo mode (giá trị tĩnh + thông số máy + profile đã đo, xem core/profiles.py)
+    config = mode_config(optimize_mode)
     
     # Lưu mode gốc để có thể fallback nếu cần
     original_mode = optimize_mode
     
+    # Thông số đã học của host (throughput, lỗi fragment) từ các job trước
+    host = get_host(url)
+    tuning_store = get_host_tuning_store()
+    learned = tuning_store.lookup(host, optimize_mode) if tuning_store else None
+    
     # Auto-adjust configuration for better stability
-    config = auto_adjust_config_for_stability(config, url)
+    mode_defaults = config
+    config = auto_adjust_config_for_stability(config, url, learned)
+    if learned and learned.concurrency:
+        # Bắt đầu từ số fragment/chunk size cho throughput tốt nhất lần trước
+        # (có thể cao hơn giá trị khởi đầu của mode, AIMD leo tới mức max).
+        # Chỉ giữ mức của mode khi host không ổn định hoặc auto_adjust đã hạ.
+        def learned_value(key, value, maximum=None):
+            current = config.get(key)
+            if current and (learned.unstable or current < (mode_defaults.get(key) or current)):
+                return min(value, current)
+            return min(value, maximum) if maximum else value
+
+        config['concurrent_fragment_downloads'] = learned_value(
+            'concurrent_fragment_downloads', learned.concurrency, ADAPTIVE_CONCURRENCY_CONFIG['max'])
+        if learned.chunk_size:
+            config['http_chunk_size'] = learned_value('http_chunk_size', learned.chunk_size)
+        if status_callback:
+            status_callback(f"📈 Dùng thông số đã học cho {host}: "
+                            f"{config['concurrent_fragment_downloads']} fragment đồng thời", "blue")
     
     # Validate configuration before proceeding
     if not validate_download_config(url, config, status_callback):
@@ -196,28 +331,58 @@ def download_video(url, output_folder, cookie_file=None, status_callback=None, o
         if status_callback and not ffmpeg_available and optimize_mode in ['quality']:
             status_callback("⚠️ ffmpeg không có sẵn, sử dụng format đơn giản", "orange")
 
+    retry_policy = get_retry_policy()
+
+    # Số fragment đồng thời được điều chỉnh theo host trong lúc tải (AIMD)
+    concurrency = None
+    fragment_observer = None
+    if ADAPTIVE_CONCURRENCY_CONFIG.get('enabled', True):
+        concurrency = get_concurrency_controller(host, config.get('concurrent_fragment_downloads'))
+        config['concurrent_fragment_downloads'] = concurrency.limit
+        fragment_observer = FragmentObserver(concurrency, lambda: throttle.waited)
+    # Số liệu của job để cập nhật thông số đã học của host
+    sample = JobSample()
+
+    def on_retry(kind):
+        sample.on_retry(kind)
+        if fragment_observer:
+            fragment_observer.on_retry(kind)
+
+    temp_manifest = get_manifest(output_folder)
+    temp_names = {}  # filename -> tmpfilename của stream đang tải
+    # Tiến độ được gộp trước khi phát lên event bus (và status_callback cũ)
+    progress = ProgressThrottle(status_callback.progress)
+
     def hook(d):
+        # Chặn thread đang tải khi job vượt phần băng thông của nó
+        throttle.hook(d)
+        sample.hook(d)
+        if fragment_observer:
+            fragment_observer.hook(d)
+        
+        # Ghi nhận file tạm để lần dọn sau không phải quét cả thư mục.
+        # Hook 'finished' không có tmpfilename: tra theo filename đã ghi nhận
         if d['status'] == 'downloading':
-            percent = d.get('_percent_str', '').strip()
-            speed = d.get('_speed_str', '').strip()
-            eta = d.get('_eta_str', '').strip()
-            
-            # Thêm thông tin fragment
-            fragment_info = ""
-            if 'fragment_index' in d and 'fragment_count' in d:
-                current_frag = d.get('fragment_index', 0)
-                total_frags = d.get('fragment_count', 0)
-                if total_frags > 0:
-                    fragment_info = f" | Fragment: {current_frag}/{total_frags}"
-            
-            if status_callback:
-                status_text = f"📥 Đang tải: {percent} | Tốc độ: {speed}"
-                if eta:
-                    status_text += f" | Còn lại: {eta}"
-                if fragment_info:
-                    status_text += fragment_info
-                status_callback(status_text, "blue")
+            if d.get('tmpfilename'):
+                temp_names[d.get('filename')] = d['tmpfilename']
+            temp_manifest.record(d.get('tmpfilename'))
+        elif d['status'] == 'finished' and d.get('filename'):
+            temp_manifest.discard(d.get('tmpfilename') or temp_names.pop(d['filename'], None)
+                                  or d['filename'] + '.part')
+        
+        if d['status'] == 'downloading':
+            progress.update(
+                d.get('downloaded_bytes') or 0,
+                d.get('total_bytes') or d.get('total_bytes_estimate'),
+                speed=d.get('speed'),
+                eta=d.get('eta'),
+                fragment_index=d.get('fragment_index'),
+                fragment_count=d.get('fragment_count'),
+                filename=d.get('filename'),
+            )
         elif d['status'] == 'finished':
+            progress.finish(d.get('downloaded_bytes') or d.get('total_bytes') or 0,
+                            d.get('total_bytes'), filename=d.get('filename'))
             if status_callback:
                 status_callback("✅ Hoàn tất tải video!", "green")
         elif d['status'] == 'error':
@@ -238,6 +403,9 @@ def download_video(url, output_folder, cookie_file=None, status_callback=None, o
         'outtmpl': os.path.join(output_folder, '%(title)s.%(ext)s'),
         'paths': {'home': output_folder, 'temp': output_folder},
         'progress_hooks': [hook],
+        'post_hooks': output_hooks(status_callback),
+        'retry_sleep_functions': retry_sleep_functions(
+            status_callback, host, on_retry),
         # Tối ưu và an toàn cho Windows: tránh lỗi tên file/đường dẫn
         'windowsfilenames': True,
         'restrictfilenames': True if os.name == 'nt' else config.get('restrictfilenames', False),
@@ -251,7 +419,6 @@ def download_video(url, output_folder, cookie_file=None, status_callback=None, o
         
         # Cải thiện xử lý fragment để tránh lỗi
         'fragment_retries': config.get('fragment_retries', 5),  # Sử dụng config từ mode
-        'retry_sleep': config.get('retry_sleep', 2),       # Sử dụng config từ mode
         'file_access_retries': config.get('file_access_retries', 5), # Sử dụng config từ mode
         'skip_unavailable_fragments': config.get('skip_unavailable_fragments', True), # Bỏ qua fragment không có sẵn
         
@@ -270,92 +437,72 @@ def download_video(url, output_folder, cookie_file=None, status_callback=None, o
             if status_callback:
                 status_callback("⚠️ Cookie file không hợp lệ hoặc không tồn tại", "orange")
 
+    # Phân loại lỗi của lần thử gần nhất (core.errors)
+    last_error = None
+
     # Hàm thực hiện download với retry
-    def attempt_download(ydl_opts, attempt_number=1):
+    def attempt_download(ydl_opts, attempt_number=1, stage='main'):
+        nonlocal last_error
         try:
             # Clean up any existing temporary files before starting
             if attempt_number == 1:
                 cleanup_temp_files(output_folder)
             
-            # Thêm delay trước khi bắt đầu download để tránh race condition
-            if attempt_number > 1:
-                import time
-                time.sleep(3)
-            
             # Log the configuration being used for debugging
             if status_callback and attempt_number == 1:
                 status_callback(f"🔧 Cấu hình download: {ydl_opts.get('concurrent_fragment_downloads', 'N/A')} fragment đồng thời", "blue")
             
-            with YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            # Chế độ an toàn giữ cố định 1 fragment một lúc
+            adaptive = concurrency if stage != 'safe_fallback' else None
+            with job_stage(status_callback, stage), ydl_session(ydl_opts) as ydl, \
+                    controlled_concurrency(ydl.params, adaptive):
+                sample.track(ydl.params, optimize_mode if stage != 'safe_fallback' else 'safe')
+                download_with_cached_info(ydl, url)
             return True  # Thành công
-        except DownloadError as e:
+        except Exception as e:
             error_msg = str(e)
+            error = last_error = classify_error(e)
+            is_download_error = type(e).__name__ == 'DownloadError'
             
             # Log the specific error for debugging
             if status_callback:
-                status_callback(f"⚠️ Lỗi yt-dlp: {error_msg[:100]}...", "orange")
+                if is_download_error:
+                    status_callback(f"⚠️ Lỗi yt-dlp ({error.reason}): {error_msg[:100]}...", "orange")
+                else:
+                    status_callback(f"❌ Lỗi không xác định: {error_msg[:100]}...", "red")
             
-            # Xử lý các lỗi fragment cụ thể - mở rộng để bắt nhiều loại lỗi hơn
-            fragment_errors = [
-                "fragment 1 not found",
-                "fragment not found",
-                "No such file or directory",
-                "fragment download failed",
-                "unable to continue",
-                "fragment",
-                "segment",
-                "chunk",
-                "part",
-                "download failed",
-                "network error",
-                "connection error",
-                "timeout",
-                "retry",
-                "failed to download"
-            ]
+            # Lỗi vĩnh viễn (404, riêng tư, chặn theo vùng...): không thử lại
+            if error.fatal:
+                if status_callback:
+                    status_callback(f"❌ Không thể tải ({error.reason}): {error_msg.splitlines()[0]}", "red")
+                return False
             
-            is_fragment_error = any(err in error_msg.lower() for err in fragment_errors)
+            is_fragment_error = error.reason == 'fragment'
             
-            if is_fragment_error and attempt_number < max_retries:
+            if is_download_error and error.retryable and attempt_number < max_retries:
                 if status_callback:
-                    status_callback(f"⚠️ Lần thử {attempt_number}: Lỗi fragment, thử lại với cài đặt an toàn hơn...", "orange")
+                    status_callback(f"⚠️ Lần thử {attempt_number}: Lỗi tạm thời ({error.reason}), thử lại với cài đặt an toàn hơn...", "orange")
                 
                 # Giảm concurrent downloads và thử lại với cài đặt an toàn
                 retry_opts = ydl_opts.copy()
-                retry_opts['concurrent_fragment_downloads'] = max(1, retry_opts.get('concurrent_fragment_downloads', 4) // 2)
+                if concurrency:
+                    retry_opts['concurrent_fragment_downloads'] = concurrency.back_off()
+                else:
+                    retry_opts['concurrent_fragment_downloads'] = max(1, retry_opts.get('concurrent_fragment_downloads', 4) // 2)
                 retry_opts['fragment_retries'] = 10  # Tăng retry cho fragment
-                retry_opts['retry_sleep'] = 3        # Tăng thời gian chờ
                 retry_opts['file_access_retries'] = 8  # Tăng retry cho file access
                 retry_opts['skip_unavailable_fragments'] = True  # Bỏ qua fragment không có sẵn
                 
-
+                # Chờ theo backoff + jitter (hoặc Retry-After) và lượt retry của host
+                # (attempt_number đếm từ 1, RetryPolicy đếm lần retry từ 0)
+                retry_policy.wait(host, attempt_number - 1, error.retry_after)
                 
-                # Thêm delay trước khi retry
-                import time
-                time.sleep(2)
-                
-                return attempt_download(retry_opts, attempt_number + 1)
-            else:
-                if status_callback:
-                    if is_fragment_error:
-                        status_callback("❌ Lỗi fragment: Không thể tải một số phần của video.", "red")
-                        status_callback("💡 Thử giảm chế độ tối ưu hóa hoặc kiểm tra kết nối mạng.", "orange")
-                        status_callback("💡 Nếu vẫn lỗi, thử chế độ 'Cân bằng' thay vì 'Chất lượng cao'.", "orange")
-                        status_callback("🔧 Hệ thống đã thử tự động khắc phục và fallback về chế độ an toàn.", "blue")
-                    else:
-                        status_callback(f"❌ Không thể tải: {error_msg.splitlines()[0]}", "red")
-                return False
-        except Exception as e:
-            # Catch any other unexpected errors
-            error_msg = str(e)
-            if status_callback:
-                status_callback(f"❌ Lỗi không xác định: {error_msg[:100]}...", "red")
-                status_callback("🔧 Đang thử khắc phục tự động...", "blue")
+                return attempt_download(retry_opts, attempt_number + 1, 'retry')
             
-            # Try to recover from unexpected errors
-            if attempt_number < max_retries:
+            if not is_download_error and attempt_number < max_retries:
+                # Try to recover from unexpected errors
                 if status_callback:
+                    status_callback("🔧 Đang thử khắc phục tự động...", "blue")
                     status_callback(f"🔄 Lần thử {attempt_number}: Thử lại với cài đặt an toàn...", "orange")
                 
                 # Use safe fallback for unexpected errors
@@ -363,6 +510,8 @@ def download_video(url, output_folder, cookie_file=None, status_callback=None, o
                     'outtmpl': os.path.join(output_folder, '%(title)s.%(ext)s'),
                     'paths': {'home': output_folder, 'temp': output_folder},
                     'progress_hooks': [hook],
+                    'post_hooks': output_hooks(status_callback),
+                    'retry_sleep_functions': retry_sleep_functions(status_callback, host),
                     'windowsfilenames': True,
                     'restrictfilenames': True if os.name == 'nt' else False,
                     'trim_file_name': 120,
@@ -379,21 +528,45 @@ def download_video(url, output_folder, cookie_file=None, status_callback=None, o
                         cookie_opts = convert_cookies_to_yt_dlp_format(cookie_file)
                         safe_opts.update(cookie_opts)
                 
-                return attempt_download(safe_opts, attempt_number + 1)
+                retry_policy.wait(host, attempt_number - 1, error.retry_after)
+                return attempt_download(safe_opts, attempt_number + 1, 'safe_fallback')
             
             if status_callback:
-                status_callback("❌ Không thể khắc phục lỗi sau nhiều lần thử.", "red")
+                if is_fragment_error:
+                    status_callback("❌ Lỗi fragment: Không thể tải một số phần của video.", "red")
+                    status_callback("💡 Thử giảm chế độ tối ưu hóa hoặc kiểm tra kết nối mạng.", "orange")
+                    status_callback("💡 Nếu vẫn lỗi, thử chế độ 'Cân bằng' thay vì 'Chất lượng cao'.", "orange")
+                    status_callback("🔧 Hệ thống đã thử tự động khắc phục và fallback về chế độ an toàn.", "blue")
+                elif is_download_error:
+                    status_callback(f"❌ Không thể tải: {error_msg.splitlines()[0]}", "red")
+                else:
+                    status_callback("❌ Không thể khắc phục lỗi sau nhiều lần thử.", "red")
             return False
 
     # Thực hiện download với retry
     success = attempt_download(ydl_opts)
     
+    # Lỗi vĩnh viễn (404, riêng tư...) không nói gì về tốc độ/độ ổn định của host
+    if tuning_store and (success or last_error is None or not last_error.fatal):
+        # Job bị giới hạn băng thông: tốc độ đo được là của giới hạn, không ghi làm throughput của host
+        sample.throttled = throttle.limited
+        try:
+            tuning_store.record(host, sample, success)
+        except sqlite3.Error as e:
+            print(f"⚠️ Không ghi được thông số theo host: {e}")
+    
+    # Lỗi vĩnh viễn: phương pháp thay thế cũng sẽ thất bại
+    if not success and last_error is not None and last_error.fatal:
+        if status_callback:
+            status_callback(f"⛔ Lỗi không thể khắc phục ({last_error.reason}), bỏ qua các phương pháp thay thế", "red")
+        return False
+    
     # Nếu main download thất bại, thử các phương pháp thay thế
     if not success and status_callback:
         status_callback("🔄 Main download thất bại, thử các phương pháp thay thế...", "orange")
         
         # Try alternative download methods
-        alt_success = try_alternative_download_methods(url, output_folder, cookie_file, status_callback)
+        alt_success = try_alternative_download_methods(url, output_folder, cookie_file, status_callback, throttle)
         
         if alt_success:
             if status_callback:
@@ -410,40 +583,40 @@ def download_video(url, output_folder, cookie_file=None, status_callback=None, o
     return success
 
 
-def try_alternative_download_methods(url, output_folder, cookie_file, status_callback):
+def try_alternative_download_methods(url, output_folder, cookie_file, status_callback, throttle=None):
     """
     Try alternative download methods when the main method fails
     """
     alternative_methods = [
         {
             'name': 'Chế độ đơn giản',
+            'stage': 'alt:simple',
             'config': {
                 'format': 'best[ext=mp4]/best',
                 'concurrent_fragment_downloads': 1,
                 'fragment_retries': 3,
-                'retry_sleep': 2,
                 'skip_unavailable_fragments': True,
                 'prefer_ffmpeg': False,
             }
         },
         {
             'name': 'Chế độ audio-only',
+            'stage': 'alt:audio_only',
             'config': {
                 'format': 'bestaudio[ext=m4a]/bestaudio',
                 'concurrent_fragment_downloads': 1,
                 'fragment_retries': 3,
-                'retry_sleep': 2,
                 'skip_unavailable_fragments': True,
                 'prefer_ffmpeg': False,
             }
         },
         {
             'name': 'Chế độ tối thiểu',
+            'stage': 'alt:minimal',
             'config': {
                 'format': 'worst[ext=mp4]/worst',
                 'concurrent_fragment_downloads': 1,
                 'fragment_retries': 5,
-                'retry_sleep': 3,
                 'skip_unavailable_fragments': True,
                 'prefer_ffmpeg': False,
                 'nocheckcertificate': True,
@@ -468,6 +641,9 @@ def try_alternative_download_methods(url, output_folder, cookie_file, status_cal
                 'nopart': False,
                 'updatetime': False,
                 'writethumbnail': False,
+                'progress_hooks': [throttle.hook] if throttle else [],
+                'post_hooks': output_hooks(status_callback),
+                'retry_sleep_functions': retry_sleep_functions(status_callback, get_host(url)),
                 **method['config'],
             }
             
@@ -477,9 +653,9 @@ def try_alternative_download_methods(url, output_folder, cookie_file, status_cal
                     cookie_opts = convert_cookies_to_yt_dlp_format(cookie_file)
                     method_opts.update(cookie_opts)
             
-            # Try download with this method
-            with YoutubeDL(method_opts) as ydl:
-                ydl.download([url])
+            # Try download with this method (dùng lại instance trong pool)
+            with job_stage(status_callback, method['stage']), ydl_session(method_opts) as ydl:
+                download_with_cached_info(ydl, url)
             
             if status_callback:
                 status_callback(f"✅ Thành công với phương pháp: {method['name']}", "green")
@@ -488,6 +664,9 @@ def try_alternative_download_methods(url, output_folder, cookie_file, status_cal
         except Exception as e:
             if status_callback:
                 status_callback(f"❌ Phương pháp {method['name']} thất bại: {str(e)[:50]}...", "orange")
+            # Lỗi vĩnh viễn thì các phương pháp còn lại cũng không giúp được
+            if classify_error(e).fatal:
+                break
             continue
     
     if status_callback:
@@ -0,0 +1,248 @@
+# core/errors.py
+"""
+Phân loại lỗi tải để quyết định retry, giảm cấu hình hay dừng ngay
+
+- RETRY: lỗi tạm thời (mạng, timeout, 5xx, 429, fragment) -> thử lại cùng cách
+- DEGRADE: cách tải hiện tại không hợp (format, merge/ffmpeg, lỗi chưa rõ)
+  -> chuyển sang cấu hình an toàn/phương pháp thay thế
+- FAIL_FAST: lỗi vĩnh viễn (404/410, video riêng tư, chặn theo vùng, URL
+  không hỗ trợ, hết dung lượng đĩa) -> báo lỗi ngay, không fallback
+"""
+
+import errno
+import socket
+import sys
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from types import SimpleNamespace
+from typing import Optional
+
+RETRY = 'retry'
+DEGRADE = 'degrade'
+FAIL_FAST = 'fail_fast'
+
+
+@dataclass
+class ErrorClass:
+    """Kết quả phân loại một lỗi"""
+    action: str                         # RETRY, DEGRADE hoặc FAIL_FAST
+    reason: str                         # nhãn ngắn: 'http_404', 'geo_restricted', 'network'...
+    message: str = ''
+    status: Optional[int] = None        # HTTP status nếu có
+    retry_after: Optional[float] = None  # giây, từ header Retry-After
+    refresh_info: bool = False          # URL có chữ ký có thể đã hết hạn, cần extract lại
+
+    @property
+    def retryable(self):
+        return self.action == RETRY
+
+    @property
+    def fatal(self):
+        return self.action == FAIL_FAST
+
+
+# Thông báo lỗi của extractor không có class riêng (so khớp chữ thường)
+_FAIL_FAST_MESSAGES = (
+    ('private video', 'private'),
+    ('this video is private', 'private'),
+    ('video unavailable', 'unavailable'),
+    ('this video is unavailable', 'unavailable'),
+    ('has been removed', 'removed'),
+    ('no longer available', 'removed'),
+    ('account associated with this video has been terminated', 'removed'),
+    ('copyright', 'removed'),
+    ('not available in your country', 'geo_restricted'),
+    ('geo restricted', 'geo_restricted'),
+    ('members-only', 'login_required'),
+    ('join this channel', 'login_required'),
+    ('sign in to confirm your age', 'login_required'),
+    ('login required', 'login_required'),
+    ('requires authentication', 'login_required'),
+    ('unsupported url', 'unsupported_url'),
+    ('is not a valid url', 'unsupported_url'),
+    ('no video formats found', 'no_formats'),
+    ('premieres in', 'not_live_yet'),
+    ('live event will begin', 'not_live_yet'),
+)
+
+_DEGRADE_MESSAGES = (
+    ('requested format is not available', 'format_unavailable'),
+    ('ffmpeg', 'postprocessing'),
+    ('merging', 'postprocessing'),
+)
+
+_RETRY_MESSAGES = (
+    ('timed out', 'timeout'),
+    ('timeout', 'timeout'),
+    ('connection reset', 'network'),
+    ('connection refused', 'network'),
+    ('connection aborted', 'network'),
+    ('temporary failure', 'network'),
+    ('network is unreachable', 'network'),
+    ('remote end closed', 'network'),
+    ('fragment', 'fragment'),
+    ('incomplete read', 'incomplete'),
+    ('did not get any data blocks', 'incomplete'),
+    ('too many requests', 'rate_limited'),
+)
+
+# Tên class của requests (không import requests ở đây)
+_REQUESTS_TRANSIENT = ('ConnectionError', 'Timeout', 'ReadTimeout', 'ConnectTimeout',
+                       'ChunkedEncodingError', 'ContentDecodingError')
+
+_DISK_FULL_ERRNOS = (errno.ENOSPC, getattr(errno, 'EDQUOT', errno.ENOSPC))
+
+
+class _NotLoaded(Exception):
+    """Thay cho lớp lỗi của yt-dlp khi yt_dlp chưa được import (không khớp lỗi nào)"""
+
+
+_YT_DLP_ERROR_NAMES = ('ContentTooShortError', 'DownloadError', 'ExtractorError', 'GeoRestrictedError',
+                       'PostProcessingError', 'UnsupportedError', 'HTTPError', 'IncompleteRead',
+                       'TransportError')
+_yt_dlp_not_loaded = SimpleNamespace(**dict.fromkeys(_YT_DLP_ERROR_NAMES, _NotLoaded))
+_yt_dlp_error_classes = None
+
+
+def _yt_dlp_errors():
+    """
+    Các lớp lỗi của yt-dlp. Chưa import yt_dlp thì không thể có lỗi của nó, nên
+    phân loại lỗi OneDrive/requests không kéo theo import yt_dlp.
+    """
+    global _yt_dlp_error_classes
+    if _yt_dlp_error_classes is not None:
+        return _yt_dlp_error_classes
+    if 'yt_dlp' not in sys.modules:
+        return _yt_dlp_not_loaded
+    from yt_dlp import utils
+    from yt_dlp.networking import exceptions
+    _yt_dlp_error_classes = SimpleNamespace(**{
+        name: getattr(exceptions, name, None) or getattr(utils, name) for name in _YT_DLP_ERROR_NAMES})
+    return _yt_dlp_error_classes
+
+
+def _causes(error):
+    """Chuỗi lỗi: DownloadError -> exc_info, ExtractorError.cause, __cause__..."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        exc_info = getattr(error, 'exc_info', None)
+        if isinstance(exc_info, tuple) and len(exc_info) > 1 and exc_info[1] is not None:
+            error = exc_info[1]
+        elif isinstance(getattr(error, 'cause', None), BaseException):
+            error = error.cause
+        else:
+            error = error.__cause__ or error.__context__
+
+
+def _http_status(error):
+    status = getattr(error, 'status', None)
+    if isinstance(status, int):
+        return status
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(response, 'status', None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    return parse_retry_after(value)
+
+
+def parse_retry_after(value):
+    """
+    Đọc header Retry-After (số giây hoặc HTTP-date) thành số giây chờ
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def classify_status(status, retry_after=None, message=''):
+    """
+    Phân loại theo HTTP status code
+    """
+    if status in (404, 410):
+        # 410 của URL media có chữ ký thường là hết hạn: extract lại một lần
+        return ErrorClass(FAIL_FAST, f'http_{status}', message, status, refresh_info=status == 410)
+    if status == 403:
+        # URL có chữ ký hết hạn hoặc bị chặn tạm: lấy info mới rồi thử lại
+        return ErrorClass(RETRY, 'http_403', message, status, refresh_info=True)
+    if status == 401:
+        return ErrorClass(FAIL_FAST, 'login_required', message, status)
+    if status in (408, 425, 429) or (status is not None and status >= 500):
+        reason = 'rate_limited' if status == 429 else f'http_{status}'
+        return ErrorClass(RETRY, reason, message, status, retry_after)
+    if status == 416:
+        # Range không hợp lệ (file .part hỏng): tải lại từ đầu bằng cấu hình khác
+        return ErrorClass(DEGRADE, 'http_416', message, status)
+    return ErrorClass(FAIL_FAST, f'http_{status}', message, status)
+
+
+def classify_error(error):
+    """
+    Phân loại một exception (DownloadError của yt-dlp, lỗi requests, OSError...)
+    """
+    message = str(error)
+    yt = _yt_dlp_errors()
+    for cause in _causes(error):
+        status = _http_status(cause)
+        if status is not None and (isinstance(cause, yt.HTTPError)
+                                   or type(cause).__module__.startswith('requests')):
+            return classify_status(status, _retry_after(cause), message)
+        if isinstance(cause, yt.GeoRestrictedError):
+            return ErrorClass(FAIL_FAST, 'geo_restricted', message)
+        if isinstance(cause, yt.UnsupportedError):
+            return ErrorClass(FAIL_FAST, 'unsupported_url', message)
+        if isinstance(cause, yt.PostProcessingError):
+            return ErrorClass(DEGRADE, 'postprocessing', message)
+        if isinstance(cause, (yt.ContentTooShortError, yt.IncompleteRead)):
+            return ErrorClass(RETRY, 'incomplete', message)
+        if isinstance(cause, yt.TransportError):
+            return ErrorClass(RETRY, 'network', message)
+        if isinstance(cause, (socket.timeout, TimeoutError)):
+            return ErrorClass(RETRY, 'timeout', message)
+        if isinstance(cause, ConnectionError):
+            return ErrorClass(RETRY, 'network', message)
+        if type(cause).__module__.startswith('requests') and type(cause).__name__ in _REQUESTS_TRANSIENT:
+            return ErrorClass(RETRY, 'network', message)
+        if isinstance(cause, OSError) and getattr(cause, 'errno', None) is not None:
+            if cause.errno in _DISK_FULL_ERRNOS:
+                return ErrorClass(FAIL_FAST, 'disk_full', message)
+            if cause.errno in (errno.EACCES, errno.EPERM, errno.EROFS):
+                return ErrorClass(FAIL_FAST, 'permission_denied', message)
+            return ErrorClass(RETRY, 'file_access', message)
+        if isinstance(cause, yt.ExtractorError) and getattr(cause, 'expected', False):
+            # Lỗi "expected" của extractor là lỗi của nội dung, không phải của mạng
+            matched = _match_message(str(cause), _DEGRADE_MESSAGES, DEGRADE)
+            return matched or _match_message(str(cause), _FAIL_FAST_MESSAGES, FAIL_FAST) \
+                or ErrorClass(FAIL_FAST, 'extractor', message)
+
+    return (_match_message(message, _FAIL_FAST_MESSAGES, FAIL_FAST)
+            or _match_message(message, _DEGRADE_MESSAGES, DEGRADE)
+            or _match_message(message, _RETRY_MESSAGES, RETRY)
+            # Lỗi chưa rõ: giữ cách cũ là chuyển sang cấu hình/phương pháp khác
+            or ErrorClass(DEGRADE, type(error).__name__ if not isinstance(error, yt.DownloadError) else 'unknown',
+                          message))
+
+
+def _match_message(message, table, action):
+    lowered = message.lower()
+    for needle, reason in table:
+        if needle in lowered:
+            return ErrorClass(action, reason, message)
+    return None
@@ -0,0 +1,249 @@
+# core/events.py
+"""
+Event bus cho tiến độ và trạng thái tải
+
+Downloader, controller và CLI phát sự kiện có cấu trúc (ProgressEvent,
+StatusEvent, JobEvent) lên bus; GUI, CLI và bộ metrics đăng ký nhận. Việc
+publish chỉ đưa sự kiện vào hàng đợi, subscriber chạy trên một thread
+dispatcher riêng nên không làm chậm progress hook của downloader.
+"""
+
+import itertools
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .progress import ProgressEvent, format_progress_event
+
+
+@dataclass
+class StatusEvent:
+    """Thông báo trạng thái dạng text (màu giống status_callback cũ)"""
+    message: str
+    color: str = 'blue'
+    job_id: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass
+class JobEvent:
+    """Vòng đời của một job: 'started', 'finished', 'failed'"""
+    phase: str
+    job_id: Optional[str] = None
+    url: Optional[str] = None
+    duration: Optional[float] = None
+    reason: Optional[str] = None
+    output_path: Optional[str] = None   # file đã lưu (job 'finished')
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass
+class StageEvent:
+    """Một giai đoạn tải đã kết thúc (main, retry, safe_fallback, alt:...)"""
+    stage: str
+    job_id: Optional[str] = None
+    duration: float = 0.0
+    success: bool = False
+    reason: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass
+class RetryEvent:
+    """yt-dlp thử lại một request ('fragment', 'http', ...)"""
+    kind: str
+    job_id: Optional[str] = None
+    attempt: int = 1
+    timestamp: float = field(default_factory=time.time)
+
+
+def failure_reason(error):
+    """
+    Lý do lỗi ngắn gọn để thống kê: nhãn của core.errors (http_404,
+    geo_restricted, network...), nếu không được thì tên class của lỗi gốc
+    """
+    try:
+        from .errors import classify_error
+        return classify_error(error).reason
+    except ImportError:
+        pass
+    exc_info = getattr(error, 'exc_info', None)
+    if exc_info and exc_info[1] is not None:
+        error = exc_info[1]
+    return type(error).__name__
+
+
+_job_counter = itertools.count(1)
+
+
+def new_job_id(prefix='job'):
+    """Tạo job id duy nhất trong process, vd. 'video-3'"""
+    return f"{prefix}-{next(_job_counter)}"
+
+
+class _FlushMarker:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class EventBus:
+    """
+    Publish/subscribe an toàn với nhiều thread
+
+    Khi hàng đợi đầy, ProgressEvent bị bỏ (sự kiện sau sẽ thay thế); các loại
+    sự kiện khác luôn được giao theo đúng thứ tự publish.
+    """
+
+    def __init__(self, max_queue=10000):
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._subscribers = {}
+        self._tokens = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, callback, event_types=None):
+        """
+        Đăng ký nhận sự kiện; event_types là class hoặc tuple class cần nhận
+        Trả về token dùng cho unsubscribe()
+        """
+        if event_types is not None and not isinstance(event_types, tuple):
+            event_types = (event_types,)
+        with self._lock:
+            token = next(self._tokens)
+            self._subscribers[token] = (callback, event_types)
+        return token
+
+    def unsubscribe(self, token):
+        with self._lock:
+            self._subscribers.pop(token, None)
+
+    def publish(self, event):
+        """Đưa sự kiện vào hàng đợi (không chờ subscriber xử lý)"""
+        self._ensure_dispatcher()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            if isinstance(event, ProgressEvent):
+                return
+            self._queue.put(event)
+
+    def flush(self, timeout=5.0):
+        """Chờ tới khi mọi sự kiện đã publish trước đó được giao xong"""
+        if self._thread is None or threading.current_thread() is self._thread:
+            return True
+        marker = _FlushMarker()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def _ensure_dispatcher(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch_loop, daemon=True,
+                                                name="event-bus")
+                self._thread.start()
+
+    def _dispatch_loop(self):
+        while True:
+            event = self._queue.get()
+            if isinstance(event, _FlushMarker):
+                event.done.set()
+                continue
+            with self._lock:
+                subscribers = list(self._subscribers.values())
+            for callback, event_types in subscribers:
+                if event_types is not None and not isinstance(event, event_types):
+                    continue
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"⚠️ Lỗi subscriber sự kiện: {e}")
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_event_bus():
+    """
+    Trả về event bus dùng chung cho toàn process
+    """
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = EventBus()
+        return _bus
+
+
+class JobReporter:
+    """
+    Status callback gắn với một job: mỗi lần gọi reporter(text, color) phát
+    StatusEvent lên bus (và gọi callback cũ nếu có).
+
+    reporter.progress(event) phát ProgressEvent đã gộp; callback cũ nhận
+    chuỗi đã format để tương thích với code dùng status_callback.
+    """
+
+    def __init__(self, job_id=None, url=None, callback=None, bus=None):
+        self.job_id = job_id or new_job_id()
+        self.url = url
+        self.callback = callback
+        self.bus = bus or get_event_bus()
+        self._started_at = None
+        self.last_failure = None
+        self.output_path = None
+
+    def __call__(self, message, color='blue'):
+        self.bus.publish(StatusEvent(message=message, color=color, job_id=self.job_id))
+        if self.callback:
+            self.callback(message, color)
+
+    def progress(self, event):
+        event.job_id = self.job_id
+        self.bus.publish(event)
+        if self.callback and event.phase == 'downloading':
+            self.callback(format_progress_event(event), "blue")
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Đo thời gian một giai đoạn tải:
+            with reporter.stage('main'):
+                ydl.download([url])
+        """
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            reason = failure_reason(e)
+            # Lỗi của giai đoạn đầu tiên thường là nguyên nhân thật (các fallback sau lỗi theo)
+            if self.last_failure is None:
+                self.last_failure = reason
+            self.bus.publish(StageEvent(stage=name, job_id=self.job_id, duration=time.monotonic() - started,
+                                        success=False, reason=reason))
+            raise
+        self.bus.publish(StageEvent(stage=name, job_id=self.job_id, duration=time.monotonic() - started,
+                                    success=True))
+
+    def retry(self, kind, attempt):
+        self.bus.publish(RetryEvent(kind=kind, job_id=self.job_id, attempt=attempt))
+
+    def saved(self, filepath):
+        """File cuối cùng của job (post hook của yt-dlp, hoặc engine tải khác)"""
+        self.output_path = filepath
+
+    def started(self):
+        self._started_at = time.monotonic()
+        self.bus.publish(JobEvent(phase='started', job_id=self.job_id, url=self.url))
+
+    def finished(self, success, reason=None):
+        if not success and reason is None:
+            reason = self.last_failure or 'unknown'
+        duration = time.monotonic() - self._started_at if self._started_at else None
+        self.bus.publish(JobEvent(phase='finished' if success else 'failed', job_id=self.job_id,
+                                  url=self.url, duration=duration, reason=reason,
+                                  output_path=self.output_path))
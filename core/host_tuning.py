@@ -0,0 +1,251 @@
+# core/host_tuning.py
+"""
+Thông số tải đã học theo từng host (SQLite)
+
+Sau mỗi job, JobSample ghi lại cho host: throughput, tỉ lệ retry fragment và
+throughput của từng cặp (số fragment đồng thời, http_chunk_size) đã dùng,
+theo mode tải. Job sau trên cùng host và mode bắt đầu từ cặp có throughput cao
+nhất (controller AIMD của core/adaptive.py được khởi tạo với số fragment đó)
+thay vì học lại từ giá trị mặc định; host hay lỗi fragment được tải với cài
+đặt thận trọng.
+
+Số liệu là trung bình trượt (EWMA) nên thay đổi của mạng/CDN được cập nhật
+dần; số liệu cũ hơn max_age_days bị bỏ. Một cặp chỉ được chọn khi đã có ít
+nhất min_samples job và còn được dùng trong settings_window_days trước job
+gần nhất của host (một lần đo may mắn cũ không thắng mãi).
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from .config import HOST_TUNING_CONFIG
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY,
+    jobs INTEGER NOT NULL DEFAULT 0,
+    failed_jobs INTEGER NOT NULL DEFAULT 0,
+    throughput REAL,
+    error_rate REAL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS host_settings (
+    host TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    concurrency INTEGER NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    throughput REAL NOT NULL,
+    samples INTEGER NOT NULL DEFAULT 1,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (host, mode, concurrency, chunk_size)
+) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class HostTuning:
+    """Số liệu đã học của một host"""
+    host: str
+    jobs: int = 0
+    failed_jobs: int = 0
+    throughput: Optional[float] = None      # byte/giây (EWMA)
+    error_rate: Optional[float] = None      # retry / (fragment + retry) (EWMA)
+    concurrency: Optional[int] = None       # Số fragment đồng thời tốt nhất
+    chunk_size: Optional[int] = None        # http_chunk_size đi kèm
+    updated_at: float = 0.0
+
+    @property
+    def unstable(self):
+        """Host hay phải retry fragment"""
+        return (self.error_rate or 0.0) > HOST_TUNING_CONFIG['unstable_error_rate']
+
+
+class JobSample:
+    """
+    Số liệu của một job từ progress hook và retry hook của yt-dlp
+
+    Throughput của mỗi stream được tính cho (mode, concurrent_fragment_downloads,
+    http_chunk_size) trong params của YoutubeDL lúc stream bắt đầu (gọi track()
+    với ydl.params và mode trước khi tải).
+    """
+
+    def __init__(self):
+        self.fragments = 0
+        self.errors = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.settings = {}          # (mode, concurrency, chunk_size) -> [bytes, seconds]
+        self.throttled = False      # Bị giới hạn băng thông chặn: throughput là của giới hạn
+        self._params = {}
+        self._mode = None
+        self._streams = {}          # filename -> (bắt đầu, (mode, concurrency, chunk_size), fragment cuối)
+
+    def track(self, params, mode):
+        self._params = params
+        self._mode = mode
+
+    def hook(self, d):
+        # Hook 'finished' của tải fragment không có tmpfilename
+        stream = d.get('filename')
+        if d.get('status') == 'downloading':
+            state = self._streams.get(stream)
+            if state is None:
+                key = (self._mode, self._params.get('concurrent_fragment_downloads') or 1,
+                       self._params.get('http_chunk_size') or 0)
+                state = (time.monotonic(), key, 0)
+            index = d.get('fragment_index')
+            if index is not None:
+                state = state[:2] + (max(state[2], index),)
+            self._streams[stream] = state
+        elif d.get('status') == 'finished':
+            state = self._streams.pop(stream, None)
+            if state is None:
+                return  # File đã có sẵn, không tải gì
+            started, key, fragments = state
+            seconds = time.monotonic() - started
+            nbytes = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+            self.fragments += fragments
+            self.bytes += nbytes
+            self.seconds += seconds
+            totals = self.settings.setdefault(key, [0, 0.0])
+            totals[0] += nbytes
+            totals[1] += seconds
+
+    def on_retry(self, kind):
+        if kind == 'fragment':
+            self.errors += 1
+
+    @property
+    def throughput(self):
+        return self.bytes / self.seconds if self.seconds > 0 else None
+
+    @property
+    def error_rate(self):
+        attempts = self.fragments + self.errors
+        return self.errors / attempts if attempts else None
+
+
+def _ewma(old, new, weight):
+    if new is None:
+        return old
+    return new if old is None else (1 - weight) * old + weight * new
+
+
+class HostTuningStore:
+    """
+    Store SQLite dùng chung giữa các thread (một connection, có lock)
+    """
+
+    def __init__(self, path=None):
+        self.path = path or HOST_TUNING_CONFIG['path']
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+            cutoff = self._cutoff()
+            self._conn.execute('DELETE FROM hosts WHERE updated_at < ?', (cutoff,))
+            self._conn.execute('DELETE FROM host_settings WHERE updated_at < ?', (cutoff,))
+            self._conn.commit()
+
+    @staticmethod
+    def _cutoff():
+        return time.time() - HOST_TUNING_CONFIG['max_age_days'] * 86400
+
+    def lookup(self, host, mode=None):
+        """
+        Số liệu đã học của host, hoặc None nếu chưa có (hoặc đã quá cũ).
+        concurrency/chunk_size là cặp tốt nhất đã đo với mode này.
+        """
+        if not host:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT * FROM hosts WHERE host = ? AND updated_at >= ?', (host, self._cutoff())).fetchone()
+            if row is None:
+                return None
+            # Tuổi của cặp tính theo job gần nhất của host, không theo đồng hồ
+            since = row['updated_at'] - HOST_TUNING_CONFIG['settings_window_days'] * 86400
+            best = self._conn.execute(
+                'SELECT concurrency, chunk_size FROM host_settings '
+                'WHERE host = ? AND mode = ? AND samples >= ? AND updated_at >= ? '
+                'ORDER BY throughput DESC, concurrency ASC LIMIT 1',
+                (host, mode or '', HOST_TUNING_CONFIG['min_samples'], since)).fetchone()
+        tuning = HostTuning(**dict(row))
+        if best is not None:
+            tuning.concurrency = best['concurrency']
+            tuning.chunk_size = best['chunk_size'] or None
+        return tuning
+
+    def record(self, host, sample, success):
+        """
+        Ghi kết quả một job. Thông số chỉ được ghi từ job thành công và không
+        bị giới hạn băng thông; các job khác chỉ tính vào số job (lỗi) và tỉ lệ
+        retry fragment.
+        """
+        if not host:
+            return
+        weight = HOST_TUNING_CONFIG['smoothing']
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM hosts WHERE host = ?', (host,)).fetchone()
+            old = dict(row) if row else {'jobs': 0, 'failed_jobs': 0, 'throughput': None, 'error_rate': None}
+            measured = success and not sample.throttled
+            throughput = _ewma(old['throughput'], sample.throughput if measured else None, weight)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO hosts (host, jobs, failed_jobs, throughput, error_rate, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (host, old['jobs'] + 1, old['failed_jobs'] + (0 if success else 1), throughput,
+                 _ewma(old['error_rate'], sample.error_rate, weight), now))
+            if measured:
+                for (mode, concurrency, chunk_size), (nbytes, seconds) in sample.settings.items():
+                    if seconds <= 0:
+                        continue
+                    self._conn.execute(
+                        'INSERT INTO host_settings (host, mode, concurrency, chunk_size, throughput, updated_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?) '
+                        'ON CONFLICT (host, mode, concurrency, chunk_size) DO UPDATE SET '
+                        'throughput = (1 - ?) * throughput + ? * excluded.throughput, '
+                        'samples = samples + 1, updated_at = excluded.updated_at',
+                        (host, mode or '', concurrency, chunk_size, nbytes / seconds, now, weight, weight))
+            self._conn.commit()
+
+    def forget(self, host):
+        """Xóa số liệu đã học của host"""
+        with self._lock:
+            self._conn.execute('DELETE FROM hosts WHERE host = ?', (host,))
+            self._conn.execute('DELETE FROM host_settings WHERE host = ?', (host,))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_host_tuning_store():
+    """
+    Trả về store dùng chung, hoặc None nếu bị tắt / không mở được database
+    """
+    global _store
+    if not HOST_TUNING_CONFIG.get('enabled', True):
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = HostTuningStore()
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ Không mở được dữ liệu thông số theo host: {e}")
+                HOST_TUNING_CONFIG['enabled'] = False
+                return None
+        return _store
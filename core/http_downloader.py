@@ -0,0 +1,344 @@
+# core/http_downloader.py
+"""
+Engine tải file trực tiếp qua HTTP: chia segment, nhiều kết nối, resume
+
+- Server hỗ trợ Range: chia file thành segment và tải song song bằng Range request
+- Dữ liệu ghi vào file .part; tiến độ từng segment lưu trong manifest .part.json
+  để tiếp tục sau khi mất kết nối/crash
+- Server không hỗ trợ Range: tải một luồng như cũ (vẫn ghi vào .part)
+- Lỗi tạm thời (mạng, 5xx, 429) được retry theo RetryPolicy dùng chung;
+  segment tiếp tục từ byte đã tải
+- Có content_store: SHA-256 được tính trong lúc tải (tải một luồng: theo từng
+  chunk; tải theo segment: đọc lại phần đầu liên tục đã xong trong khi các
+  segment sau còn đang tải) rồi file được đưa vào kho theo nội dung
+- Mọi kết nối của file dùng chung phần băng thông của job (core/bandwidth.py)
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .bandwidth import get_bandwidth_limiter
+from .errors import classify_error
+from .profiles import http_download_settings
+from .progress import ProgressThrottle
+from .retry import get_retry_policy
+from .scheduler import get_host
+
+
+class RangeNotSupported(Exception):
+    """Server bỏ qua header Range (trả 200 thay vì 206)"""
+
+
+def _validator(headers):
+    """ETag hoặc Last-Modified để nhận biết file trên server có đổi không"""
+    return headers.get('etag') or headers.get('last-modified') or ''
+
+
+def supports_ranges(headers):
+    """
+    Kiểm tra response có cho phép tải theo Range không
+    """
+    encoding = (headers.get('content-encoding') or 'identity').lower()
+    return (
+        headers.get('accept-ranges', '').lower() == 'bytes'
+        and int(headers.get('content-length') or 0) > 0
+        and encoding == 'identity'
+    )
+
+
+class HttpFileDownloader:
+    """
+    Tải một URL về file_path qua session requests
+
+    progress_callback(ProgressEvent) được gọi đã gộp theo PROGRESS_CONFIG
+    """
+
+    def __init__(self, session, url, file_path, progress_callback=None,
+                 connections=None, min_segment_size=None, chunk_size=None,
+                 manifest_interval=None, timeout=None, retries=None, retry_policy=None,
+                 content_store=None, bandwidth_weight=None):
+        self.session = session
+        self.url = url
+        self.file_path = file_path
+        self.part_path = file_path + '.part'
+        self.manifest_path = file_path + '.part.json'
+        self._progress = ProgressThrottle(progress_callback) if progress_callback else None
+        settings = http_download_settings()  # HTTP_DOWNLOAD_CONFIG + profile đã đo
+        self.connections = max(1, connections or settings['connections'])
+        self.min_segment_size = min_segment_size or settings['min_segment_size']
+        self.chunk_size = chunk_size or settings['chunk_size']
+        self.manifest_interval = manifest_interval or settings['manifest_interval']
+        self.timeout = timeout or settings['timeout']
+        self.retries = settings['retries'] if retries is None else retries
+        self.retry_policy = retry_policy or get_retry_policy()
+        self.host = get_host(url)
+        self.content_store = content_store
+        self.bandwidth_weight = bandwidth_weight
+        self._throttle = None
+
+        self.total_size = 0
+        self.downloaded = 0
+        self._segments = []  # [start, end, done]
+        self._validator = ''
+        self._lock = threading.Lock()
+        self._last_manifest_save = 0.0
+        self._cancelled = threading.Event()
+        self._hasher = None
+        self._hashed = 0     # Số byte đầu file đã đưa vào hasher
+        self._hash_lock = threading.Lock()
+        self.digest = None
+
+    def download(self, response):
+        """
+        Tải file, dùng response đầu tiên (stream=True) để lấy header.
+        Trả về đường dẫn file hoàn tất.
+        """
+        with get_bandwidth_limiter().register(self.host, self.bandwidth_weight,
+                                              self._cancelled) as self._throttle:
+            self._download(response)
+
+        if self.content_store is not None:
+            self._advance_hash()
+            self.digest = self._hasher.hexdigest()
+            self.file_path = self.content_store.commit(self.part_path, self.digest, self.file_path)
+        else:
+            os.replace(self.part_path, self.file_path)
+        self._remove(self.manifest_path)
+        if self._progress:
+            self._progress.finish(self.downloaded, self.total_size or None,
+                                  filename=os.path.basename(self.file_path))
+        return self.file_path
+
+    def _download(self, response):
+        headers = response.headers
+        self.total_size = int(headers.get('content-length') or 0)
+        self._validator = _validator(headers)
+
+        if supports_ranges(headers):
+            response.close()
+            try:
+                self._download_ranges()
+            except RangeNotSupported:
+                # Server báo hỗ trợ Range nhưng không thực hiện: tải lại một luồng
+                self._remove(self.manifest_path)
+                self._cancelled.clear()
+                self._segments = []
+                self._download_single(self._request_full())
+        else:
+            self._remove(self.manifest_path)
+            self._download_single(response)
+
+    def cancel(self):
+        """Yêu cầu dừng các kết nối đang tải (manifest được giữ để resume)"""
+        self._cancelled.set()
+
+    # --- Tải theo segment ---
+
+    def _download_ranges(self):
+        if not self._load_manifest():
+            count = min(self.connections, max(1, math.ceil(self.total_size / self.min_segment_size)))
+            size = math.ceil(self.total_size / count)
+            self._segments = [
+                [start, min(start + size, self.total_size) - 1, 0]
+                for start in range(0, self.total_size, size)
+            ]
+            with open(self.part_path, 'wb') as f:
+                f.truncate(self.total_size)
+            self._save_manifest(force=True)
+
+        self.downloaded = sum(segment[2] for segment in self._segments)
+        self._report()
+        self._reset_hash()
+
+        pending = [segment for segment in self._segments if segment[2] < segment[1] - segment[0] + 1]
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.connections, len(pending))) as executor:
+                futures = [executor.submit(self._download_segment, segment) for segment in pending]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    self._cancelled.set()
+                    raise
+                finally:
+                    self._save_manifest(force=True)
+        if self._cancelled.is_set():
+            raise IOError("Đã hủy tải")
+
+    def _with_retry(self, func, *args):
+        """Gọi func, retry lỗi tạm thời theo RetryPolicy (chờ có thể bị cancel() ngắt)"""
+        attempt = 0
+        while True:
+            try:
+                return func(*args)
+            except RangeNotSupported:
+                raise
+            except Exception as e:
+                error = classify_error(e)
+                if self._cancelled.is_set() or not error.retryable or attempt >= self.retries:
+                    raise
+                self.retry_policy.wait(self.host, attempt, error.retry_after, self._cancelled)
+                attempt += 1
+
+    def _download_segment(self, segment):
+        self._with_retry(self._fetch_segment, segment)
+        self._advance_hash()
+
+    def _fetch_segment(self, segment):
+        start, end, done = segment
+        if done >= end - start + 1:
+            return
+        headers = {'Range': f'bytes={start + done}-{end}', 'Accept-Encoding': 'identity'}
+        if self._validator:
+            headers['If-Range'] = self._validator
+
+        with self.session.get(self.url, stream=True, timeout=self.timeout, headers=headers) as response:
+            if response.status_code == 200:
+                raise RangeNotSupported(self.url)
+            response.raise_for_status()
+            with open(self.part_path, 'r+b') as f:
+                f.seek(start + done)
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if self._cancelled.is_set():
+                        return
+                    if not chunk:
+                        continue
+                    chunk = chunk[:end - start + 1 - segment[2]]
+                    f.write(chunk)
+                    with self._lock:
+                        segment[2] += len(chunk)
+                        self.downloaded += len(chunk)
+                    self._report()
+                    self._save_manifest()
+                    self._throttle.consume(len(chunk))
+                    if segment[2] >= end - start + 1:
+                        break
+
+        if segment[2] < end - start + 1 and not self._cancelled.is_set():
+            raise ConnectionError(f"Kết nối bị đóng sớm ở byte {start + segment[2]}")
+
+    # --- Tải một luồng ---
+
+    def _request_full(self):
+        return self.session.get(self.url, stream=True, timeout=self.timeout,
+                                headers={'Accept-Encoding': 'identity'})
+
+    def _download_single(self, response):
+        # Không resume được khi server không hỗ trợ Range: retry thì tải lại từ đầu
+        pending = [response]
+
+        def attempt():
+            self._stream_single(pending.pop() if pending else self._request_full())
+
+        self._with_retry(attempt)
+
+    def _stream_single(self, response):
+        self.total_size = int(response.headers.get('content-length') or 0)
+        self.downloaded = 0
+        self._reset_hash()
+        try:
+            response.raise_for_status()
+            with open(self.part_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if self._cancelled.is_set():
+                        raise IOError("Đã hủy tải")
+                    if chunk:
+                        f.write(chunk)
+                        if self._hasher is not None:
+                            self._hasher.update(chunk)
+                            self._hashed += len(chunk)
+                        self.downloaded += len(chunk)
+                        self._report()
+                        self._throttle.consume(len(chunk))
+        finally:
+            response.close()
+
+    # --- Hash nội dung (content store) ---
+
+    def _reset_hash(self):
+        if self.content_store is not None:
+            with self._hash_lock:
+                self._hasher = hashlib.sha256()
+                self._hashed = 0
+
+    def _advance_hash(self):
+        """
+        Đưa vào hasher phần đầu file đã tải liên tục (các segment đã xong tính
+        từ đầu file); tải một luồng thì hasher đã được cập nhật theo từng chunk
+        """
+        if self._hasher is None:
+            return
+        with self._lock:
+            end = self.total_size if self._segments else self._hashed
+            for start, segment_end, done in self._segments:
+                if done < segment_end - start + 1:
+                    end = start
+                    break
+        with self._hash_lock:
+            if end <= self._hashed:
+                return
+            with open(self.part_path, 'rb') as f:
+                f.seek(self._hashed)
+                remaining = end - self._hashed
+                while remaining > 0:
+                    chunk = f.read(min(self.chunk_size * 4, remaining))
+                    if not chunk:
+                        break
+                    self._hasher.update(chunk)
+                    remaining -= len(chunk)
+                    self._hashed += len(chunk)
+
+    # --- Manifest ---
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (data.get('total_size') != self.total_size
+                or data.get('validator', '') != self._validator
+                or not os.path.exists(self.part_path)
+                or os.path.getsize(self.part_path) != self.total_size):
+            return False
+        segments = data.get('segments') or []
+        if not segments or any(len(segment) != 3 for segment in segments):
+            return False
+        self._segments = [[int(a), int(b), int(c)] for a, b, c in segments]
+        return True
+
+    def _save_manifest(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_manifest_save < self.manifest_interval:
+                return
+            self._last_manifest_save = now
+            data = {
+                'url': self.url,
+                'total_size': self.total_size,
+                'validator': self._validator,
+                'segments': [list(segment) for segment in self._segments],
+            }
+        tmp_path = f'{self.manifest_path}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError:
+            pass
+
+    def _report(self):
+        if self._progress:
+            self._progress.update(self.downloaded, self.total_size or None)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
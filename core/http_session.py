@@ -0,0 +1,135 @@
+# core/http_session.py
+"""
+Pool requests.Session dùng chung cho các file tải trực tiếp (OneDrive/SharePoint)
+
+Mỗi host (và cookie file) có một Session với HTTPAdapter giữ sẵn nhiều kết nối
+keep-alive, nên các file trên cùng tenant dùng lại kết nối TCP/TLS thay vì bắt
+tay lại cho từng file. Cookie lấy từ CookieStore đã cache (utils.cookies):
+mỗi request (kể cả sau redirect sang host khác) chỉ mang cookie khớp host/path
+của nó thay vì toàn bộ cookie file.
+
+requests.Session dùng được từ nhiều thread khi chỉ gửi request (pool kết nối
+của urllib3 và cookie jar đều có lock); không sửa headers/adapters sau khi tạo.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.cookies import RequestsCookieJar, create_cookie, merge_cookies
+
+from .config import HTTP_SESSION_CONFIG
+from .scheduler import get_host
+
+try:
+    from utils.cookies import get_cookie_store
+except ImportError:
+    get_cookie_store = None
+
+
+class CookieStoreSession(requests.Session):
+    """
+    Session lấy cookie cho từng request từ CookieStore theo host/path của URL
+
+    session.cookies chỉ giữ cookie server trả về (Set-Cookie); requests copy
+    jar này cho mỗi request nên không nạp cả cookie file vào đó.
+    """
+
+    def __init__(self, cookie_store=None):
+        super().__init__()
+        self.cookie_store = cookie_store
+
+    def _store_cookies(self, url):
+        jar = RequestsCookieJar()
+        for cookie in self.cookie_store.for_url(url):
+            domain = cookie.domain.lstrip('.')
+            if domain and cookie.include_subdomains:
+                domain = '.' + domain
+            jar.set_cookie(create_cookie(cookie.name, cookie.value, domain=domain, path=cookie.path,
+                                         secure=cookie.secure, expires=cookie.expires or None))
+        return jar
+
+    def prepare_request(self, request):
+        if self.cookie_store is not None:
+            jar = self._store_cookies(request.url)
+            if request.cookies:
+                merge_cookies(jar, request.cookies)
+            request.cookies = jar
+        return super().prepare_request(request)
+
+    def rebuild_auth(self, prepared_request, response):
+        super().rebuild_auth(prepared_request, response)
+        # Redirect: thêm cookie của URL mới (cookie của URL cũ đã bị lọc theo domain)
+        if self.cookie_store is not None:
+            jar = prepared_request._cookies
+            merge_cookies(jar, self._store_cookies(prepared_request.url))
+            prepared_request.headers.pop('Cookie', None)
+            prepared_request.prepare_cookies(jar)
+
+
+def create_session(cookie_store=None):
+    """
+    Session mới với HTTPAdapter theo HTTP_SESSION_CONFIG và headers mặc định
+    """
+    session = CookieStoreSession(cookie_store)
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_SESSION_CONFIG['pool_connections'],
+        pool_maxsize=HTTP_SESSION_CONFIG['pool_maxsize'],
+        max_retries=HTTP_SESSION_CONFIG['max_retries'],  # Retry do RetryPolicy đảm nhận
+        pool_block=False,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(HTTP_SESSION_CONFIG['headers'])
+    return session
+
+
+class SessionPool:
+    """
+    Session theo (host, phiên bản cookie file)
+
+    Cookie file được sửa (mtime/kích thước đổi) thì các job sau dùng Session mới.
+    """
+
+    def __init__(self):
+        self._sessions = {}  # (host, key của CookieStore) -> Session
+        self._lock = threading.Lock()
+
+    def get(self, url, cookie_file=None):
+        """Session dùng chung cho host của url"""
+        store = get_cookie_store(cookie_file) if cookie_file and get_cookie_store else None
+        key = (get_host(url), store.key if store else None)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = create_session(store)
+                self._sessions[key] = session
+            return session
+
+    def close_all(self):
+        """Đóng toàn bộ kết nối đang giữ"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_session_pool():
+    """
+    Trả về pool Session dùng chung trong process
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SessionPool()
+        return _pool
+
+
+def get_http_session(url, cookie_file=None):
+    """Session dùng chung cho url (xem SessionPool.get)"""
+    return get_session_pool().get(url, cookie_file)
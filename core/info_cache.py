@@ -0,0 +1,252 @@
+# core/info_cache.py
+"""
+Cache kết quả extract_info của yt-dlp theo URL
+
+Các bước retry và phương pháp thay thế chọn format khác từ info đã cache
+thay vì extract lại trang. Thời gian sống của entry bị giới hạn bởi hạn của
+URL có chữ ký (tham số expire=...) trong các format.
+
+Key gồm URL đã chuẩn hóa và danh tính cookie/tài khoản + các option ảnh hưởng
+tới kết quả extract (cache_context), nên info lấy bằng cookie của tài khoản
+này không được dùng cho lần chạy với tài khoản khác hoặc không có cookie.
+Bản ghi ra đĩa không chứa cookie và header đăng nhập.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from .config import INFO_CACHE_CONFIG
+
+# Tham số theo dõi không ảnh hưởng tới nội dung: utm_* theo tiền tố, còn lại
+# theo đúng tên (không bỏ nhầm sig, signature, sid, size...)
+_TRACKING_PREFIXES = ('utm_',)
+_TRACKING_PARAMS = frozenset({'fbclid', 'gclid', 'si'})
+
+# Option của YoutubeDL làm kết quả extract khác đi (ngoài cookie)
+_CONTEXT_OPTIONS = ('username', 'password', 'videopassword', 'usenetrc', 'netrc_location',
+                    'ap_mso', 'ap_username', 'ap_password', 'cookiesfrombrowser',
+                    'extractor_args', 'geo_bypass', 'geo_bypass_country', 'geo_bypass_ip_block',
+                    'proxy', 'geo_verification_proxy', 'source_address', 'age_limit')
+
+# Không ghi ra đĩa: 'cookies' (yt-dlp nạp lại vào cookie jar khi tải) và header
+# mang thông tin đăng nhập; header khác (Referer, User-Agent...) vẫn cần để tải
+_PRIVATE_KEYS = ('cookies',)
+_PRIVATE_HEADERS = frozenset({'cookie', 'authorization', 'proxy-authorization', 'x-goog-authuser'})
+
+# expire=1700000000, Expires=..., /expire/1700000000/
+_EXPIRY_RE = re.compile(r'[/?&](?:expire|expires|exp)[=/](\d{10})(?!\d)', re.IGNORECASE)
+
+
+def normalize_url(url):
+    """
+    Chuẩn hóa URL làm key cache: host chữ thường, bỏ fragment và tham số theo dõi
+    """
+    try:
+        parts = urlsplit(url.strip())
+        query = [
+            (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if not (k.lower() in _TRACKING_PARAMS or k.lower().startswith(_TRACKING_PREFIXES))
+        ]
+        query.sort()
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(),
+                           parts.path or '/', urlencode(query), ''))
+    except Exception:
+        return url.strip()
+
+
+def _file_identity(path):
+    try:
+        stat = os.stat(path)
+        return [os.path.abspath(path), stat.st_mtime_ns, stat.st_size]
+    except (OSError, TypeError, ValueError):
+        return [path]
+
+
+def cache_context(params):
+    """
+    Danh tính cookie/tài khoản và các option ảnh hưởng tới extract_info
+    (params của YoutubeDL) dùng làm một phần của key cache
+    """
+    params = params or {}
+    context = {key: params[key] for key in _CONTEXT_OPTIONS if params.get(key) is not None}
+    if params.get('cookiefile'):
+        # Cùng file cookie nhưng nội dung đã đổi (đăng nhập lại) là một danh tính khác
+        context['cookiefile'] = _file_identity(params['cookiefile'])
+    headers = params.get('http_headers') or {}
+    for name in ('Cookie', 'Authorization'):
+        if headers.get(name):
+            context[name] = headers[name]
+    if not context:
+        return ''
+    return hashlib.sha1(json.dumps(context, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _without_private(value):
+    """Bản copy của info không có cookie/header đăng nhập ở mọi cấp (format, subtitle...)"""
+    if isinstance(value, dict):
+        value = {k: _without_private(v) for k, v in value.items() if k not in _PRIVATE_KEYS}
+        headers = value.get('http_headers')
+        if isinstance(headers, dict):
+            value['http_headers'] = {k: v for k, v in headers.items() if k.lower() not in _PRIVATE_HEADERS}
+        return value
+    if isinstance(value, list):
+        return [_without_private(v) for v in value]
+    return value
+
+
+def signed_url_expiry(info):
+    """
+    Tìm thời điểm hết hạn sớm nhất (epoch) của các URL format có chữ ký
+    """
+    earliest = None
+    formats = list(info.get('formats') or [])
+    formats.extend(info.get('requested_formats') or [])
+    if info.get('url'):
+        formats.append(info)
+    for fmt in formats:
+        for candidate in (fmt.get('url'), fmt.get('manifest_url')):
+            if not candidate:
+                continue
+            for match in _EXPIRY_RE.finditer(candidate):
+                value = int(match.group(1))
+                if earliest is None or value < earliest:
+                    earliest = value
+    return earliest
+
+
+class InfoCache:
+    """
+    Cache 2 tầng (RAM + file JSON) cho kết quả extract_info
+    """
+
+    def __init__(self, directory=None, ttl=None, expiry_margin=None, max_memory_entries=None):
+        self.directory = directory or INFO_CACHE_CONFIG['directory']
+        self.ttl = ttl if ttl is not None else INFO_CACHE_CONFIG['ttl']
+        self.expiry_margin = expiry_margin if expiry_margin is not None else INFO_CACHE_CONFIG['expiry_margin']
+        self.max_memory_entries = max_memory_entries or INFO_CACHE_CONFIG['max_memory_entries']
+        self._memory = OrderedDict()  # key -> (expires_at, info)
+        self._lock = threading.Lock()
+        self._pruned = False
+
+    def _key(self, url, context=''):
+        return hashlib.sha1(f'{normalize_url(url)}\0{context}'.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, url, context=''):
+        """
+        Lấy info đã cache (bản sao) hoặc None nếu không có/hết hạn
+        :param context: cache_context(ydl.params) của lần chạy
+        """
+        key = self._key(url, context)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    return copy.deepcopy(entry[1])
+                del self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('expires_at', 0) <= now:
+            self._remove_file(path)
+            return None
+        self._remember(key, data['expires_at'], data['info'])
+        return copy.deepcopy(data['info'])
+
+    def put(self, url, info, context=''):
+        """
+        Lưu info (đã sanitize, serialize được bằng JSON)
+        """
+        if not info:
+            return
+        now = time.time()
+        expires_at = now + self.ttl
+        signed_expiry = signed_url_expiry(info)
+        if signed_expiry is not None:
+            expires_at = min(expires_at, signed_expiry - self.expiry_margin)
+        if expires_at <= now:
+            return
+
+        key = self._key(url, context)
+        info = copy.deepcopy(info)
+        info.pop('cookies', None)
+        self._remember(key, expires_at, info)
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._prune_once()
+            path = self._path(key)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'url': url, 'expires_at': expires_at, 'info': _without_private(info)}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError):
+            pass  # Cache trên đĩa là tùy chọn, vẫn còn cache trong RAM
+
+    def invalidate(self, url, context=''):
+        """Xóa entry của URL (vd. khi URL có chữ ký đã hết hạn)"""
+        key = self._key(url, context)
+        with self._lock:
+            self._memory.pop(key, None)
+        self._remove_file(self._path(key))
+
+    def _remember(self, key, expires_at, info):
+        with self._lock:
+            self._memory[key] = (expires_at, info)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def _prune_once(self):
+        # Xóa file cũ một lần mỗi process; entry không bao giờ sống quá ttl
+        if self._pruned:
+            return
+        self._pruned = True
+        cutoff = time.time() - self.ttl
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file() and entry.stat().st_mtime < cutoff:
+                            os.remove(entry.path)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_info_cache():
+    """
+    Trả về cache dùng chung cho toàn process
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = InfoCache()
+        return _cache
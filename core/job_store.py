@@ -0,0 +1,288 @@
+# core/job_store.py
+"""
+Lưu trạng thái job tải vào SQLite (WAL) để tiếp tục sau khi process bị dừng
+
+Mỗi URL là một dòng trong bảng jobs: trạng thái (queued/running/done/failed),
+số lần chạy, file đã lưu, số byte đã tải và lỗi gần nhất. Khi chạy lại, job
+chưa xong (queued/running) được đưa lại vào hàng đợi, job đã xong được bỏ qua
+mà không cần extract lại.
+
+JobStoreRecorder ghi trạng thái từ event bus nên downloader không cần biết
+tới job store.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .config import JOB_STORE_CONFIG
+from .events import get_event_bus, JobEvent, StatusEvent
+from .progress import ProgressEvent
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    output_folder TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    output_path TEXT,
+    bytes_done INTEGER NOT NULL DEFAULT 0,
+    total_bytes INTEGER,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (kind, url, output_folder)
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, kind);
+"""
+
+
+@dataclass
+class JobRecord:
+    """Một dòng của bảng jobs"""
+    id: int
+    kind: str
+    url: str
+    output_folder: str
+    options: dict = field(default_factory=dict)
+    state: str = QUEUED
+    attempts: int = 0
+    output_path: Optional[str] = None
+    bytes_done: int = 0
+    total_bytes: Optional[int] = None
+    last_error: Optional[str] = None
+    updated_at: float = 0.0
+
+    @property
+    def completed(self):
+        """Đã tải xong và file vẫn còn trên đĩa"""
+        return self.state == DONE and (not self.output_path or os.path.exists(self.output_path))
+
+
+class JobStore:
+    """
+    Job store SQLite dùng chung giữa các thread (một connection, có lock)
+    """
+
+    def __init__(self, path=None):
+        self.path = path or JOB_STORE_CONFIG['path']
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _record(row):
+        if row is None:
+            return None
+        data = dict(row)
+        try:
+            data['options'] = json.loads(data.get('options') or '{}')
+        except ValueError:
+            data['options'] = {}
+        data.pop('created_at', None)
+        return JobRecord(**data)
+
+    def add(self, url, output_folder, kind='video', options=None):
+        """
+        Thêm job (hoặc lấy job đã có cùng kind/url/thư mục lưu).
+        Job đã có mà chưa xong được đưa lại về trạng thái queued.
+        """
+        output_folder = os.path.abspath(output_folder)
+        now = time.time()
+        options_json = json.dumps(options or {}, sort_keys=True)
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO jobs (kind, url, output_folder, options, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (kind, url, output_folder) DO UPDATE SET '
+                'options = excluded.options, updated_at = excluded.updated_at, '
+                "state = CASE WHEN state = 'done' THEN state ELSE 'queued' END",
+                (kind, url, output_folder, options_json, now, now))
+            self._conn.commit()
+            row = self._conn.execute(
+                'SELECT * FROM jobs WHERE kind = ? AND url = ? AND output_folder = ?',
+                (kind, url, output_folder)).fetchone()
+        return self._record(row)
+
+    def get(self, job_id):
+        rows = self._query('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        return self._record(rows[0]) if rows else None
+
+    def unfinished(self, kind=None):
+        """Job chưa xong (queued, hoặc running khi process bị dừng), theo thứ tự thêm"""
+        sql = "SELECT * FROM jobs WHERE state IN ('queued', 'running')"
+        params = ()
+        if kind:
+            sql += ' AND kind = ?'
+            params = (kind,)
+        return [self._record(row) for row in self._query(sql + ' ORDER BY id', params)]
+
+    def counts(self):
+        """Số job theo trạng thái"""
+        return {row['state']: row['n'] for row in
+                self._query('SELECT state, COUNT(*) AS n FROM jobs GROUP BY state')}
+
+    def mark_running(self, job_id):
+        self._execute("UPDATE jobs SET state = 'running', attempts = attempts + 1, last_error = NULL, "
+                      'updated_at = ? WHERE id = ?', (time.time(), job_id))
+
+    def update_progress(self, job_id, bytes_done, total_bytes=None, output_path=None):
+        self._execute('UPDATE jobs SET bytes_done = ?, total_bytes = COALESCE(?, total_bytes), '
+                      'output_path = COALESCE(?, output_path), updated_at = ? WHERE id = ?',
+                      (bytes_done, total_bytes, output_path, time.time(), job_id))
+
+    def mark_done(self, job_id, output_path=None):
+        self._execute("UPDATE jobs SET state = 'done', output_path = COALESCE(?, output_path), "
+                      'last_error = NULL, updated_at = ? WHERE id = ?', (output_path, time.time(), job_id))
+
+    def mark_failed(self, job_id, error=None):
+        self._execute("UPDATE jobs SET state = 'failed', last_error = ?, updated_at = ? WHERE id = ?",
+                      (error, time.time(), job_id))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobStoreRecorder:
+    """
+    Ghi trạng thái job vào JobStore từ event bus
+
+    track(bus_job_id, store_job_id) gắn job trên bus với dòng trong store;
+    tiến độ được ghi tối đa mỗi progress_interval giây cho mỗi job.
+    """
+
+    def __init__(self, store, bus=None, progress_interval=None):
+        self.store = store
+        self.bus = bus or get_event_bus()
+        self.progress_interval = progress_interval or JOB_STORE_CONFIG['progress_interval']
+        self._jobs = {}          # bus job id -> store job id
+        self._last_write = {}    # bus job id -> thời điểm ghi tiến độ gần nhất
+        self._output_paths = {}  # bus job id -> file vừa tải xong (trước merge)
+        self._last_errors = {}   # bus job id -> thông báo lỗi gần nhất
+        self._lock = threading.Lock()
+        self._token = None
+
+    def start(self):
+        if self._token is None:
+            self._token = self.bus.subscribe(self.on_event, (JobEvent, ProgressEvent, StatusEvent))
+        return self
+
+    def stop(self):
+        if self._token is not None:
+            self.bus.unsubscribe(self._token)
+            self._token = None
+
+    def track(self, bus_job_id, store_job_id):
+        with self._lock:
+            self._jobs[bus_job_id] = store_job_id
+
+    def on_event(self, event):
+        with self._lock:
+            store_id = self._jobs.get(event.job_id)
+        if store_id is None:
+            return
+        if isinstance(event, ProgressEvent):
+            self._on_progress(event, store_id)
+        elif isinstance(event, StatusEvent):
+            if event.color == 'red':
+                self._last_errors[event.job_id] = event.message
+        elif event.phase == 'started':
+            self.store.mark_running(store_id)
+        elif event.phase in ('finished', 'failed'):
+            output_path = self._output_paths.pop(event.job_id, None)
+            if event.output_path:
+                output_path = os.path.abspath(event.output_path)
+            message = self._last_errors.pop(event.job_id, None)
+            self._last_write.pop(event.job_id, None)
+            with self._lock:
+                self._jobs.pop(event.job_id, None)
+            if event.phase == 'finished':
+                self.store.mark_done(store_id, output_path)
+            else:
+                error = event.reason or 'unknown'
+                self.store.mark_failed(store_id, f"{error}: {message}" if message else error)
+
+    def _on_progress(self, event, store_id):
+        if event.phase == 'finished':
+            if event.filename:
+                self._output_paths[event.job_id] = os.path.abspath(event.filename)
+            self.store.update_progress(store_id, event.bytes_done, event.total,
+                                       self._output_paths.get(event.job_id))
+            return
+        now = time.monotonic()
+        if now - self._last_write.get(event.job_id, 0.0) < self.progress_interval:
+            return
+        self._last_write[event.job_id] = now
+        self.store.update_progress(store_id, event.bytes_done, event.total)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_job_store(path=None):
+    """
+    Trả về JobStore dùng chung cho file database (mặc định JOB_STORE_CONFIG['path'])
+    """
+    key = os.path.abspath(path or JOB_STORE_CONFIG['path'])
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = JobStore(key)
+            _stores[key] = store
+        return store
+
+
+_recorder = None
+
+
+def get_job_recorder():
+    """
+    Recorder dùng chung (đã đăng ký vào event bus) cho job store mặc định;
+    None nếu job store bị tắt hoặc không mở được database
+    """
+    global _recorder
+    if not JOB_STORE_CONFIG.get('enabled', True):
+        return None
+    with _stores_lock:
+        if _recorder is not None:
+            return _recorder
+    try:
+        store = get_job_store()
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Không mở được job store, trạng thái job sẽ không được lưu: {e}")
+        return None
+    with _stores_lock:
+        if _recorder is None:
+            _recorder = JobStoreRecorder(store).start()
+        return _recorder
@@ -0,0 +1,263 @@
+# core/metrics.py
+"""
+Metrics dạng Prometheus cho các job tải
+
+MetricsRegistry đăng ký nhận sự kiện từ event bus (tiến độ, giai đoạn tải,
+retry, kết thúc job) và xuất text format của Prometheus qua:
+- HTTP endpoint cục bộ (MetricsServer, mặc định 127.0.0.1:<port>/metrics)
+- file .prom cho textfile collector của node_exporter (TextfileExporter)
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .adaptive import concurrency_limits
+from .config import METRICS_CONFIG
+from .events import get_event_bus, JobEvent, StageEvent, RetryEvent
+from .progress import ProgressEvent
+from .scheduler import get_host, get_scheduler
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+class MetricsRegistry:
+    """
+    Bộ đếm/gauge được cập nhật từ event bus
+
+    Speed theo job chỉ giữ cho job đang chạy nên số series không tăng mãi.
+    """
+
+    def __init__(self, bus=None, scheduler=None):
+        self.bus = bus or get_event_bus()
+        self.scheduler = scheduler or get_scheduler()
+        self._lock = threading.Lock()
+        self._job_hosts = {}       # job_id -> host
+        self._job_speed = {}       # job_id -> bytes/giây
+        self._job_bytes = {}       # job_id -> (filename, bytes đã tính)
+        self._bytes_total = {}     # host -> bytes
+        self._retries = {}         # (kind, host) -> số lần
+        self._stage_seconds = {}   # (stage, result) -> [tổng giây, số lần]
+        self._jobs = {}            # result -> số job
+        self._failures = {}        # reason -> số job
+        self._job_seconds = [0.0, 0]
+        self._token = None
+
+    def start(self):
+        """Bắt đầu nhận sự kiện"""
+        if self._token is None:
+            self._token = self.bus.subscribe(
+                self.on_event, (ProgressEvent, JobEvent, StageEvent, RetryEvent))
+        return self
+
+    def stop(self):
+        if self._token is not None:
+            self.bus.unsubscribe(self._token)
+            self._token = None
+
+    def on_event(self, event):
+        with self._lock:
+            if isinstance(event, ProgressEvent):
+                self._on_progress(event)
+            elif isinstance(event, RetryEvent):
+                key = (event.kind, self._job_hosts.get(event.job_id, ''))
+                self._retries[key] = self._retries.get(key, 0) + 1
+            elif isinstance(event, StageEvent):
+                entry = self._stage_seconds.setdefault(
+                    (event.stage, 'success' if event.success else 'failure'), [0.0, 0])
+                entry[0] += event.duration
+                entry[1] += 1
+            elif isinstance(event, JobEvent):
+                self._on_job(event)
+
+    def _on_progress(self, event):
+        if event.speed is not None and event.phase == 'downloading':
+            self._job_speed[event.job_id] = event.speed
+        # Cộng phần byte mới; bytes_done giảm hoặc đổi file là stream mới (video rồi audio)
+        filename, counted = self._job_bytes.get(event.job_id, (None, 0))
+        if event.filename != filename or event.bytes_done < counted:
+            counted = 0
+        delta = event.bytes_done - counted
+        if delta > 0:
+            host = self._job_hosts.get(event.job_id, '')
+            self._bytes_total[host] = self._bytes_total.get(host, 0) + delta
+        self._job_bytes[event.job_id] = (event.filename, event.bytes_done)
+
+    def _on_job(self, event):
+        if event.phase == 'started':
+            self._job_hosts[event.job_id] = get_host(event.url or '')
+            return
+        result = 'success' if event.phase == 'finished' else 'failure'
+        self._jobs[result] = self._jobs.get(result, 0) + 1
+        if result == 'failure':
+            reason = event.reason or 'unknown'
+            self._failures[reason] = self._failures.get(reason, 0) + 1
+        if event.duration is not None:
+            self._job_seconds[0] += event.duration
+            self._job_seconds[1] += 1
+        self._job_speed.pop(event.job_id, None)
+        self._job_bytes.pop(event.job_id, None)
+        self._job_hosts.pop(event.job_id, None)
+
+    def render(self):
+        """Xuất toàn bộ metrics theo text format 0.0.4 của Prometheus"""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for suffix, labels, value in samples:
+                lines.append(f'{name}{suffix}{_labels(labels)} {_number(value)}')
+
+        with self._lock:
+            metric('vdt_job_speed_bytes_per_second', 'gauge',
+                   'Current download speed of each running job.',
+                   [('', (('job', job_id), ('host', self._job_hosts.get(job_id, ''))), speed)
+                    for job_id, speed in sorted(self._job_speed.items())])
+            metric('vdt_downloaded_bytes_total', 'counter',
+                   'Bytes downloaded, by host.',
+                   [('', (('host', host),), value) for host, value in sorted(self._bytes_total.items())])
+            metric('vdt_retries_total', 'counter',
+                   'Retries reported by yt-dlp (kind="fragment" for fragment retries).',
+                   [('', (('kind', kind), ('host', host)), value)
+                    for (kind, host), value in sorted(self._retries.items())])
+            stage_samples = []
+            for (stage, result), (seconds, count) in sorted(self._stage_seconds.items()):
+                labels = (('stage', stage), ('result', result))
+                stage_samples.append(('_sum', labels, seconds))
+                stage_samples.append(('_count', labels, count))
+            metric('vdt_stage_duration_seconds', 'summary',
+                   'Time spent in each download_video stage (main, retry, safe_fallback, alt:*).',
+                   stage_samples)
+            metric('vdt_jobs_total', 'counter', 'Finished jobs, by result.',
+                   [('', (('result', result),), value) for result, value in sorted(self._jobs.items())])
+            metric('vdt_job_failures_total', 'counter', 'Failed jobs, by reason.',
+                   [('', (('reason', reason),), value) for reason, value in sorted(self._failures.items())])
+            metric('vdt_job_duration_seconds', 'summary', 'Wall time of finished jobs.',
+                   [('_sum', (), self._job_seconds[0]), ('_count', (), self._job_seconds[1])])
+
+        metric('vdt_fragment_concurrency', 'gauge',
+               'Current adaptive concurrent_fragment_downloads limit, by host.',
+               [('', (('host', host),), limit) for host, limit in sorted(concurrency_limits().items())])
+        metric('vdt_queue_depth', 'gauge', 'Jobs waiting in the download scheduler.',
+               [('', (), self.scheduler.queue_depth())])
+        metric('vdt_active_jobs', 'gauge', 'Jobs currently running in the download scheduler.',
+               [('', (), self.scheduler.active_count())])
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """
+    HTTP endpoint /metrics chạy trên daemon thread
+    """
+
+    def __init__(self, registry, port, host=None):
+        self.registry = registry
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = registry_ref.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Không in access log ra console
+
+        self._server = ThreadingHTTPServer((host or METRICS_CONFIG['host'], port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True,
+                                        name="metrics-server")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class TextfileExporter:
+    """
+    Ghi metrics ra file định kỳ (ghi file tạm rồi os.replace để collector
+    không đọc phải file đang ghi dở)
+    """
+
+    def __init__(self, registry, path, interval=None):
+        self.registry = registry
+        self.path = path
+        self.interval = interval or METRICS_CONFIG['textfile_interval']
+        self._stop = threading.Event()
+        self._thread = None
+
+    def write(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.registry.render())
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"⚠️ Không thể ghi metrics: {e}")
+
+    def start(self):
+        self.write()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="metrics-textfile")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Dừng và ghi lần cuối (số liệu cuối batch)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+        self.registry.bus.flush()
+        self.write()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics_registry():
+    """
+    Trả về registry dùng chung (đã đăng ký vào event bus)
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry().start()
+        return _registry
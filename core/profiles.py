@@ -0,0 +1,210 @@
+# core/profiles.py
+"""
+Profile cấu hình theo chế độ tải: giá trị mặc định + thông số của máy + số đo
+
+Cấu hình của mỗi mode (balanced/speed/quality) được ghép theo thứ tự:
+1. Dict tĩnh trong config.py (DOWNLOAD_CONFIG, SPEED_OPTIMIZED_CONFIG, ...)
+2. Thông số theo máy từ SystemOptimizer.get_optimal_settings (CPU, RAM, hệ điều
+   hành): buffersize, http_chunk_size, socket_timeout, extractor_retries; số
+   fragment đồng thời của mode bị giới hạn bởi mức máy chịu được
+3. Profile đã đo (file JSON có version, tạo bằng benchmarks/tune_profiles.py)
+
+Profile đo trên máy/mạng nào thì đúng cho máy/mạng đó; file được đọc lại khi
+mtime đổi nên chạy lại tune không cần khởi động lại app.
+"""
+
+import json
+import os
+import platform
+import threading
+import time
+
+from .config import (DOWNLOAD_CONFIG, SPEED_OPTIMIZED_CONFIG, QUALITY_OPTIMIZED_CONFIG,
+                     HTTP_DOWNLOAD_CONFIG, PROFILE_CONFIG)
+
+PROFILE_VERSION = 1
+
+MODE_CONFIGS = {
+    'balanced': DOWNLOAD_CONFIG,
+    'speed': SPEED_OPTIMIZED_CONFIG,
+    'quality': QUALITY_OPTIMIZED_CONFIG,
+}
+
+# Chỉ các option này được lấy từ profile (số nguyên dương)
+MODE_KEYS = ('concurrent_fragment_downloads', 'http_chunk_size', 'buffersize',
+             'socket_timeout', 'retries', 'fragment_retries')
+HTTP_KEYS = ('connections', 'min_segment_size', 'chunk_size')
+
+# Giá trị của SystemOptimizer là giới hạn của máy, không thay giá trị của mode:
+# min = mức trần (bộ nhớ), max = mức sàn (network stack của hệ điều hành).
+# Mode không đặt option thì dùng giá trị của máy.
+_SYSTEM_LIMITS = {
+    'concurrent_fragment_downloads': min,
+    'buffersize': min,
+    'http_chunk_size': min,
+    'socket_timeout': max,
+    'extractor_retries': max,
+}
+
+
+class ProfileError(ValueError):
+    """File profile không đọc được hoặc sai version/định dạng"""
+
+
+def host_info():
+    """Thông tin máy ghi kèm profile (để biết profile được đo ở đâu)"""
+    return {'system': platform.system().lower(), 'cpu_count': os.cpu_count()}
+
+
+def _clean(values, keys, where):
+    if not isinstance(values, dict):
+        raise ProfileError(f"{where}: cần object")
+    cleaned = {}
+    for key, value in values.items():
+        if key not in keys:
+            continue  # Option không được phép chỉnh qua profile
+        if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+            raise ProfileError(f"{where}.{key}: cần số nguyên dương, nhận {value!r}")
+        cleaned[key] = value
+    return cleaned
+
+
+class Profile:
+    """Thông số đã đo cho từng mode và cho HttpFileDownloader"""
+
+    def __init__(self, modes=None, http=None, host=None, created_at=None, source=None, sweep=None):
+        self.modes = modes or {}
+        self.http = http or {}
+        self.host = host or host_info()
+        self.created_at = created_at or time.time()
+        self.source = source
+        self.sweep = sweep          # Kết quả sweep (chỉ để tham khảo)
+
+    @classmethod
+    def from_dict(cls, data, source=None):
+        if not isinstance(data, dict):
+            raise ProfileError("profile phải là object JSON")
+        if data.get('version') != PROFILE_VERSION:
+            raise ProfileError(f"version {data.get('version')!r} không được hỗ trợ (cần {PROFILE_VERSION})")
+        modes = {}
+        for mode, values in (data.get('modes') or {}).items():
+            if mode in MODE_CONFIGS:
+                modes[mode] = _clean(values, MODE_KEYS, f'modes.{mode}')
+        http = _clean(data.get('http') or {}, HTTP_KEYS, 'http')
+        return cls(modes, http, data.get('host'), data.get('created_at'), source, data.get('sweep'))
+
+    def to_dict(self):
+        data = {
+            'version': PROFILE_VERSION,
+            'created_at': self.created_at,
+            'host': self.host,
+            'modes': self.modes,
+            'http': self.http,
+        }
+        if self.sweep is not None:
+            data['sweep'] = self.sweep
+        return data
+
+
+def load_profile(path):
+    """Đọc file profile (raise ProfileError nếu sai)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except ValueError as e:
+        raise ProfileError(f"JSON không hợp lệ: {e}")
+    return Profile.from_dict(data, source=path)
+
+
+def save_profile(profile, path=None):
+    """Ghi profile (ghi file tạm rồi đổi tên để không để lại file dở)"""
+    path = path or PROFILE_CONFIG['path']
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(profile.to_dict(), f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+_lock = threading.Lock()
+_loaded = {}        # path -> (mtime_ns, Profile hoặc None)
+_override = None    # Profile dùng thay file (benchmark/tune)
+_system = None
+
+
+def use_profile(profile):
+    """Dùng profile trong bộ nhớ thay cho file (None = đọc lại từ file)"""
+    global _override
+    with _lock:
+        _override = profile
+
+
+def get_profile():
+    """
+    Profile đang dùng: profile trong bộ nhớ, hoặc file PROFILE_CONFIG['path']
+    (đọc lại khi file đổi); None nếu tắt, chưa có file hoặc file lỗi
+    """
+    if _override is not None:
+        return _override
+    if not PROFILE_CONFIG.get('enabled', True):
+        return None
+    path = PROFILE_CONFIG['path']
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _lock:
+        cached = _loaded.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    try:
+        profile = load_profile(path)
+        if profile.host.get('cpu_count') != os.cpu_count():
+            print(f"⚠️ Profile {path} được đo trên máy khác "
+                  f"({profile.host.get('cpu_count')} CPU), nên chạy lại benchmarks/tune_profiles.py")
+    except (OSError, ProfileError) as e:
+        print(f"⚠️ Bỏ qua profile {path}: {e}")
+        profile = None
+    with _lock:
+        _loaded[path] = (mtime, profile)
+    return profile
+
+
+def system_settings():
+    """Thông số theo máy của SystemOptimizer (tính một lần), {} nếu không có psutil"""
+    global _system
+    if _system is None:
+        try:
+            try:
+                from utils.system_optimizer import SystemOptimizer
+            except ImportError:
+                from system_optimizer import SystemOptimizer  # type: ignore
+            _system = SystemOptimizer().get_optimal_settings()
+        except Exception:
+            _system = {}
+    return _system
+
+
+def mode_config(mode):
+    """Cấu hình yt-dlp của mode (bản copy) sau khi ghép máy + profile"""
+    config = MODE_CONFIGS.get(mode, DOWNLOAD_CONFIG).copy()
+    if PROFILE_CONFIG.get('use_system_settings', True):
+        system = system_settings()
+        for key, limit in _SYSTEM_LIMITS.items():
+            if not system.get(key):
+                continue
+            config[key] = limit(config[key], system[key]) if config.get(key) else system[key]
+    profile = get_profile()
+    if profile:
+        config.update(profile.modes.get(mode, {}))
+    return config
+
+
+def http_download_settings():
+    """Thông số mặc định của HttpFileDownloader (HTTP_DOWNLOAD_CONFIG + profile)"""
+    settings = dict(HTTP_DOWNLOAD_CONFIG)
+    profile = get_profile()
+    if profile:
+        settings.update(profile.http)
+    return settings
@@ -0,0 +1,138 @@
+# core/progress.py
+"""
+Sự kiện tiến độ có cấu trúc và bộ gộp (throttle) sự kiện
+
+Vòng lặp copy chỉ cập nhật bộ đếm; sự kiện ProgressEvent được phát tối đa
+theo PROGRESS_CONFIG (thời gian và số byte), việc format chuỗi để hiển thị
+do phía UI/CLI làm.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .config import PROGRESS_CONFIG
+
+
+@dataclass
+class ProgressEvent:
+    """Một sự kiện tiến độ tải"""
+    phase: str = 'downloading'          # 'downloading', 'finished', 'error'
+    bytes_done: int = 0
+    total: Optional[int] = None
+    speed: Optional[float] = None       # bytes/giây
+    eta: Optional[float] = None         # giây
+    fragment_index: Optional[int] = None
+    fragment_count: Optional[int] = None
+    filename: Optional[str] = None
+    job_id: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def percent(self):
+        if self.total:
+            return self.bytes_done * 100.0 / self.total
+        return None
+
+
+def format_bytes(value):
+    """
+    Format số byte dạng dễ đọc (1.5MB, 320KB...)
+    """
+    if value is None:
+        return '?'
+    value = float(value)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(value) < 1024 or unit == 'GB':
+            return f"{value:.0f}{unit}" if unit == 'B' else f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}TB"
+
+
+def format_duration(seconds):
+    """Format số giây dạng mm:ss hoặc hh:mm:ss"""
+    if seconds is None:
+        return ''
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours:d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def format_progress_event(event):
+    """
+    Chuyển ProgressEvent thành chuỗi trạng thái cho UI
+    """
+    if event.phase == 'finished':
+        return "✅ Hoàn tất tải!"
+    text = "📥 Đang tải:"
+    if event.percent is not None:
+        text += f" {event.percent:.1f}% ({format_bytes(event.bytes_done)}/{format_bytes(event.total)})"
+    else:
+        text += f" {format_bytes(event.bytes_done)}"
+    if event.speed:
+        text += f" | Tốc độ: {format_bytes(event.speed)}/s"
+    if event.eta is not None:
+        text += f" | Còn lại: {format_duration(event.eta)}"
+    if event.fragment_index and event.fragment_count:
+        text += f" | Fragment: {event.fragment_index}/{event.fragment_count}"
+    return text
+
+
+class ProgressThrottle:
+    """
+    Gộp cập nhật tiến độ: chỉ phát sự kiện khi đã qua min_interval giây
+    và tải thêm ít nhất min_bytes (sự kiện hoàn tất luôn được phát)
+
+    update() an toàn khi gọi từ nhiều thread.
+    """
+
+    def __init__(self, callback, min_interval=None, min_bytes=None):
+        self.callback = callback
+        self.min_interval = PROGRESS_CONFIG['min_interval'] if min_interval is None else min_interval
+        self.min_bytes = PROGRESS_CONFIG['min_bytes'] if min_bytes is None else min_bytes
+        self._emit_lock = threading.Lock()
+        self._next_bytes = 0
+        self._next_time = 0.0
+        self._last_bytes = 0
+        self._last_time = None
+        self._speed = None
+
+    def update(self, bytes_done, total=None, **fields):
+        """Báo số byte đã tải; rẻ khi không cần phát sự kiện"""
+        # Số byte giảm nghĩa là bắt đầu file/stream mới (vd. video rồi audio)
+        if self._last_bytes <= bytes_done < self._next_bytes and bytes_done != total:
+            return
+        now = time.monotonic()
+        if now < self._next_time and bytes_done != total:
+            return
+        if not self._emit_lock.acquire(blocking=False):
+            return
+        try:
+            self._emit(now, bytes_done, total, 'downloading', fields)
+        finally:
+            self._emit_lock.release()
+
+    def finish(self, bytes_done, total=None, **fields):
+        """Phát sự kiện hoàn tất"""
+        with self._emit_lock:
+            self._emit(time.monotonic(), bytes_done, total, 'finished', fields)
+
+    def _emit(self, now, bytes_done, total, phase, fields):
+        if self._last_time is not None and now > self._last_time and bytes_done >= self._last_bytes:
+            instant = (bytes_done - self._last_bytes) / (now - self._last_time)
+            # Làm mượt tốc độ để hiển thị không nhảy liên tục
+            self._speed = instant if self._speed is None else 0.3 * instant + 0.7 * self._speed
+        self._last_time = now
+        self._last_bytes = bytes_done
+        self._next_time = now + self.min_interval
+        self._next_bytes = bytes_done + self.min_bytes
+
+        if fields.get('speed') is None:
+            fields['speed'] = self._speed
+        if fields.get('eta') is None and total and fields['speed']:
+            fields['eta'] = max(0.0, (total - bytes_done) / fields['speed'])
+        self.callback(ProgressEvent(phase=phase, bytes_done=bytes_done, total=total, **fields))
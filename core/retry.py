@@ -0,0 +1,129 @@
+# core/retry.py
+"""
+Chính sách retry dùng chung: exponential backoff + full jitter, tôn trọng
+Retry-After và giới hạn tốc độ retry theo host (token bucket)
+
+Khi nhiều job cùng lỗi trên một host, thời gian chờ ngẫu nhiên và bucket
+chung của host làm các lần retry rải đều thay vì dồn thành từng đợt.
+Dùng cho cả yt-dlp (retry_sleep_functions) và engine tải HTTP của OneDrive.
+"""
+
+import random
+import threading
+import time
+
+from .config import RETRY_CONFIG
+
+
+class TokenBucket:
+    """
+    Token bucket an toàn với nhiều thread: rate token/giây, tối đa capacity token
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill_locked(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        """
+        Lấy một token (cho phép nợ); trả về số giây cần chờ trước khi dùng
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill_locked(now)
+            self._tokens -= 1
+            if self._tokens >= 0 or self.rate <= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class RetryPolicy:
+    """
+    Tính và thực hiện thời gian chờ giữa các lần retry
+    """
+
+    def __init__(self, base_delay=None, max_delay=None, multiplier=None,
+                 max_retry_after=None, host_rate=None, host_burst=None):
+        self.base_delay = RETRY_CONFIG['base_delay'] if base_delay is None else base_delay
+        self.max_delay = RETRY_CONFIG['max_delay'] if max_delay is None else max_delay
+        self.multiplier = multiplier or RETRY_CONFIG['multiplier']
+        self.max_retry_after = RETRY_CONFIG['max_retry_after'] if max_retry_after is None else max_retry_after
+        self.host_rate = RETRY_CONFIG['host_retry_rate'] if host_rate is None else host_rate
+        self.host_burst = host_burst or RETRY_CONFIG['host_retry_burst']
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt):
+        """
+        Full jitter: ngẫu nhiên trong [0, min(max_delay, base * multiplier^attempt)]
+        attempt bắt đầu từ 0 cho lần retry đầu tiên
+        """
+        ceiling = min(self.max_delay, self.base_delay * (self.multiplier ** max(0, attempt)))
+        return random.uniform(0, ceiling)
+
+    def delay(self, attempt, retry_after=None):
+        """Thời gian chờ: Retry-After của server (nếu có) được ưu tiên hơn backoff"""
+        delay = self.backoff(attempt)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_retry_after))
+        return delay
+
+    def _bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.host_rate, self.host_burst)
+                self._buckets[host] = bucket
+            return bucket
+
+    def host_delay(self, host):
+        """Số giây phải chờ để có lượt retry tới host (đã trừ token)"""
+        if not host or self.host_rate <= 0:
+            return 0.0
+        return self._bucket(host).reserve()
+
+    def wait(self, host, attempt, retry_after=None, cancel_event=None):
+        """
+        Chờ trước lần retry thứ attempt (từ 0) tới host; trả về số giây đã chờ.
+        cancel_event (threading.Event) cho phép dừng sớm.
+        """
+        delay = self.delay(attempt, retry_after) + self.host_delay(host)
+        if delay > 0:
+            if cancel_event is not None:
+                cancel_event.wait(delay)
+            else:
+                time.sleep(delay)
+        return delay
+
+    def sleep_function(self, host, on_retry=None):
+        """
+        Hàm cho retry_sleep_functions của yt-dlp: yt-dlp gọi f(n=lần retry, từ 0)
+        và tự sleep theo giá trị trả về
+        """
+        def sleep_function(n):
+            if on_retry:
+                on_retry(n)
+            return self.delay(n) + self.host_delay(host)
+        return sleep_function
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_retry_policy():
+    """
+    Trả về retry policy dùng chung (bucket theo host dùng chung giữa các job)
+    """
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = RetryPolicy()
+        return _policy
@@ -0,0 +1,195 @@
+# core/scheduler.py
+"""
+Hàng đợi tải dùng chung cho GUI và CLI
+
+Giới hạn số job chạy đồng thời (toàn cục và theo host) thay vì mở một thread
+cho mỗi URL.
+"""
+
+import bisect
+import itertools
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+from .config import SCHEDULER_CONFIG
+
+
+def get_host(url):
+    """
+    Lấy host (chữ thường) từ URL, trả về '' nếu không phân tích được
+    """
+    try:
+        url = url.strip()
+        if '//' not in url:
+            url = '//' + url
+        return (urlparse(url).hostname or '').lower()
+    except Exception:
+        return ''
+
+
+class DownloadJob:
+    """Một job trong hàng đợi"""
+
+    def __init__(self, func, args, kwargs, url=None):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.url = url
+        self.host = get_host(url) if url else ''
+        self.future = Future()
+
+    def run(self):
+        """Chạy job và ghi kết quả vào future"""
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        except BaseException as e:
+            self.future.set_exception(e)
+        else:
+            self.future.set_result(result)
+
+
+class DownloadScheduler:
+    """
+    Hàng đợi ưu tiên (cùng ưu tiên thì FIFO) với worker pool có giới hạn
+
+    - max_workers: số job chạy đồng thời tối đa
+    - per_host_limit: số job đồng thời tối đa cho mỗi host (0/None = không giới hạn)
+    """
+
+    def __init__(self, max_workers=None, per_host_limit=None, idle_timeout=30):
+        if max_workers is None:
+            max_workers = SCHEDULER_CONFIG.get('max_concurrent_downloads', 3)
+        if per_host_limit is None:
+            per_host_limit = SCHEDULER_CONFIG.get('per_host_limit', 0)
+        self.max_workers = max(1, int(max_workers))
+        self.per_host_limit = max(0, int(per_host_limit or 0))
+        self.idle_timeout = idle_timeout
+
+        self._cond = threading.Condition()
+        self._pending = []  # list đã sắp xếp: (priority, seq, job)
+        self._seq = itertools.count()
+        self._host_active = {}
+        self._active = 0
+        self._workers = 0
+        self._shutdown = False
+
+    def submit(self, func, *args, url=None, priority=0, **kwargs):
+        """
+        Đưa job vào hàng đợi và trả về concurrent.futures.Future
+        :param url: URL của job, dùng để áp giới hạn theo host
+        :param priority: số nhỏ hơn được chạy trước
+        """
+        job = DownloadJob(func, args, kwargs, url)
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Scheduler đã dừng, không thể thêm job")
+            bisect.insort(self._pending, (priority, next(self._seq), job))
+            self._ensure_workers()
+            self._cond.notify_all()
+        return job.future
+
+    def set_max_workers(self, max_workers):
+        """Thay đổi số job đồng thời tối đa khi đang chạy"""
+        with self._cond:
+            self.max_workers = max(1, int(max_workers))
+            self._ensure_workers()
+            self._cond.notify_all()
+
+    def set_per_host_limit(self, per_host_limit):
+        """Thay đổi giới hạn theo host khi đang chạy"""
+        with self._cond:
+            self.per_host_limit = max(0, int(per_host_limit or 0))
+            self._cond.notify_all()
+
+    def queue_depth(self):
+        """Số job đang chờ trong hàng đợi"""
+        with self._cond:
+            return len(self._pending)
+
+    def active_count(self):
+        """Số job đang chạy"""
+        with self._cond:
+            return self._active
+
+    def shutdown(self, cancel_pending=False):
+        """Dừng nhận job mới; tùy chọn hủy các job đang chờ"""
+        with self._cond:
+            self._shutdown = True
+            if cancel_pending:
+                for _, _, job in self._pending:
+                    job.future.cancel()
+                self._pending.clear()
+            self._cond.notify_all()
+
+    def _ensure_workers(self):
+        # Gọi khi đang giữ self._cond
+        wanted = min(self.max_workers, len(self._pending) + self._active)
+        while self._workers < wanted:
+            self._workers += 1
+            thread = threading.Thread(target=self._worker, daemon=True,
+                                      name=f"download-worker-{self._workers}")
+            thread.start()
+
+    def _next_job(self):
+        # Gọi khi đang giữ self._cond; bỏ qua host đã đạt giới hạn
+        if self._active >= self.max_workers:
+            return None
+        for index, (_, _, job) in enumerate(self._pending):
+            if job.future.cancelled():
+                continue
+            if self.per_host_limit and job.host and \
+                    self._host_active.get(job.host, 0) >= self.per_host_limit:
+                continue
+            del self._pending[index]
+            return job
+        # Dọn các job đã bị hủy
+        self._pending = [item for item in self._pending if not item[2].future.cancelled()]
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    if self._shutdown and not self._pending:
+                        self._workers -= 1
+                        return
+                    notified = self._cond.wait(timeout=self.idle_timeout)
+                    job = self._next_job()
+                    if job is None and (not notified or self._workers > self.max_workers):
+                        self._workers -= 1
+                        return
+                self._active += 1
+                if job.host:
+                    self._host_active[job.host] = self._host_active.get(job.host, 0) + 1
+
+            try:
+                job.run()
+            finally:
+                with self._cond:
+                    self._active -= 1
+                    if job.host:
+                        remaining = self._host_active.get(job.host, 1) - 1
+                        if remaining > 0:
+                            self._host_active[job.host] = remaining
+                        else:
+                            self._host_active.pop(job.host, None)
+                    self._cond.notify_all()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    Trả về scheduler dùng chung cho toàn process
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = DownloadScheduler()
+        return _scheduler
@@ -0,0 +1,173 @@
+# core/temp_files.py
+"""
+Quản lý file tạm do tool tạo ra trong thư mục lưu
+
+Thay vì glob nhiều pattern trên cả thư mục trước mỗi lần tải, mỗi thư mục có
+một manifest nhỏ ghi lại file tạm của tool. Manifest nằm trong APP_DATA_DIR
+(temp_manifests/, tên theo hash đường dẫn thư mục) để không để lại file lạ
+trong thư mục lưu của người dùng. Thư mục chỉ được quét (một lượt os.scandir)
+lần đầu trong mỗi process để dọn file tạm còn sót từ các lần chạy trước.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from .config import APP_DATA_DIR
+
+MANIFEST_DIR = os.path.join(APP_DATA_DIR, 'temp_manifests')
+
+# Chỉ các đuôi file tạm của yt-dlp; không bao giờ khớp file media đã hoàn tất
+_TEMP_NAME_RE = re.compile(r'\.(?:part(?:-Frag\d+(?:\.part)?)?|ytdl|ytdlp|fragment)$', re.IGNORECASE)
+
+# File tạm cũ hơn thời gian này mới bị xóa để tránh đụng vào download đang chạy
+DEFAULT_MAX_AGE = 3600
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+_scanned_folders = set()
+
+
+def is_temp_name(name):
+    """Kiểm tra tên file có phải file tạm của yt-dlp không"""
+    return bool(_TEMP_NAME_RE.search(name))
+
+
+class TempFileManifest:
+    """Manifest file tạm của một thư mục lưu"""
+
+    def __init__(self, folder):
+        self.folder = os.path.abspath(folder)
+        digest = hashlib.sha1(self.folder.encode('utf-8')).hexdigest()
+        self.path = os.path.join(MANIFEST_DIR, f'{digest}.json')
+        self._lock = threading.Lock()
+        self._files = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {name: float(ts) for name, ts in data.get('files', {}).items()}
+        except (OSError, ValueError, AttributeError, TypeError):
+            return {}
+
+    def _save(self):
+        # Gọi khi đang giữ self._lock
+        try:
+            if not self._files:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            os.makedirs(MANIFEST_DIR, exist_ok=True)
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'folder': self.folder, 'files': self._files}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def _name(self, path):
+        path = os.path.abspath(path)
+        if os.path.dirname(path) != self.folder:
+            return None
+        return os.path.basename(path)
+
+    def record(self, path):
+        """Ghi nhận file tạm vừa được tạo"""
+        name = self._name(path) if path else None
+        if not name:
+            return
+        with self._lock:
+            if name in self._files:
+                return
+            self._files[name] = time.time()
+            self._save()
+
+    def discard(self, path):
+        """Bỏ file tạm khỏi manifest (download đã hoàn tất)"""
+        name = self._name(path) if path else None
+        if not name:
+            return
+        with self._lock:
+            if self._files.pop(name, None) is not None:
+                self._save()
+
+    def cleanup(self, max_age=DEFAULT_MAX_AGE):
+        """Xóa file tạm đã ghi nhận cũ hơn max_age giây; O(số file tạm của tool)"""
+        now = time.time()
+        changed = False
+        with self._lock:
+            for name in list(self._files):
+                path = os.path.join(self.folder, name)
+                try:
+                    mtime = os.path.getmtime(path)
+                except OSError:
+                    # File đã bị xóa/đổi tên (download xong)
+                    del self._files[name]
+                    changed = True
+                    continue
+                if now - mtime > max_age:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    del self._files[name]
+                    changed = True
+            if changed:
+                self._save()
+
+
+def get_manifest(folder):
+    """
+    Trả về manifest dùng chung của thư mục
+    """
+    key = os.path.abspath(folder)
+    with _manifests_lock:
+        manifest = _manifests.get(key)
+        if manifest is None:
+            manifest = TempFileManifest(key)
+            _manifests[key] = manifest
+        return manifest
+
+
+def _scan_stale_temp_files(folder, max_age):
+    # Một lượt os.scandir, chỉ stat các file khớp đuôi file tạm.
+    # Bỏ qua file .part có manifest resume (.part.json) của HttpFileDownloader.
+    now = time.time()
+    try:
+        with os.scandir(folder) as entries:
+            candidates = []
+            resumable = set()
+            for entry in entries:
+                if entry.name.endswith('.part.json'):
+                    resumable.add(entry.name[:-len('.json')])
+                elif is_temp_name(entry.name):
+                    candidates.append(entry)
+    except OSError:
+        return
+    for entry in candidates:
+        if entry.name in resumable:
+            continue
+        try:
+            if entry.is_file(follow_symlinks=False) and \
+                    now - entry.stat(follow_symlinks=False).st_mtime > max_age:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def cleanup_temp_files(folder, max_age=DEFAULT_MAX_AGE):
+    """
+    Dọn file tạm cũ trong thư mục: quét toàn thư mục một lần mỗi process,
+    các lần sau chỉ kiểm tra file trong manifest
+    """
+    key = os.path.abspath(folder)
+    with _manifests_lock:
+        first_time = key not in _scanned_folders
+        _scanned_folders.add(key)
+    if first_time:
+        _scan_stale_temp_files(key, max_age)
+    get_manifest(key).cleanup(max_age)
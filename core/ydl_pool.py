@@ -0,0 +1,168 @@
+# core/ydl_pool.py
+"""
+Pool các instance YoutubeDL dùng lại trong một batch
+
+Tạo YoutubeDL mới cho mỗi URL phải dựng lại extractor, cookie jar và HTTP
+opener. Pool giữ các instance đã "warm" theo bộ option hiệu lực để các URL
+cùng mode/cookie file dùng lại.
+"""
+
+import atexit
+import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+from .config import YDL_POOL_CONFIG
+
+# Option thay đổi theo từng lần gọi, không đưa vào key của pool
+# (concurrent_fragment_downloads do core/adaptive.py thay đổi liên tục theo host)
+PER_CALL_OPTIONS = ('progress_hooks', 'post_hooks', 'logger', 'retry_sleep_functions', 'concurrent_fragment_downloads')
+
+
+def make_options_key(opts):
+    """
+    Tạo key ổn định từ bộ option (bỏ qua các option theo từng lần gọi)
+    """
+    effective = {k: v for k, v in opts.items() if k not in PER_CALL_OPTIONS}
+    return json.dumps(effective, sort_keys=True, default=repr)
+
+
+class _PooledInstance:
+    """YoutubeDL kèm danh sách progress/post hook của lần dùng hiện tại"""
+
+    def __init__(self, opts):
+        self.hooks = []
+        self.post_hooks = []
+        params = {k: v for k, v in opts.items() if k not in PER_CALL_OPTIONS}
+        params['progress_hooks'] = [self._dispatch]
+        params['post_hooks'] = [self._dispatch_post]
+        from yt_dlp import YoutubeDL  # import khi tạo instance đầu tiên (khởi động nhanh)
+        self.ydl = YoutubeDL(params)
+
+    def _dispatch(self, d):
+        for hook in self.hooks:
+            hook(d)
+
+    def _dispatch_post(self, filepath):
+        for hook in self.post_hooks:
+            hook(filepath)
+
+    def prepare(self, opts):
+        """Gắn hook/logger của lần gọi và reset bộ đếm của lần dùng trước"""
+        self.hooks = list(opts.get('progress_hooks') or [])
+        self.post_hooks = list(opts.get('post_hooks') or [])
+        for name in ('logger', 'retry_sleep_functions', 'concurrent_fragment_downloads'):
+            if opts.get(name) is not None:
+                self.ydl.params[name] = opts[name]
+            else:
+                self.ydl.params.pop(name, None)
+        # max_downloads và mã lỗi được tính theo instance, cần reset khi dùng lại
+        if hasattr(self.ydl, '_num_downloads'):
+            self.ydl._num_downloads = 0
+        if hasattr(self.ydl, '_download_retcode'):
+            self.ydl._download_retcode = 0
+
+    def close(self):
+        self.hooks = []
+        self.post_hooks = []
+        try:
+            self.ydl.close()
+        except Exception:
+            pass
+
+
+class YoutubeDLPool:
+    """
+    Pool YoutubeDL theo bộ option hiệu lực
+
+    Mỗi instance chỉ được một thread dùng tại một thời điểm; instance rảnh
+    được giữ lại (tối đa max_idle_per_key cho mỗi key, max_keys key gần nhất).
+    """
+
+    def __init__(self, max_idle_per_key=None, max_keys=None):
+        self.max_idle_per_key = max_idle_per_key or YDL_POOL_CONFIG.get('max_idle_per_key', 2)
+        self.max_keys = max_keys or YDL_POOL_CONFIG.get('max_keys', 8)
+        self._idle = OrderedDict()  # key -> [_PooledInstance, ...]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self, opts):
+        """
+        Mượn một YoutubeDL cho bộ option, trả lại pool khi xong
+        """
+        key = make_options_key(opts)
+        instance = self._acquire(key, opts)
+        reusable = False
+        try:
+            yield instance.ydl
+            reusable = True
+        except Exception as e:
+            # DownloadError là lỗi của URL, instance vẫn dùng lại được
+            reusable = type(e).__name__ == 'DownloadError'
+            raise
+        finally:
+            self._release(key, instance, reusable)
+
+    def _acquire(self, key, opts):
+        instance = None
+        with self._lock:
+            instances = self._idle.get(key)
+            if instances:
+                instance = instances.pop()
+                self._idle.move_to_end(key)
+        if instance is None:
+            instance = _PooledInstance(opts)
+        instance.prepare(opts)
+        return instance
+
+    def _release(self, key, instance, reusable):
+        instance.hooks = []
+        instance.post_hooks = []
+        to_close = []
+        if reusable:
+            with self._lock:
+                instances = self._idle.setdefault(key, [])
+                self._idle.move_to_end(key)
+                if len(instances) < self.max_idle_per_key:
+                    instances.append(instance)
+                    instance = None
+                while len(self._idle) > self.max_keys:
+                    _, evicted = self._idle.popitem(last=False)
+                    to_close.extend(evicted)
+        if instance is not None:
+            to_close.append(instance)
+        for item in to_close:
+            item.close()
+
+    def close_all(self):
+        """Đóng toàn bộ instance đang rảnh"""
+        with self._lock:
+            to_close = [item for instances in self._idle.values() for item in instances]
+            self._idle.clear()
+        for item in to_close:
+            item.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_ydl_pool():
+    """
+    Trả về pool YoutubeDL dùng chung cho toàn process
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = YoutubeDLPool()
+            atexit.register(_pool.close_all)
+        return _pool
+
+
+def ydl_session(opts):
+    """
+    Shortcut: with ydl_session(opts) as ydl: ydl.download([url])
+    """
+    return get_ydl_pool().session(opts)
@@ -0,0 +1,142 @@
+# tests/test_bandwidth.py
+"""Kiểm tra các hàm thuần của core/bandwidth.py (không mở kết nối, không chờ)"""
+
+import datetime
+import math
+import unittest
+
+from core.bandwidth import BandwidthLimiter, BandwidthSchedule, fair_share, parse_rate
+
+M = 1024 ** 2
+
+
+def at(hour, minute=0, day=1):
+    return datetime.datetime(2024, 1, day, hour, minute)
+
+
+class ParseRateTest(unittest.TestCase):
+
+    def test_units(self):
+        self.assertEqual(parse_rate('1048576'), 1048576)
+        self.assertEqual(parse_rate('500K'), 500 * 1024)
+        self.assertEqual(parse_rate('2M'), 2 * 1024 ** 2)
+        self.assertEqual(parse_rate('1.5MB'), int(1.5 * 1024 ** 2))
+        self.assertEqual(parse_rate('2MiB/s'), 2 * 1024 ** 2)
+        self.assertEqual(parse_rate(' 1g '), 1024 ** 3)
+
+    def test_unlimited(self):
+        for text in ('', '0', 'none', 'unlimited', 'INF', '0K'):
+            self.assertIsNone(parse_rate(text), text)
+
+    def test_invalid(self):
+        for text in ('abc', '2T', '-1M', '1,5M', 'M'):
+            with self.assertRaises(ValueError, msg=text):
+                parse_rate(text)
+
+
+class FairShareTest(unittest.TestCase):
+
+    def test_weighted_split(self):
+        shares = fair_share(900, {'a': (1, None), 'b': (2, None)})
+        self.assertAlmostEqual(shares['a'], 300)
+        self.assertAlmostEqual(shares['b'], 600)
+
+    def test_cap_redistributed(self):
+        # a chỉ cần 100: phần dư chia cho b và c theo trọng số
+        shares = fair_share(1000, {'a': (1, 100), 'b': (1, None), 'c': (2, None)})
+        self.assertEqual(shares['a'], 100)
+        self.assertAlmostEqual(shares['b'], 300)
+        self.assertAlmostEqual(shares['c'], 600)
+
+    def test_cascading_caps(self):
+        # b chỉ bị cap sau khi phần dư của a được chia lại
+        shares = fair_share(900, {'a': (1, 100), 'b': (1, 350), 'c': (1, None)})
+        self.assertEqual(shares['a'], 100)
+        self.assertEqual(shares['b'], 350)
+        self.assertAlmostEqual(shares['c'], 450)
+
+    def test_cap_above_share_ignored(self):
+        shares = fair_share(600, {'a': (1, 1000), 'b': (1, None)})
+        self.assertAlmostEqual(shares['a'], 300)
+        self.assertAlmostEqual(shares['b'], 300)
+
+    def test_all_capped_leaves_remainder(self):
+        shares = fair_share(1000, {'a': (1, 100), 'b': (1, 200)})
+        self.assertEqual(shares, {'a': 100, 'b': 200})
+
+    def test_unlimited_total(self):
+        shares = fair_share(math.inf, {'a': (1, 500), 'b': (1, None)})
+        self.assertEqual(shares['a'], 500)
+        self.assertEqual(shares['b'], math.inf)
+
+    def test_empty(self):
+        self.assertEqual(fair_share(1000, {}), {})
+
+
+class HostWeightTest(unittest.TestCase):
+
+    def test_weight_from_host_and_subdomain(self):
+        limiter = BandwidthLimiter(rate=4000, host_weights={'example.com': 3})
+        self.assertEqual(limiter.register('cdn.example.com').weight, 3)
+        self.assertEqual(limiter.register('other.org').weight, 1)
+        self.assertEqual(limiter.register('example.com', weight=2).weight, 2)
+
+    def test_shares_follow_weights(self):
+        limiter = BandwidthLimiter(rate=4000)
+        limiter.set_host_weight('example.com', 3)
+        heavy, light = limiter.register('example.com'), limiter.register('other.org')
+        heavy.consume(1)
+        light.consume(1)
+        shares = {host: rate for host, _, rate in limiter.snapshot()}
+        self.assertAlmostEqual(shares['example.com'], 3000)
+        self.assertAlmostEqual(shares['other.org'], 1000)
+
+
+class BandwidthScheduleTest(unittest.TestCase):
+
+    def test_window_and_star_default(self):
+        schedule = BandwidthSchedule.parse('09:00-12:00=1M,*=2M', default=5 * M)
+        self.assertTrue(schedule.default_given)
+        self.assertEqual(schedule.rate_at(at(8, 59)), 2 * M)
+        self.assertEqual(schedule.rate_at(at(9)), M)
+        self.assertEqual(schedule.rate_at(at(11, 59)), M)
+        self.assertEqual(schedule.rate_at(at(12)), 2 * M)
+
+    def test_default_without_star(self):
+        schedule = BandwidthSchedule.parse('09:00-12:00=1M', default=5 * M)
+        self.assertFalse(schedule.default_given)
+        self.assertEqual(schedule.rate_at(at(13)), 5 * M)
+        self.assertIsNone(BandwidthSchedule.parse('09:00-12:00=1M').rate_at(at(13)))
+
+    def test_wrap_past_midnight(self):
+        schedule = BandwidthSchedule.parse('22:00-06:00=unlimited,*=1M')
+        self.assertIsNone(schedule.rate_at(at(23, 30)))
+        self.assertIsNone(schedule.rate_at(at(0)))
+        self.assertIsNone(schedule.rate_at(at(5, 59)))
+        self.assertEqual(schedule.rate_at(at(6)), M)
+        self.assertEqual(schedule.rate_at(at(21, 59)), M)
+
+    def test_first_window_wins(self):
+        schedule = BandwidthSchedule.parse('08:00-18:00=1M,12:00-13:00=unlimited')
+        self.assertEqual(schedule.rate_at(at(12, 30)), M)
+
+    def test_next_change(self):
+        schedule = BandwidthSchedule.parse('22:00-06:00=unlimited,*=1M')
+        self.assertEqual(schedule.next_change(at(12)), at(22))
+        self.assertEqual(schedule.next_change(at(22)), at(6, day=2))
+        self.assertEqual(schedule.next_change(at(23, 59)), at(6, day=2))
+        self.assertEqual(schedule.next_change(at(3)), at(6))
+
+    def test_next_change_end_of_day(self):
+        schedule = BandwidthSchedule.parse('18:00-24:00=1M')
+        self.assertEqual(schedule.next_change(at(19)), at(0, day=2))
+
+    def test_invalid(self):
+        for text in ('', '*=2M', ' , ', '09:00-09:00=1M', '9-12=1M', '25:00-01:00=1M',
+                     '09:00-12:00', '09:00=1M', '09:00-12:00=fast'):
+            with self.assertRaises(ValueError, msg=text):
+                BandwidthSchedule.parse(text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,6 +11,10 @@ if project_root not in sys.path:
 
 try:
     from core.downloader import download_video, check_ffmpeg_available
+    from core.scheduler import get_scheduler
+    from core.events import get_event_bus, new_job_id, JobReporter, StatusEvent
+    from core.job_store import get_job_recorder
+    from core.progress import ProgressEvent, format_progress_event
 except ImportError:
     # Fallback for when running as script
     core_dir = os.path.join(project_root, 'core')
@@ -18,6 +22,10 @@ except ImportError:
         sys.path.insert(0, core_dir)
     try:
         from downloader import download_video, check_ffmpeg_available  # type: ignore
+        from scheduler import get_scheduler  # type: ignore
+        from events import get_event_bus, new_job_id, JobReporter, StatusEvent  # type: ignore
+        from job_store import get_job_recorder  # type: ignore
+        from progress import ProgressEvent, format_progress_event  # type: ignore
     except ImportError:
         print("Error: Could not import required modules")
         sys.exit(1)
@@ -29,6 +37,20 @@ class DownloadController:
     def __init__(self, app):
         self.app = app
         self.active_downloads = 0
+        self._lock = threading.Lock()
+        self.scheduler = get_scheduler()
+        # Trạng thái job được lưu vào SQLite để tiếp tục sau khi app bị tắt
+        self.job_recorder = get_job_recorder()
+        get_event_bus().subscribe(self.on_event, (StatusEvent, ProgressEvent))
+    
+    def on_event(self, event):
+        """Hiển thị sự kiện của các job tải video trên thanh tiến độ"""
+        if not (event.job_id or '').startswith('video-'):
+            return
+        if isinstance(event, StatusEvent):
+            self.app.download_tab.video_progress.update_status(event.message, event.color)
+        elif event.phase == 'downloading':
+            self.app.download_tab.video_progress.update_status(format_progress_event(event), "blue")
     
     def start_download(self):
         """Start video download process"""
@@ -55,17 +77,24 @@ class DownloadController:
             if url.strip():
                 self.run_download(url, output_folder, cookie_file, optimize_mode, i)
     
-    def run_download(self, url, output_folder, cookie_file, optimize_mode, line_number):
-        """Run download in separate thread"""
-        def update_status(status_text, color="#3b5998"):
-            self.app.download_tab.video_progress.update_status(status_text, color)
+    def run_download(self, url, output_folder, cookie_file, optimize_mode, line_number, record=None):
+        """Queue download on the shared scheduler"""
+        job_id = new_job_id('video')
+        update_status = JobReporter(job_id, url)
+        
+        if self.job_recorder:
+            if record is None:
+                record = self.job_recorder.store.add(
+                    url, output_folder, kind='video',
+                    options={'mode': optimize_mode, 'cookie': cookie_file})
+            if record.completed:
+                # Đã tải xong trước đó: không extract lại
+                update_status(f"⏭️ Video {line_number} đã được tải: {record.output_path or url}", "green")
+                return
+            self.job_recorder.track(job_id, record.id)
         
         def download_thread():
             try:
-                self.active_downloads += 1
-                self.app.download_tab.video_download_button.config(state="disabled")
-                self.app.download_tab.video_progress.start_progress()
-                
                 update_status(f"🚀 Bắt đầu tải video {line_number}...", "blue")
                 
                 # Call the download function
@@ -73,8 +102,8 @@ class DownloadController:
                     url=url,
                     output_folder=output_folder,
                     cookie_file=cookie_file,
-                    status_callback=update_status,
-                    optimize_mode=optimize_mode
+                    optimize_mode=optimize_mode,
+                    job_id=job_id
                 )
                 
                 if success:
@@ -85,15 +114,31 @@ class DownloadController:
             except Exception as e:
                 update_status(f"❌ Lỗi không xác định: {str(e)}", "red")
             finally:
-                self.active_downloads -= 1
-                if self.active_downloads <= 0:
+                with self._lock:
+                    self.active_downloads -= 1
+                    finished = self.active_downloads <= 0
+                if finished:
                     self.app.download_tab.video_download_button.config(state="normal")
                     self.app.download_tab.video_progress.stop_progress()
                     self.app.download_tab.video_progress.clear_progress()
         
-        # Start download thread
-        thread = threading.Thread(target=download_thread, daemon=True)
-        thread.start()
+        # Job đang chờ trong hàng đợi cũng được tính là đang hoạt động
+        with self._lock:
+            self.active_downloads += 1
+        self.app.download_tab.video_download_button.config(state="disabled")
+        self.app.download_tab.video_progress.start_progress()
+        
+        self.scheduler.submit(download_thread, url=url)
+    
+    def resume_unfinished(self):
+        """Đưa lại vào hàng đợi các job video chưa xong của lần chạy trước"""
+        if not self.job_recorder:
+            return 0
+        records = self.job_recorder.store.unfinished('video')
+        for i, record in enumerate(records, 1):
+            self.run_download(record.url, record.output_folder, record.options.get('cookie'),
+                              record.options.get('mode', 'balanced'), i, record=record)
+        return len(records)
     
     def get_active_downloads(self):
         """Get number of active downloads"""
@@ -2,7 +2,6 @@
 import threading
 import os
 import sys
-import requests
 import re
 from urllib.parse import urlparse, parse_qs
 
@@ -13,25 +12,62 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 try:
-    from utils.cookies import load_cookies_from_file
+    from core.scheduler import get_scheduler
+    from core.http_downloader import HttpFileDownloader
+    from core.content_store import get_content_store
+    from core.progress import ProgressEvent, format_progress_event
+    from core.events import get_event_bus, new_job_id, JobReporter, StatusEvent
+    from core.job_store import get_job_recorder
 except ImportError:
     # Fallback for when running as script
     utils_dir = os.path.join(project_root, 'utils')
+    core_dir = os.path.join(project_root, 'core')
     if utils_dir not in sys.path:
         sys.path.insert(0, utils_dir)
+    if core_dir not in sys.path:
+        sys.path.insert(0, core_dir)
     try:
-        from cookies import load_cookies_from_file  # type: ignore
+        from scheduler import get_scheduler  # type: ignore
+        from http_downloader import HttpFileDownloader  # type: ignore
+        from content_store import get_content_store  # type: ignore
+        from progress import ProgressEvent, format_progress_event  # type: ignore
+        from events import get_event_bus, new_job_id, JobReporter, StatusEvent  # type: ignore
+        from job_store import get_job_recorder  # type: ignore
     except ImportError:
         print("Error: Could not import required modules")
         sys.exit(1)
 
 
+
+def get_http_session(url, cookie_file=None):
+    """Session dùng chung của core.http_session (requests chỉ được import khi tải file đầu tiên)"""
+    try:
+        from core.http_session import get_http_session as get_session
+    except ImportError:
+        from http_session import get_http_session as get_session  # type: ignore
+    return get_session(url, cookie_file)
+
+
 class OneDriveController:
     """Controller for OneDrive/SharePoint download operations"""
     
     def __init__(self, app):
         self.app = app
         self.active_downloads = 0
+        self._lock = threading.Lock()
+        self.scheduler = get_scheduler()
+        # Trạng thái job được lưu vào SQLite để tiếp tục sau khi app bị tắt
+        self.job_recorder = get_job_recorder()
+        get_event_bus().subscribe(self.on_event, (StatusEvent, ProgressEvent))
+    
+    def on_event(self, event):
+        """Hiển thị sự kiện của các job OneDrive trên thanh tiến độ"""
+        if not (event.job_id or '').startswith('onedrive-'):
+            return
+        if isinstance(event, StatusEvent):
+            self.app.download_tab.onedrive_progress.update_status(event.message, event.color)
+        elif event.phase == 'downloading':
+            self.app.download_tab.onedrive_progress.update_status(format_progress_event(event), "blue")
     
     def start_onedrive_download(self):
         """Start OneDrive download process"""
@@ -55,17 +91,24 @@ class OneDriveController:
             if url.strip():
                 self.run_onedrive_download(url, output_folder, cookie_file, i)
     
-    def run_onedrive_download(self, onedrive_url, output_folder, cookie_file, line_number):
-        """Run OneDrive download in separate thread"""
-        def update_status(status_text, color="#e67e22"):
-            self.app.download_tab.onedrive_progress.update_status(status_text, color)
+    def run_onedrive_download(self, onedrive_url, output_folder, cookie_file, line_number, record=None):
+        """Queue OneDrive download on the shared scheduler"""
+        update_status = JobReporter(new_job_id('onedrive'), onedrive_url)
+        
+        if self.job_recorder:
+            if record is None:
+                record = self.job_recorder.store.add(
+                    onedrive_url, output_folder, kind='onedrive', options={'cookie': cookie_file})
+            if record.completed:
+                # Đã tải xong trước đó: không tải lại
+                update_status(f"⏭️ File OneDrive {line_number} đã được tải: {record.output_path or onedrive_url}", "green")
+                return
+            self.job_recorder.track(update_status.job_id, record.id)
         
         def download_thread():
+            success = False
+            update_status.started()
             try:
-                self.active_downloads += 1
-                self.app.download_tab.onedrive_download_button.config(state="disabled")
-                self.app.download_tab.onedrive_progress.start_progress()
-                
                 update_status(f"🚀 Bắt đầu tải file OneDrive {line_number}...", "blue")
                 
                 # Call the download function
@@ -81,14 +124,21 @@ class OneDriveController:
             except Exception as e:
                 update_status(f"❌ Lỗi không xác định: {str(e)}", "red")
             finally:
-                self.active_downloads -= 1
-                if self.active_downloads <= 0:
+                update_status.finished(success)
+                with self._lock:
+                    self.active_downloads -= 1
+                    finished = self.active_downloads <= 0
+                if finished:
                     self.app.download_tab.onedrive_download_button.config(state="normal")
                     self.app.download_tab.onedrive_progress.stop_progress()
         
-        # Start download thread
-        thread = threading.Thread(target=download_thread, daemon=True)
-        thread.start()
+        # Job đang chờ trong hàng đợi cũng được tính là đang hoạt động
+        with self._lock:
+            self.active_downloads += 1
+        self.app.download_tab.onedrive_download_button.config(state="disabled")
+        self.app.download_tab.onedrive_progress.start_progress()
+        
+        self.scheduler.submit(download_thread, url=onedrive_url)
     
     def download_onedrive_file(self, onedrive_url, output_folder, cookie_file, status_callback):
         """Download file from OneDrive/SharePoint"""
@@ -98,27 +148,9 @@ class OneDriveController:
                 status_callback("❌ URL không hợp lệ hoặc không phải file có thể tải", "red")
                 return False
             
-            # Load cookies if provided
-            cookies = {}
-            if cookie_file:
-                cookies = load_cookies_from_file(cookie_file)
-            
-            # Create session with cookies
-            session = requests.Session()
-            if cookies:
-                session.cookies.update(cookies)
-            
-            # Set headers
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-            }
-            session.headers.update(headers)
+            # Session dùng chung theo host: dùng lại kết nối keep-alive và cookie jar
+            # (cookie file chỉ đọc một lần) giữa các file trên cùng tenant
+            session = get_http_session(onedrive_url, cookie_file)
             
             status_callback("🔍 Đang phân tích URL...", "blue")
             
@@ -128,7 +160,7 @@ class OneDriveController:
                 
                 # Handle complex SharePoint URLs
                 if self.is_complex_sharepoint_url(onedrive_url):
-                    return self.handle_complex_sharepoint(onedrive_url, output_folder, cookie_file, status_callback)
+                    return self.handle_complex_sharepoint(onedrive_url, output_folder, session, status_callback)
                 else:
                     # Simple OneDrive URL
                     return self.download_from_url(onedrive_url, output_folder, None, session, status_callback)
@@ -261,7 +293,7 @@ class OneDriveController:
         """Check if URL is a complex SharePoint sharing URL"""
         return 'sharepoint.com' in url.lower() and ('/personal/' in url or '/sites/' in url)
     
-    def handle_complex_sharepoint(self, url, output_folder, cookie_file, status_callback):
+    def handle_complex_sharepoint(self, url, output_folder, session, status_callback):
         """Handle complex SharePoint URLs"""
         try:
             status_callback("🔧 Xử lý URL SharePoint phức tạp...", "blue")
@@ -276,7 +308,7 @@ class OneDriveController:
             for approach in approaches:
                 try:
                     status_callback(f"🔄 Thử phương pháp: {approach.__name__}...", "blue")
-                    if approach(url, output_folder, None, None, status_callback):
+                    if approach(url, output_folder, None, session, status_callback):
                         return True
                 except Exception as e:
                     status_callback(f"⚠️ Phương pháp {approach.__name__} thất bại: {str(e)}", "orange")
@@ -387,27 +419,40 @@ class OneDriveController:
             
             file_path = os.path.join(output_folder, filename)
             
-            # Download with progress
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
+            # Download with progress (chia segment + resume nếu server hỗ trợ Range)
+            # Sự kiện tiến độ đã được gộp (tối đa ~10 lần/giây); JobReporter phát
+            # thẳng ProgressEvent lên event bus, callback thường nhận chuỗi đã format
+            report_progress = getattr(status_callback, 'progress', None)
+            if report_progress is None:
+                def report_progress(event):
+                    if event.phase == 'downloading':
+                        status_callback(format_progress_event(event), "blue")
             
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        
-                        if total_size > 0:
-                            progress = (downloaded / total_size) * 100
-                            status_callback(f"📥 Đang tải: {progress:.1f}% ({downloaded}/{total_size} bytes)", "blue")
+            # Lưu theo nội dung (tùy chọn): file trùng nội dung chỉ lưu một lần, tên file là hardlink
+            downloader = HttpFileDownloader(session, url, file_path, progress_callback=report_progress,
+                                            content_store=get_content_store(output_folder))
+            file_path = downloader.download(response)
             
-            status_callback(f"✅ Tải thành công: {filename}", "green")
+            saved = getattr(status_callback, 'saved', None)
+            if saved:
+                saved(file_path)
+            status_callback(f"✅ Tải thành công: {os.path.basename(file_path)}", "green")
             return True
             
         except Exception as e:
             status_callback(f"❌ Lỗi tải file: {str(e)}", "red")
             return False
     
+    def resume_unfinished(self):
+        """Đưa lại vào hàng đợi các job OneDrive chưa xong của lần chạy trước"""
+        if not self.job_recorder:
+            return 0
+        records = self.job_recorder.store.unfinished('onedrive')
+        for i, record in enumerate(records, 1):
+            self.run_onedrive_download(record.url, record.output_folder, record.options.get('cookie'),
+                                       i, record=record)
+        return len(records)
+    
     def get_active_downloads(self):
         """Get number of active downloads"""
         return self.active_downloads
@@ -1,6 +1,7 @@
 # ui/views/main_window.py
 import tkinter as tk
 from tkinter import ttk
+import importlib.util
 import sys
 import os
 
@@ -59,25 +60,23 @@ class VideoDownloaderApp(tk.Tk):
         
         # Initialize cookies after all widgets are created
         self.cookie_controller.initialize_cookies()
+        
+        # Tiếp tục các job chưa xong khi app bị tắt giữa chừng
+        self.after(500, self.resume_unfinished_downloads)
+    
+    def resume_unfinished_downloads(self):
+        """Resume jobs left unfinished by the previous session"""
+        if self.download_controller.resume_unfinished():
+            self.download_tab.video_progress.update_status("🔁 Tiếp tục các video chưa tải xong...", "blue")
+        if self.onedrive_controller.resume_unfinished():
+            self.download_tab.onedrive_progress.update_status("🔁 Tiếp tục các file OneDrive chưa tải xong...", "blue")
     
     def check_dependencies(self):
         """Check required dependencies"""
-        missing_deps = []
-        
-        try:
-            import yt_dlp
-        except ImportError:
-            missing_deps.append("yt-dlp")
-        
-        try:
-            import requests
-        except ImportError:
-            missing_deps.append("requests")
-        
-        try:
-            import psutil
-        except ImportError:
-            missing_deps.append("psutil")
+        # find_spec chỉ tìm module, không import (yt_dlp/requests được nạp khi tải file đầu tiên)
+        missing_deps = [package for module, package in (
+            ('yt_dlp', 'yt-dlp'), ('requests', 'requests'), ('psutil', 'psutil'))
+            if importlib.util.find_spec(module) is None]
         
         if missing_deps:
             print(f"⚠️ Warning: Missing dependencies: {', '.join(missing_deps)}")
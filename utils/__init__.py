@@ -5,13 +5,24 @@ Utility functions for video downloader
 
 from .cookies import *
 from .ffmpeg_checker import *
-from .system_optimizer import SystemOptimizer
 
 __all__ = [
     'is_valid_cookie_file',
     'convert_cookies_to_yt_dlp_format',
     'extract_cookies_for_domain',
     'check_ffmpeg',
+    'is_ffmpeg_available',
+    'get_ffmpeg_info',
+    'get_ffmpeg_encoders',
+    'invalidate_ffmpeg_cache',
     'get_ffmpeg_installation_guide',
     'SystemOptimizer'
 ]
+
+
+def __getattr__(name):
+    # SystemOptimizer import psutil: chỉ nạp khi được dùng (khởi động nhanh)
+    if name == 'SystemOptimizer':
+        from .system_optimizer import SystemOptimizer
+        return SystemOptimizer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
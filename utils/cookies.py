@@ -1,151 +1,353 @@
 # utils/cookies.py
+"""
+Đọc file cookie (.txt Netscape hoặc .json) và cache kết quả đã parse
 
+Mỗi file chỉ được parse một lần thành CookieStore, cache theo đường dẫn +
+mtime + kích thước: sửa/ghi lại file thì lần gọi sau tự parse lại. Mọi hàm
+bên dưới (kiểm tra file, dict cookie cho requests, file cookie cho yt-dlp,
+lọc theo domain) đọc từ CookieStore thay vì mở lại file.
+
+Cookie được đánh index theo domain đảo ngược ('com.sharepoint.contoso'); tra
+cứu cho một host chỉ thử các hậu tố của host (số nhãn domain) và khớp domain/
+path theo RFC 6265, nên mỗi host chỉ nhận cookie của chính nó.
+"""
+
+import atexit
 import os
 import json
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
 
 
-def is_valid_cookie_file(path):
+_private_dir = None
+_private_dir_lock = threading.Lock()
+
+
+def _cookie_dir():
     """
-    Kiểm tra xem file cookies có tồn tại và hợp lệ không
-    Hỗ trợ cả định dạng .txt (Netscape) và .json
+    Thư mục riêng của process (mkdtemp, quyền 0700) chứa file cookie đã
+    chuyển đổi; bị xóa khi thoát
     """
-    if not os.path.exists(path):
-        return False
+    global _private_dir
+    with _private_dir_lock:
+        if _private_dir is None:
+            _private_dir = tempfile.mkdtemp(prefix='video_downloader_cookies_')
+            atexit.register(shutil.rmtree, _private_dir, True)
+        return _private_dir
+
+
+@dataclass(frozen=True)
+class Cookie:
+    """Một cookie trong file"""
+    domain: str                     # '' nếu file không ghi domain
+    name: str
+    value: str
+    path: str = '/'
+    secure: bool = False
+    expires: int = 0                # 0 = cookie phiên
+    include_subdomains: bool = True
+
+    @property
+    def expired(self):
+        return 0 < self.expires < time.time()
 
+
+def reverse_domain(domain):
+    """'contoso.sharepoint.com' -> 'com.sharepoint.contoso' (khóa của index)"""
+    return '.'.join(reversed(domain.strip('.').lower().split('.')))
+
+
+def path_matches(request_path, cookie_path):
+    """Khớp path theo RFC 6265 mục 5.1.4"""
+    if request_path == cookie_path:
+        return True
+    return request_path.startswith(cookie_path) and (
+        cookie_path.endswith('/') or request_path[len(cookie_path)] == '/')
+
+
+def _is_ip(host):
+    return ':' in host or host.replace('.', '').isdigit()
+
+
+def _parse_txt(text):
+    """Parse file Netscape: trả về (danh sách Cookie, file có hợp lệ không)"""
+    cookies = []
+    valid = False
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        # Dòng "#HttpOnly_<domain>..." là cookie HttpOnly, không phải comment
+        if line.startswith('#HttpOnly_'):
+            line = line[len('#HttpOnly_'):]
+        elif line.startswith('#'):
+            continue
+        parts = line.split('\t')
+        # Dòng hợp lệ có ít nhất 6 cột (domain, flag, path, secure, expires, name, value)
+        if len(parts) >= 6:
+            valid = True
+        if len(parts) < 7:
+            continue
+        domain, flag, path, secure, expires, name, value = parts[:7]
+        if not name:
+            continue
+        try:
+            expires = int(expires or 0)
+        except ValueError:
+            expires = 0
+        cookies.append(Cookie(domain, name, value, path or '/', secure.upper() == 'TRUE',
+                              expires, flag.upper() == 'TRUE'))
+    return cookies, valid
+
+
+def _json_cookie(item):
+    name = item.get('name', '')
+    if not name:
+        return None
     try:
-        file_ext = os.path.splitext(path)[1].lower()
-        
-        if file_ext == '.json':
-            return is_valid_json_cookie_file(path)
+        expires = int(float(item.get('expirationDate') or item.get('expires') or 0))
+    except (TypeError, ValueError):
+        expires = 0
+    return Cookie(item.get('domain') or '', name,
+                  str(item.get('value', '')), item.get('path') or '/', bool(item.get('secure')),
+                  expires, not item.get('hostOnly', False))
+
+
+def _parse_json(text):
+    """Parse file JSON: trả về (danh sách Cookie, file có hợp lệ không)"""
+    data = json.loads(text)
+    cookies = []
+    if isinstance(data, list):
+        # Format: [{"name": "...", "value": "...", "domain": "..."}, ...]
+        valid = len(data) > 0 and all(isinstance(item, dict) for item in data)
+        items = data
+    elif isinstance(data, dict):
+        # Format: {"cookies": [...]} hoặc {"domain": {...}}
+        valid = len(data) > 0
+        if 'cookies' in data and isinstance(data['cookies'], list):
+            items = data['cookies']
         else:
-            return is_valid_txt_cookie_file(path)
-    except Exception:
-        return False
+            items = []
+            for domain, values in data.items():
+                if isinstance(values, dict):
+                    for name, value in values.items():
+                        if name and isinstance(value, str):
+                            cookies.append(Cookie(domain, name, value))
+    else:
+        return [], False
+    for item in items:
+        if isinstance(item, dict):
+            cookie = _json_cookie(item)
+            if cookie:
+                cookies.append(cookie)
+    return cookies, valid
 
 
-def is_valid_txt_cookie_file(path):
+class CookieStore:
     """
-    Kiểm tra file cookie .txt (Netscape format)
+    Cookie đã parse của một file, đánh index theo domain
+    """
+
+    def __init__(self, path, key, cookies, valid):
+        self.path = path
+        self.key = key              # (đường dẫn tuyệt đối, mtime_ns, size)
+        self.cookies = cookies
+        self.valid = valid
+        # domain đảo ngược -> [Cookie], path dài trước (thứ tự gửi theo RFC 6265)
+        self._index = {}
+        for cookie in sorted(cookies, key=lambda c: -len(c.path)):
+            key = reverse_domain(cookie.domain) if cookie.domain else ''
+            self._index.setdefault(key, []).append(cookie)
+        self._hosts = {}            # host -> [Cookie] khớp domain (cache)
+        self._dict = None
+        self._netscape_path = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_json(self):
+        return os.path.splitext(self.path)[1].lower() == '.json'
+
+    def as_dict(self):
+        """{name: value} của mọi cookie (dạng dùng cho requests)"""
+        if self._dict is None:
+            self._dict = {cookie.name: cookie.value for cookie in self.cookies if cookie.value}
+        return dict(self._dict)
+
+    def for_host(self, host):
+        """
+        Cookie có domain khớp host (RFC 6265 mục 5.1.3), path dài trước.
+        Cookie host-only chỉ khớp đúng host; cookie không ghi domain khớp mọi host.
+        """
+        host = host.strip('.').lower()
+        cookies = self._hosts.get(host)
+        if cookies is not None:
+            return cookies
+        labels = host.split('.')
+        candidates = []
+        # Hậu tố dài nhất trước: 'a.b.com', 'b.com', 'com' (IP chỉ khớp chính nó)
+        for i in range(1 if _is_ip(host) else len(labels)):
+            for cookie in self._index.get('.'.join(reversed(labels[i:])), ()):
+                if i == 0 or cookie.include_subdomains:
+                    candidates.append(cookie)
+        candidates.extend(self._index.get('', ()))
+        cookies = sorted(candidates, key=lambda c: -len(c.path))
+        with self._lock:
+            self._hosts[host] = cookies
+        return cookies
+
+    def for_url(self, url):
+        """Cookie trình duyệt sẽ gửi cho url: khớp domain, path, secure và chưa hết hạn"""
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        secure = parts.scheme == 'https'
+        return [cookie for cookie in self.for_host(parts.hostname or '')
+                if path_matches(path, cookie.path) and (secure or not cookie.secure)
+                and not cookie.expired]
+
+    def for_domain(self, domain):
+        """{name: value} của các cookie gửi cho host domain (mọi path)"""
+        cookies = {}
+        for cookie in self.for_host(domain):
+            if cookie.value and not cookie.expired:
+                cookies.setdefault(cookie.name, cookie.value)
+        return cookies
+
+    def netscape_file(self):
+        """
+        Đường dẫn file Netscape cho yt-dlp (cookiefile). File .txt được dùng
+        trực tiếp; file .json được ghi ra file mới (mkstemp, quyền 0600) trong
+        thư mục riêng của process, một lần cho mỗi phiên bản của file.
+        """
+        if not self.is_json:
+            return self.path
+        with self._lock:
+            if self._netscape_path and os.path.exists(self._netscape_path):
+                return self._netscape_path
+            fd, target = tempfile.mkstemp(suffix='.txt', dir=_cookie_dir())
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self._netscape_text())
+            self._netscape_path = target
+            return target
+
+    def discard(self):
+        """Xóa file Netscape đã ghi (store đã bị thay bằng phiên bản mới của file)"""
+        with self._lock:
+            path, self._netscape_path = self._netscape_path, None
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _netscape_text(self):
+        lines = ['# Netscape HTTP Cookie File', '']
+        for cookie in self.cookies:
+            if not cookie.domain or any(c in cookie.name + cookie.value for c in '\t\r\n'):
+                continue  # yt-dlp cần domain; tab/xuống dòng làm hỏng định dạng
+            domain = cookie.domain.lstrip('.')
+            if cookie.include_subdomains:
+                domain = '.' + domain
+            lines.append('\t'.join((
+                domain, 'TRUE' if cookie.include_subdomains else 'FALSE', cookie.path,
+                'TRUE' if cookie.secure else 'FALSE', str(cookie.expires), cookie.name, cookie.value,
+            )))
+        return '\n'.join(lines) + '\n'
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_cookie_store(path):
+    """
+    CookieStore của file (parse lại khi mtime/kích thước đổi), hoặc None nếu
+    file không tồn tại
     """
+    if not path:
+        return None
+    path = os.path.abspath(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (path, st.st_mtime_ns, st.st_size)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is not None and store.key == key:
+            return store
+
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        if os.path.splitext(path)[1].lower() == '.json':
+            cookies, valid = _parse_json(text)
+        else:
+            cookies, valid = _parse_txt(text)
+        print(f"Loaded {len(cookies)} cookies from {path}")
+    except Exception as e:
+        print(f"Error loading cookies from {path}: {e}")
+        cookies, valid = [], False
+    store = CookieStore(path, key, cookies, valid)
+    with _stores_lock:
+        old = _stores.get(path)
+        _stores[path] = store
+    if old is not None and old is not store:
+        old.discard()
+    return store
+
 
-        if len(lines) == 0:
-            return False
+def is_valid_cookie_file(path):
+    """
+    Kiểm tra xem file cookies có tồn tại và hợp lệ không
+    Hỗ trợ cả định dạng .txt (Netscape) và .json
+    """
+    store = get_cookie_store(path)
+    return bool(store and store.valid)
 
-        # File phải chứa dòng có ít nhất 6 cột (domain, flag, path, secure, expires, name, value)
-        for line in lines:
-            if line.strip().startswith("#") or line.strip() == "":
-                continue
-            parts = line.strip().split("\t")
-            if len(parts) >= 6:
-                return True
-    except Exception:
-        return False
 
-    return False
+def is_valid_txt_cookie_file(path):
+    """
+    Kiểm tra file cookie .txt (Netscape format)
+    """
+    return is_valid_cookie_file(path)
 
 
 def is_valid_json_cookie_file(path):
     """
     Kiểm tra file cookie .json
     """
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        # Kiểm tra cấu trúc JSON cơ bản
-        if isinstance(data, list):
-            # Format: [{"name": "...", "value": "...", "domain": "..."}, ...]
-            return len(data) > 0 and all(isinstance(item, dict) for item in data)
-        elif isinstance(data, dict):
-            # Format: {"cookies": [...]} hoặc {"domain": {...}}
-            return len(data) > 0
-        else:
-            return False
-    except (json.JSONDecodeError, Exception):
-        return False
+    return is_valid_cookie_file(path)
 
 
 def extract_cookies_for_domain(cookie_path, domain):
     """
-    Trích xuất cookies dành riêng cho một domain
+    Trích xuất cookies sẽ gửi cho một domain (khớp hậu tố theo RFC 6265:
+    cookie của ".live.com" khớp "onedrive.live.com", cookie của domain khác thì không)
     Hỗ trợ cả định dạng .txt và .json
     :param cookie_path: Đường dẫn file cookies (.txt hoặc .json)
     :param domain: Ví dụ: ".onedrive.live.com"
     :return: dict chứa các cookie
     """
-    cookies = {}
-    if not os.path.exists(cookie_path):
-        return cookies
-
-    file_ext = os.path.splitext(cookie_path)[1].lower()
-    
-    if file_ext == '.json':
-        return extract_cookies_from_json(cookie_path, domain)
-    else:
-        return extract_cookies_from_txt(cookie_path, domain)
+    store = get_cookie_store(cookie_path)
+    return store.for_domain(domain) if store else {}
 
 
 def extract_cookies_from_txt(cookie_path, domain):
     """
     Trích xuất cookies từ file .txt
     """
-    cookies = {}
-    try:
-        with open(cookie_path, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.startswith("#") or line.strip() == "":
-                    continue
-                parts = line.strip().split("\t")
-                if len(parts) >= 7:
-                    cookie_domain, _, _, _, _, name, value = parts
-                    if domain in cookie_domain:
-                        cookies[name] = value
-    except Exception:
-        pass
-    return cookies
+    return extract_cookies_for_domain(cookie_path, domain)
 
 
 def extract_cookies_from_json(cookie_path, domain):
     """
     Trích xuất cookies từ file .json
     """
-    cookies = {}
-    try:
-        with open(cookie_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        if isinstance(data, list):
-            # Format: [{"name": "...", "value": "...", "domain": "..."}, ...]
-            for item in data:
-                if isinstance(item, dict):
-                    cookie_domain = item.get('domain', '')
-                    name = item.get('name', '')
-                    value = item.get('value', '')
-                    if domain in cookie_domain and name and value:
-                        cookies[name] = value
-        elif isinstance(data, dict):
-            # Format: {"cookies": [...]} hoặc {"domain": {...}}
-            if 'cookies' in data and isinstance(data['cookies'], list):
-                for item in data['cookies']:
-                    if isinstance(item, dict):
-                        cookie_domain = item.get('domain', '')
-                        name = item.get('name', '')
-                        value = item.get('value', '')
-                        if domain in cookie_domain and name and value:
-                            cookies[name] = value
-            else:
-                # Format: {"domain": {...}}
-                for key, value in data.items():
-                    if isinstance(value, dict) and domain in key:
-                        for cookie_name, cookie_value in value.items():
-                            if isinstance(cookie_value, str):
-                                cookies[cookie_name] = cookie_value
-    except Exception:
-        pass
-    return cookies
+    return extract_cookies_for_domain(cookie_path, domain)
 
 
 def convert_cookies_to_yt_dlp_format(cookie_path):
@@ -154,104 +356,27 @@ def convert_cookies_to_yt_dlp_format(cookie_path):
     :param cookie_path: Đường dẫn file cookies
     :return: dict với các tùy chọn yt-dlp
     """
-    file_ext = os.path.splitext(cookie_path)[1].lower()
-    
-    if file_ext == '.json':
-        # yt-dlp hỗ trợ trực tiếp file JSON
-        return {'cookiefile': cookie_path}
-    else:
-        # File .txt được hỗ trợ trực tiếp
+    store = get_cookie_store(cookie_path)
+    if store is None or not store.valid:
         return {'cookiefile': cookie_path}
+    # yt-dlp chỉ đọc định dạng Netscape: file .json được chuyển một lần
+    return {'cookiefile': store.netscape_file()}
 
 
 def load_cookies_from_file(cookie_file):
     """
     Load cookies from file and return as dict
     Support both .txt (Netscape format) and .json formats
-    
+
     Args:
         cookie_file (str): Path to cookie file
-        
+
     Returns:
         dict: Cookies dictionary for requests
     """
-    cookies = {}
-    try:
-        if not os.path.exists(cookie_file):
-            print(f"Cookie file not found: {cookie_file}")
-            return cookies
-            
-        file_ext = os.path.splitext(cookie_file)[1].lower()
-        
-        if file_ext == '.json':
-            # Handle JSON cookie format
-            with open(cookie_file, 'r', encoding='utf-8') as f:
-                cookie_data = json.load(f)
-                
-            # Parse JSON cookie structure
-            if isinstance(cookie_data, list):
-                # Format: [{"name": "...", "value": "...", "domain": "..."}, ...]
-                for item in cookie_data:
-                    if isinstance(item, dict):
-                        name = item.get('name', '')
-                        value = item.get('value', '')
-                        if name and value:
-                            cookies[name] = value
-            elif isinstance(cookie_data, dict):
-                # Format: {"cookies": [...]} hoặc {"domain": {...}}
-                if 'cookies' in cookie_data and isinstance(cookie_data['cookies'], list):
-                    for item in cookie_data['cookies']:
-                        if isinstance(item, dict):
-                            name = item.get('name', '')
-                            value = item.get('value', '')
-                            if name and value:
-                                cookies[name] = value
-                else:
-                    # Format: {"domain": {...}}
-                    for key, value in cookie_data.items():
-                        if isinstance(value, dict):
-                            for cookie_name, cookie_value in value.items():
-                                if isinstance(cookie_value, str):
-                                    cookies[cookie_name] = cookie_value
-        else:
-            # Handle Netscape .txt format
-            with open(cookie_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if line.startswith("#") or line.strip() == "":
-                        continue
-                    parts = line.strip().split("\t")
-                    if len(parts) >= 7:
-                        _, _, _, _, _, name, value = parts
-                        if name and value:
-                            cookies[name] = value
-                            
-        print(f"Loaded {len(cookies)} cookies from {cookie_file}")
-        return cookies
-        
-    except Exception as e:
-        print(f"Error loading cookies from {cookie_file}: {e}")
+    store = get_cookie_store(cookie_file)
+    if store is None:
+        print(f"Cookie file not found: {cookie_file}")
         return {}
+    return store.as_dict()
 
-
-def extract_cookies_for_domain(cookie_file, domain):
-    """
-    Extract cookies for specific domain from cookie file
-    
-    Args:
-        cookie_file (str): Path to cookie file
-        domain (str): Target domain (e.g., 'sharepoint.com')
-        
-    Returns:
-        dict: Filtered cookies for the domain
-    """
-    all_cookies = load_cookies_from_file(cookie_file)
-    domain_cookies = {}
-    
-    # Filter cookies by domain
-    for name, value in all_cookies.items():
-        # For now, return all cookies since we can't easily filter by domain
-        # in the current cookie structure
-        domain_cookies[name] = value
-    
-    print(f"Extracted {len(domain_cookies)} cookies for domain {domain}")
-    return domain_cookies
@@ -3,20 +3,118 @@
 Utility để kiểm tra và cài đặt ffmpeg
 """
 
+import shutil
 import subprocess
 import sys
 import platform
+import threading
+import time
+
+# Thời gian cache kết quả kiểm tra ffmpeg (giây)
+FFMPEG_CACHE_TTL = 600
+
+_ffmpeg_info = None
+_ffmpeg_info_time = 0.0
+_ffmpeg_lock = threading.Lock()
+
+
+def _probe_ffmpeg():
+    """
+    Chạy ffmpeg một lần để lấy đường dẫn và phiên bản
+    """
+    info = {'available': False, 'path': None, 'version': None, 'encoders': None}
+    path = shutil.which('ffmpeg')
+    if not path:
+        return info
+    try:
+        result = subprocess.run([path, '-version'], capture_output=True, text=True, check=True)
+    except (subprocess.CalledProcessError, OSError):
+        return info
+    info.update({
+        'available': True,
+        'path': path,
+        'version': result.stdout.split('\n')[0],
+    })
+    return info
+
+
+def _probe_encoders(path):
+    """
+    Lấy danh sách encoder mà ffmpeg hỗ trợ
+    """
+    try:
+        result = subprocess.run([path, '-hide_banner', '-encoders'],
+                                capture_output=True, text=True, check=True)
+    except (subprocess.CalledProcessError, OSError):
+        return frozenset()
+
+    encoders = set()
+    in_table = False
+    for line in result.stdout.splitlines():
+        if not in_table:
+            # Bảng encoder bắt đầu sau dòng " ------"
+            in_table = line.strip().startswith('------')
+            continue
+        parts = line.split()
+        if len(parts) >= 2:
+            encoders.add(parts[1])
+    return frozenset(encoders)
+
+
+def get_ffmpeg_info(refresh=False):
+    """
+    Trả về thông tin ffmpeg đã cache: {'available', 'path', 'version', 'encoders'}
+    Chỉ chạy ffmpeg lại khi hết hạn cache (FFMPEG_CACHE_TTL) hoặc refresh=True.
+    'encoders' là None cho tới khi gọi get_ffmpeg_encoders().
+    """
+    global _ffmpeg_info, _ffmpeg_info_time
+    with _ffmpeg_lock:
+        expired = time.monotonic() - _ffmpeg_info_time > FFMPEG_CACHE_TTL
+        if refresh or _ffmpeg_info is None or expired:
+            _ffmpeg_info = _probe_ffmpeg()
+            _ffmpeg_info_time = time.monotonic()
+        return dict(_ffmpeg_info)
+
+
+def get_ffmpeg_encoders():
+    """
+    Trả về tập encoder của ffmpeg (cache cùng với get_ffmpeg_info)
+    """
+    info = get_ffmpeg_info()
+    if not info['available']:
+        return frozenset()
+    if info['encoders'] is None:
+        encoders = _probe_encoders(info['path'])
+        with _ffmpeg_lock:
+            if _ffmpeg_info is not None and _ffmpeg_info.get('path') == info['path']:
+                _ffmpeg_info['encoders'] = encoders
+        return encoders
+    return info['encoders']
+
+
+def invalidate_ffmpeg_cache():
+    """
+    Xóa cache để lần gọi tiếp theo kiểm tra lại ffmpeg (vd. sau khi cài đặt)
+    """
+    global _ffmpeg_info, _ffmpeg_info_time
+    with _ffmpeg_lock:
+        _ffmpeg_info = None
+        _ffmpeg_info_time = 0.0
+
+
+def is_ffmpeg_available():
+    """
+    Kiểm tra nhanh ffmpeg có sẵn không (dùng cache)
+    """
+    return get_ffmpeg_info()['available']
 
 
 def check_ffmpeg():
     """
     Kiểm tra xem ffmpeg có sẵn không
     """
-    try:
-        result = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True, check=True)
-        return True, result.stdout.split('\n')[0]
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False, None
+    info = get_ffmpeg_info()
+    return info['available'], info['version']
 
 
 def get_ffmpeg_installation_guide():